@@ -1,80 +1,180 @@
 # background_logic.py
 
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from models import (
-    Game, Country, Industry, Stockpile, NaturalResource,
-    TechnologyUpgrade, IndustryExpansion, IndustryInput, IndustryOutput, Resource
+    Game, Country, Industry, Stockpile, NaturalResource, Resource,
+    TechnologyUpgrade, IndustryExpansion, IndustryInput, IndustryOutput
 )
+from resource_cache import get_resource_ids
 from sqlalchemy import and_
 
-def process_background_logic(game: Game, session: Session, turn_number: int):
+def process_background_logic(game: Game, session: Session, turn_number: int, engine: str = "scalar"):
     """
     Processes the background logic for each turn:
     - Processes technology upgrades
     - Processes industry expansions
     - Consumes industry inputs and produces outputs
     - Extracts natural resources
+
+    Args:
+        engine (str): "scalar" to run production industry by industry, or "vectorized" to run
+            it for all countries at once with the NumPy engine in production_engine.
     """
-    countries = session.query(Country).filter_by(game_id=game.id).all()
+    if engine not in ("scalar", "vectorized"):
+        raise ValueError(f"Unknown production engine: {engine}.")
+
+    countries = load_countries_for_background(game.id, session)
     if not countries:
         print("No countries found for the current game.")
         return
 
     print(f"Processing background logic for Turn {turn_number}...")
 
+    # Pending upgrades and expansions of the whole game, grouped by country
+    pending_upgrades = load_pending_upgrades(game.id, session)
+    pending_expansions = load_pending_expansions(game.id, session)
+
     for country in countries:
         print(f"\nProcessing country: {country.name}")
 
-        # Process technology upgrades
-        process_technology_upgrades(country, session)
+        # Each country runs in its own savepoint, so a failure only discards that country's changes
+        try:
+            with session.begin_nested():
+                # Process technology upgrades
+                process_technology_upgrades(country, session, pending_upgrades.get(country.id, []))
+
+                # Process industry expansions
+                process_industry_expansions(country, session, pending_expansions.get(country.id, []))
+
+                if engine == "vectorized":
+                    # Production runs for all countries at once below
+                    continue
 
-        # Process industry expansions
-        process_industry_expansions(country, session)
+                # Map of the country's stockpiles by resource ID, shared by production and extraction
+                stockpiles = {stockpile.resource_id: stockpile for stockpile in country.stockpiles}
 
-        # Process industries
-        for industry in country.industries:
-            process_industry(industry, country, session)
+                # Process industries
+                for industry in country.industries:
+                    process_industry(industry, country, session, stockpiles)
 
-        # Extract natural resources
-        for nat_resource in country.natural_resources:
-            extract_natural_resource(nat_resource, country, session)
+                # Extract natural resources
+                for nat_resource in country.natural_resources:
+                    extract_natural_resource(nat_resource, country, session, stockpiles)
+        except Exception as e:
+            print(f"Background logic failed for {country.name}, its changes for this turn were rolled back: {e}")
 
-    # Commit the session after processing all countries
+    if engine == "vectorized":
+        # Countries do not affect each other's production, so running it after every
+        # country's upgrades and expansions gives the same results as the scalar loop
+        from production_engine import run_vectorized_production
+        run_vectorized_production(countries, session)
+
+    # Single commit for the whole turn
     session.commit()
     print(f"\nBackground logic for Turn {turn_number} has been completed.\n")
 
+def load_countries_for_background(game_id: int, session: Session):
+    """
+    Loads the countries of a game together with everything the background phase reads.
+
+    Industries with their inputs and outputs, natural resources and stockpiles are eager-loaded,
+    so the number of queries does not grow with the number of industries. Pending upgrades and
+    expansions are loaded separately by load_pending_upgrades and load_pending_expansions.
+    """
+    industries = selectinload(Country.industries)
+    return session.query(Country).filter_by(game_id=game_id).options(
+        industries.selectinload(Industry.inputs).joinedload(IndustryInput.resource),
+        industries.selectinload(Industry.outputs).joinedload(IndustryOutput.resource),
+        selectinload(Country.natural_resources).joinedload(NaturalResource.resource),
+        selectinload(Country.stockpiles),
+    ).order_by(Country.id).all()
+
+def get_or_create_stockpile(stockpiles: dict, country: Country, resource_id: int, session: Session):
+    """
+    Returns the country's stockpile for a resource from the stockpile map, creating an empty one if needed.
+    New stockpiles are inserted on the next flush.
+    """
+    stockpile = stockpiles.get(resource_id)
+    if stockpile is None:
+        stockpile = Stockpile(country=country, resource_id=resource_id, quantity=0)
+        session.add(stockpile)
+        stockpiles[resource_id] = stockpile
+    return stockpile
+
+def load_pending_upgrades(game_id: int, session: Session):
+    """
+    Loads the technology upgrades of a game that are not completed yet, with one query.
+
+    Returns:
+        dict: Lists of pending upgrades by country ID, in industry order.
+    """
+    upgrades = session.query(TechnologyUpgrade).join(Industry).join(Country).filter(
+        Country.game_id == game_id,
+        TechnologyUpgrade.is_completed == False
+    ).order_by(Industry.country_id, Industry.id, TechnologyUpgrade.id).all()
+
+    pending_upgrades = {}
+    for upgrade in upgrades:
+        pending_upgrades.setdefault(upgrade.industry.country_id, []).append(upgrade)
+    return pending_upgrades
+
+def load_pending_expansions(game_id: int, session: Session):
+    """
+    Loads the industry expansions of a game that are not completed yet, with one query.
 
-def process_technology_upgrades(country: Country, session: Session):
+    Returns:
+        dict: Lists of pending expansions by country ID, in industry order.
+    """
+    expansions = session.query(IndustryExpansion).join(Industry).join(Country).filter(
+        Country.game_id == game_id,
+        IndustryExpansion.is_completed == False
+    ).order_by(Industry.country_id, Industry.id, IndustryExpansion.id).all()
+
+    pending_expansions = {}
+    for expansion in expansions:
+        pending_expansions.setdefault(expansion.industry.country_id, []).append(expansion)
+    return pending_expansions
+
+def process_technology_upgrades(country: Country, session: Session, upgrades: list = None):
     """
     Processes pending technology upgrades for a country's industries.
+
+    Changes are left in the session for the caller to commit.
+
+    Args:
+        upgrades (list): The country's pending upgrades, queried for the country if not given.
     """
-    for industry in country.industries:
-        for upgrade in industry.technology_upgrades:
-            if not upgrade.is_completed:
-                upgrade.remaining_time -= 1
-                if upgrade.remaining_time <= 0:
-                    # Upgrade complete
-                    industry.technology_level = upgrade.new_technology_level
-                    upgrade.is_completed = True
-
-                    # Apply benefits as per 'benefits' field
-                    # 'benefits' is expected to be a JSON string, parse it
-                    benefits = json.loads(upgrade.benefits)
-
-                    # Adjust industry attributes as per benefits
-                    apply_technology_upgrade_benefits(industry, benefits, country, session)
-
-                    # Update the database
-                    session.add(industry)
-                    session.add(upgrade)
-                    session.commit()
-
-                    print(f"Technology upgrade completed for industry '{industry.sub_type}' in {country.name}. New technology level: {industry.technology_level}")
-                else:
-                    session.add(upgrade)  # To track the decremented remaining_time
-                    session.commit()
-                    print(f"Technology upgrade in progress for industry '{industry.sub_type}' in {country.name}. Remaining time: {upgrade.remaining_time}")
+    if upgrades is None:
+        upgrades = session.query(TechnologyUpgrade).join(Industry).filter(
+            Industry.country_id == country.id,
+            TechnologyUpgrade.is_completed == False
+        ).order_by(Industry.id, TechnologyUpgrade.id).all()
+
+    for upgrade in upgrades:
+        industry = upgrade.industry
+        if not upgrade.is_completed:
+            upgrade.remaining_time -= 1
+            if upgrade.remaining_time <= 0:
+                # Upgrade complete
+                industry.technology_level = upgrade.new_technology_level
+                upgrade.is_completed = True
+
+                # Apply benefits as per 'benefits' field
+                # 'benefits' is expected to be a JSON string, parse it
+                benefits = json.loads(upgrade.benefits)
+
+                # Adjust industry attributes as per benefits
+                apply_technology_upgrade_benefits(industry, benefits, country, session)
+
+                # Update the database
+                session.add(industry)
+                session.add(upgrade)
+
+                print(f"Technology upgrade completed for industry '{industry.sub_type}' in {country.name}. New technology level: {industry.technology_level}")
+            else:
+                session.add(upgrade)  # To track the decremented remaining_time
+                print(f"Technology upgrade in progress for industry '{industry.sub_type}' in {country.name}. Remaining time: {upgrade.remaining_time}")
 
 def apply_technology_upgrade_benefits(industry: Industry, benefits: dict, country: Country, session: Session):
     """
@@ -127,45 +227,58 @@ def apply_technology_upgrade_benefits(industry: Industry, benefits: dict, countr
             print(f"Increased output '{industry_output.resource.name}' from {original_quantity} to {industry_output.quantity} per production cycle.")
 
 
-def process_industry_expansions(country: Country, session: Session):
+def process_industry_expansions(country: Country, session: Session, expansions: list = None):
     """
     Processes pending industry expansions for a country's industries.
+
+    Changes are left in the session for the caller to commit.
+
+    Args:
+        expansions (list): The country's pending expansions, queried for the country if not given.
     """
-    for industry in country.industries:
-        for expansion in industry.expansions:
-            if not expansion.is_completed:
-                expansion.remaining_time -= 1
-                if expansion.remaining_time <= 0:
-                    # Expansion complete
-                    industry.production_level = expansion.new_production_level
-                    expansion.is_completed = True
-
-                    # Apply benefits as per 'increase_in_outputs' and 'additional_inputs_required'
-                    apply_expansion_benefits(industry, expansion, session)
-
-                    # Update the database
-                    session.add(industry)
-                    session.add(expansion)
-                    session.commit()
-
-                    print(f"Industry expansion completed for '{industry.sub_type}' in {country.name}. New production level: {industry.production_level}")
-                else:
-                    session.add(expansion)  # To track the decremented remaining_time
-                    session.commit()
-                    print(f"Industry expansion in progress for '{industry.sub_type}' in {country.name}. Remaining time: {expansion.remaining_time}")
+    if expansions is None:
+        expansions = session.query(IndustryExpansion).join(Industry).filter(
+            Industry.country_id == country.id,
+            IndustryExpansion.is_completed == False
+        ).order_by(Industry.id, IndustryExpansion.id).all()
+
+    for expansion in expansions:
+        industry = expansion.industry
+        if not expansion.is_completed:
+            expansion.remaining_time -= 1
+            if expansion.remaining_time <= 0:
+                # Expansion complete
+                industry.production_level = expansion.new_production_level
+                expansion.is_completed = True
+
+                # Apply benefits as per 'increase_in_outputs' and 'additional_inputs_required'
+                apply_expansion_benefits(industry, expansion, session)
+
+                # Update the database
+                session.add(industry)
+                session.add(expansion)
+
+                print(f"Industry expansion completed for '{industry.sub_type}' in {country.name}. New production level: {industry.production_level}")
+            else:
+                session.add(expansion)  # To track the decremented remaining_time
+                print(f"Industry expansion in progress for '{industry.sub_type}' in {country.name}. Remaining time: {expansion.remaining_time}")
 
 def apply_expansion_benefits(industry: Industry, expansion: IndustryExpansion, session: Session):
     """
     Applies the benefits of an industry expansion to the industry.
     """
+    increase_in_outputs = json.loads(expansion.increase_in_outputs) if expansion.increase_in_outputs else {}
+    additional_inputs = json.loads(expansion.additional_inputs_required) if expansion.additional_inputs_required else {}
+    # Resolve every resource name at once, creating the new ones
+    resource_ids = get_resource_ids(list(increase_in_outputs) + list(additional_inputs), session)
+
     # Process increase in outputs
-    if expansion.increase_in_outputs:
-        increase_in_outputs = json.loads(expansion.increase_in_outputs)
+    if increase_in_outputs:
         for resource_name, quantity_increase in increase_in_outputs.items():
             # Find the corresponding IndustryOutput
-            industry_output = session.query(IndustryOutput).join(Resource).filter(
+            industry_output = session.query(IndustryOutput).filter(
                 IndustryOutput.industry_id == industry.id,
-                Resource.name == resource_name
+                IndustryOutput.resource_id == resource_ids[resource_name]
             ).first()
             if industry_output:
                 original_quantity = industry_output.quantity
@@ -174,30 +287,22 @@ def apply_expansion_benefits(industry: Industry, expansion: IndustryExpansion, s
                 print(f"Increased output '{resource_name}' from {original_quantity} to {industry_output.quantity} per production cycle.")
             else:
                 print(f"Adding new output '{resource_name}' with quantity {quantity_increase}.")
-                # Resource must be retrieved or created
-                resource = session.query(Resource).filter_by(name=resource_name).first()
-                if not resource:
-                    # Create the resource if it doesn't exist
-                    resource = Resource(name=resource_name)
-                    session.add(resource)
-                    session.flush()
-                # Create new IndustryOutput
+                # Create new IndustryOutput, through the collection so that this turn's production uses it
                 new_industry_output = IndustryOutput(
-                    industry_id=industry.id,
-                    resource_id=resource.id,
+                    resource_id=resource_ids[resource_name],
+                    resource=session.get(Resource, resource_ids[resource_name]),
                     quantity=quantity_increase
                 )
-                session.add(new_industry_output)
+                industry.outputs.append(new_industry_output)
                 print(f"Added new output '{resource_name}' with quantity {quantity_increase}.")
 
     # Process additional inputs required
-    if expansion.additional_inputs_required:
-        additional_inputs = json.loads(expansion.additional_inputs_required)
+    if additional_inputs:
         for resource_name, additional_quantity in additional_inputs.items():
             # Find the corresponding IndustryInput
-            industry_input = session.query(IndustryInput).join(Resource).filter(
+            industry_input = session.query(IndustryInput).filter(
                 IndustryInput.industry_id == industry.id,
-                Resource.name == resource_name
+                IndustryInput.resource_id == resource_ids[resource_name]
             ).first()
             if industry_input:
                 original_quantity = industry_input.quantity
@@ -206,30 +311,29 @@ def apply_expansion_benefits(industry: Industry, expansion: IndustryExpansion, s
                 print(f"Increased input '{resource_name}' from {original_quantity} to {industry_input.quantity} per production cycle.")
             else:
                 print(f"Adding new input '{resource_name}' with quantity {additional_quantity}.")
-                # Resource must be retrieved or created
-                resource = session.query(Resource).filter_by(name=resource_name).first()
-                if not resource:
-                    # Create the resource if it doesn't exist
-                    resource = Resource(name=resource_name)
-                    session.add(resource)
-                    session.flush()
-                # Create new IndustryInput
+                # Create new IndustryInput, through the collection so that this turn's production uses it
                 new_industry_input = IndustryInput(
-                    industry_id=industry.id,
-                    resource_id=resource.id,
+                    resource_id=resource_ids[resource_name],
+                    resource=session.get(Resource, resource_ids[resource_name]),
                     quantity=additional_quantity
                 )
-                session.add(new_industry_input)
+                industry.inputs.append(new_industry_input)
                 print(f"Added new input '{resource_name}' with quantity {additional_quantity}.")
 
 
-def process_industry(industry: Industry, country: Country, session: Session):
+def process_industry(industry: Industry, country: Country, session: Session, stockpiles: dict = None):
     """
     Processes an industry for a country:
     - Consumes inputs
     - Produces outputs
     - Checks for sufficient inputs
+
+    Args:
+        stockpiles (dict): The country's stockpiles by resource ID, built from country.stockpiles if not given.
     """
+    if stockpiles is None:
+        stockpiles = {stockpile.resource_id: stockpile for stockpile in country.stockpiles}
+
     # First, check if the industry can operate (has enough inputs)
     can_operate = True
 
@@ -237,57 +341,50 @@ def process_industry(industry: Industry, country: Country, session: Session):
     technology_multiplier = 1 - (0.05 * industry.technology_level)  # Assuming 5% reduction per tech level
 
     for industry_input in industry.inputs:
-        resource = industry_input.resource
         required_quantity = industry_input.quantity * industry.production_level * technology_multiplier
 
         # Get the country's stockpile for this resource
-        stockpile = session.query(Stockpile).filter_by(
-            country_id=country.id, resource_id=resource.id).first()
+        stockpile = stockpiles.get(industry_input.resource_id)
         if not stockpile or stockpile.quantity < required_quantity:
-            print(f"Industry '{industry.sub_type}' cannot operate due to insufficient input '{resource.name}'.")
+            print(f"Industry '{industry.sub_type}' cannot operate due to insufficient input '{industry_input.resource.name}'.")
             can_operate = False
             break
 
     if can_operate:
         # Consume inputs
         for industry_input in industry.inputs:
-            resource = industry_input.resource
             required_quantity = industry_input.quantity * industry.production_level * technology_multiplier
 
-            stockpile = session.query(Stockpile).filter_by(
-                country_id=country.id, resource_id=resource.id).first()
+            stockpile = stockpiles[industry_input.resource_id]
             stockpile.quantity -= required_quantity
-            session.add(stockpile)
-            print(f"Consumed {required_quantity} of '{resource.name}' from {country.name}'s stockpile.")
+            print(f"Consumed {required_quantity} of '{industry_input.resource.name}' from {country.name}'s stockpile.")
 
         # Adjust output quantities based on technology level
         output_multiplier = 1 + (0.05 * industry.technology_level)  # Assuming 5% increase per tech level
 
         # Produce outputs
         for industry_output in industry.outputs:
-            resource = industry_output.resource
             produced_quantity = industry_output.quantity * industry.production_level * output_multiplier
 
             # Get or create the country's stockpile for this resource
-            stockpile = session.query(Stockpile).filter_by(
-                country_id=country.id, resource_id=resource.id).first()
-            if not stockpile:
-                # Create a new stockpile
-                stockpile = Stockpile(country_id=country.id, resource_id=resource.id, quantity=0)
-                session.add(stockpile)
-                session.flush()
+            stockpile = get_or_create_stockpile(stockpiles, country, industry_output.resource_id, session)
             stockpile.quantity += produced_quantity
-            session.add(stockpile)
-            print(f"Produced {produced_quantity} of '{resource.name}' and added to {country.name}'s stockpile.")
+            print(f"Produced {produced_quantity} of '{industry_output.resource.name}' and added to {country.name}'s stockpile.")
 
     else:
         print(f"Industry '{industry.sub_type}' did not operate this turn due to insufficient inputs.")
 
-def extract_natural_resource(nat_resource: NaturalResource, country: Country, session: Session):
+def extract_natural_resource(nat_resource: NaturalResource, country: Country, session: Session, stockpiles: dict = None):
     """
     Extracts a natural resource for a country, up to the extraction rate and total reserves.
     Adds the extracted amount to the country's stockpile.
+
+    Args:
+        stockpiles (dict): The country's stockpiles by resource ID, built from country.stockpiles if not given.
     """
+    if stockpiles is None:
+        stockpiles = {stockpile.resource_id: stockpile for stockpile in country.stockpiles}
+
     # Determine how much can be extracted this turn
     extraction_rate = nat_resource.extraction_rate
     total_reserves = nat_resource.total_reserves
@@ -300,19 +397,7 @@ def extract_natural_resource(nat_resource: NaturalResource, country: Country, se
     nat_resource.total_reserves -= extracted_quantity
 
     # Add to country's stockpile
-    resource = nat_resource.resource
-
-    stockpile = session.query(Stockpile).filter_by(
-        country_id=country.id, resource_id=resource.id).first()
-    if not stockpile:
-        # Create a new stockpile
-        stockpile = Stockpile(country_id=country.id, resource_id=resource.id, quantity=0)
-        session.add(stockpile)
-        session.flush()
+    stockpile = get_or_create_stockpile(stockpiles, country, nat_resource.resource_id, session)
     stockpile.quantity += extracted_quantity
 
-    # Update the database
-    session.add(nat_resource)
-    session.add(stockpile)
-
-    print(f"Extracted {extracted_quantity} of '{resource.name}' and added to {country.name}'s stockpile.")
+    print(f"Extracted {extracted_quantity} of '{nat_resource.resource.name}' and added to {country.name}'s stockpile.")
@@ -0,0 +1,186 @@
+# country_schema.py
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, selectinload
+from models import Country, Industry, IndustryInput, IndustryOutput, Stockpile, NaturalResource, Resource
+
+# Key under which the schema cache is kept in session.info
+SCHEMA_CACHE_KEY = "country_schema_cache"
+
+
+def get_country_schema(country: Country, session: Session, turn_number: int = None):
+    """
+    Returns the country schema used in the prompts, from the session's schema cache.
+
+    The schema is built once per country and turn and reused until one of the country's rows
+    changes. The returned dict is shared by every caller and must not be modified.
+
+    Args:
+        country (Country): The Country instance.
+        session (Session): The SQLAlchemy session.
+        turn_number (int): The current turn number. A different turn number drops every cached schema.
+
+    Returns:
+        dict: The country schema.
+    """
+    return get_country_schemas([country], session, turn_number)[0]
+
+def get_country_schemas(countries, session: Session, turn_number: int = None):
+    """
+    Returns the schemas of several countries, loading every missing one with a single eager-loaded query.
+
+    Args:
+        countries (list): List of Country instances.
+        session (Session): The SQLAlchemy session.
+        turn_number (int): The current turn number. A different turn number drops every cached schema.
+
+    Returns:
+        list: The country schemas, in the same order as the countries.
+    """
+    # Pending changes are flushed first so that they invalidate the schemas they affect
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+
+    cache = _get_cache(session)
+    if turn_number is not None and cache["turn_number"] != turn_number:
+        cache["turn_number"] = turn_number
+        cache["schemas"].clear()
+
+    schemas = cache["schemas"]
+    missing_ids = [country.id for country in countries if country.id not in schemas]
+    if missing_ids:
+        for loaded_country in load_countries_for_schema(missing_ids, session):
+            schemas[loaded_country.id] = build_country_schema(loaded_country)
+
+    return [schemas[country.id] for country in countries]
+
+def load_countries_for_schema(country_ids, session: Session):
+    """
+    Loads countries together with the industries, inputs, outputs, stockpiles and natural
+    resources their schemas are built from.
+    """
+    industries = selectinload(Country.industries)
+    return session.query(Country).filter(Country.id.in_(country_ids)).options(
+        industries.selectinload(Industry.inputs).joinedload(IndustryInput.resource),
+        industries.selectinload(Industry.outputs).joinedload(IndustryOutput.resource),
+        selectinload(Country.stockpiles).joinedload(Stockpile.resource),
+        selectinload(Country.natural_resources).joinedload(NaturalResource.resource),
+    ).all()
+
+def build_country_schema(country: Country):
+    """
+    Prepares the country schema as a dictionary for the prompt.
+
+    Args:
+        country (Country): The Country instance.
+
+    Returns:
+        dict: The country schema.
+    """
+    # Industries
+    industries = []
+    for industry in country.industries:
+        # Inputs
+        inputs = {}
+        for industry_input in industry.inputs:
+            inputs[industry_input.resource.name] = industry_input.quantity
+
+        # Outputs
+        outputs = {}
+        for industry_output in industry.outputs:
+            outputs[industry_output.resource.name] = industry_output.quantity
+
+        industries.append({
+            "Industry ID": industry.industry_id,
+            "Type": industry.type,
+            "Sub-Type": industry.sub_type,
+            "Production Level": industry.production_level,
+            "Technology Level": industry.technology_level,
+            "Inputs": inputs,
+            "Outputs": outputs,
+            "Skilled Workers Employed": industry.skilled_workers_employed,
+            "Unskilled Workers Employed": industry.unskilled_workers_employed
+        })
+
+    # Workforce
+    workforce = {
+        "Unemployed Skilled Workers": country.unemployed_skilled_workers,
+        "Unemployed Unskilled Workers": country.unemployed_unskilled_workers
+    }
+
+    # Stockpiles
+    stockpiles = {}
+    for stockpile in country.stockpiles:
+        stockpiles[stockpile.resource.name] = stockpile.quantity
+
+    # Natural Resources
+    natural_resources = {}
+    for nat_resource in country.natural_resources:
+        natural_resources[nat_resource.resource.name] = {
+            "Total Reserves": nat_resource.total_reserves,
+            "Extraction Rate": nat_resource.extraction_rate
+        }
+
+    # Country schema
+    return {
+        "Country Name": country.name,
+        "Government Capital Pool": float(country.government_capital),
+        "Industries": industries,
+        "Workforce": workforce,
+        "Stockpiles": stockpiles,
+        "Natural Resources": natural_resources
+    }
+
+def invalidate_country_schema(session: Session, country_id: int = None):
+    """
+    Drops a country's cached schema, or every cached schema if no country is given.
+
+    Only needed after changes the session does not track, such as bulk UPDATE statements.
+    """
+    schemas = _get_cache(session)["schemas"]
+    if country_id is None:
+        schemas.clear()
+    else:
+        schemas.pop(country_id, None)
+
+def _get_cache(session: Session):
+    cache = session.info.get(SCHEMA_CACHE_KEY)
+    if cache is None:
+        cache = {"turn_number": None, "schemas": {}}
+        session.info[SCHEMA_CACHE_KEY] = cache
+    return cache
+
+def _affected_country_id(session: Session, obj):
+    # Returns the ID of the country whose schema the object is part of, None if it is part of
+    # none, or False if it cannot be told without a query
+    if isinstance(obj, Country):
+        return obj.id
+    if isinstance(obj, (Industry, Stockpile, NaturalResource)):
+        return obj.country_id
+    if isinstance(obj, (IndustryInput, IndustryOutput)):
+        industry = session.identity_map.get(inspect(Industry).identity_key_from_primary_key((obj.industry_id,)))
+        return industry.country_id if industry is not None else False
+    if isinstance(obj, Resource):
+        # Only the resource name appears in the schemas, prices change every turn
+        return False if inspect(obj).attrs.name.history.has_changes() else None
+    return None
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_countries(session, flush_context):
+    schemas = session.info.get(SCHEMA_CACHE_KEY, {}).get("schemas")
+    if not schemas:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        country_id = _affected_country_id(session, obj)
+        if country_id is False:
+            schemas.clear()
+            return
+        if country_id is not None:
+            schemas.pop(country_id, None)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _clear_after_rollback(session, previous_transaction):
+    # Rolled back changes may already have been flushed into cached schemas
+    schemas = session.info.get(SCHEMA_CACHE_KEY, {}).get("schemas")
+    if schemas:
+        schemas.clear()
@@ -0,0 +1,134 @@
+# database.py
+
+import os
+import sqlite3
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///game.db")
+
+# PRAGMA statements run on every new SQLite connection, by profile. With WAL, synchronous=NORMAL
+# keeps the database consistent after a crash but the last commits can be lost on power failure.
+SQLITE_PROFILES = {
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # In KiB when negative
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # Milliseconds
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    # SQLite's own defaults: rollback journal and a sync on every commit
+    "default": {},
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+
+# Pragmas that do not apply to in-memory databases
+FILE_ONLY_PRAGMAS = ("journal_mode", "mmap_size")
+
+IN_MEMORY_URL = "sqlite://"
+
+
+def create_game_engine(url: str = None, profile: str = None, pragmas: dict = None, **kwargs):
+    """
+    Creates an engine, applying the SQLite pragma profile on every new connection.
+
+    In-memory SQLite databases use a single shared connection, so every session sees the same data.
+
+    The sqlite3 driver's own transaction handling is turned off and the engine emits BEGIN
+    itself when a transaction starts. The driver would otherwise only open a transaction before
+    the first INSERT, UPDATE or DELETE, so that the RELEASE of a first SAVEPOINT would commit.
+
+    Args:
+        url (str): Database URL, DATABASE_URL if not given.
+        profile (str): Name of the SQLite profile in SQLITE_PROFILES, SQLITE_PROFILE if not given.
+        pragmas (dict): Pragmas overriding those of the profile.
+        **kwargs: Passed on to create_engine.
+
+    Returns:
+        Engine: The SQLAlchemy engine.
+    """
+    url = make_url(url or DATABASE_URL)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url, **kwargs)
+
+    profile = profile or SQLITE_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}.")
+    settings = dict(SQLITE_PROFILES[profile], **(pragmas or {}))
+
+    in_memory = is_in_memory(url)
+    if in_memory:
+        settings = {name: value for name, value in settings.items() if name not in FILE_ONLY_PRAGMAS}
+        kwargs.setdefault("poolclass", StaticPool)
+        kwargs.setdefault("connect_args", {"check_same_thread": False})
+
+    engine = create_engine(url, **kwargs)
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        # Transactions are begun by _begin below
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
+
+def is_in_memory(url):
+    """
+    Tells whether a database URL points to an in-memory SQLite database.
+    """
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def get_pragmas(engine):
+    """
+    Returns the current value of every pragma of the engine's profiles, as seen by a new connection.
+    """
+    names = sorted({name for settings in SQLITE_PROFILES.values() for name in settings})
+    with engine.connect() as connection:
+        return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+def snapshot_to_disk(engine, path: str):
+    """
+    Copies an SQLite database, typically an in-memory one, to a file with SQLite's backup API.
+
+    The file's previous content, if any, is overwritten.
+
+    Args:
+        engine: Engine of the SQLite database to copy.
+        path (str): Database file to write.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    raw_connection = engine.raw_connection()
+    try:
+        target = sqlite3.connect(path)
+        try:
+            raw_connection.driver_connection.backup(target)
+        finally:
+            target.close()
+    finally:
+        raw_connection.close()
+
+
+# Engine and session factory of the default database
+engine = create_game_engine()
+SessionLocal = sessionmaker(bind=engine)
@@ -1,14 +1,17 @@
 # main.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base
+from database import engine
+from migrations import upgrade, current_revision
 
-DATABASE_URL = "sqlite:///game.db"
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+def create_tables(engine):
+    """
+    Creates the tables of a new database, or brings an existing one up to the latest schema revision.
 
-# Create all tables
-Base.metadata.create_all(engine)
+    Args:
+        engine: The SQLAlchemy engine of the database.
+    """
+    upgrade(engine)
 
-print("Database tables created successfully.")
\ No newline at end of file
+if __name__ == "__main__":
+    create_tables(engine)
+    print(f"Database tables created successfully, schema revision {current_revision(engine)}.")
@@ -1,13 +1,20 @@
 # gameplay.py
 
-import os
 import json
-from openai import OpenAI
+import random
 from sqlalchemy.orm import Session
+from llm_client import get_openai_responses, stream_openai_response, is_llm_degraded
+from json_stream import StreamedItems, MalformedJSONError, parse_json_items, check_fields, NUMBER
+from rule_based_player import decide_actions
+from market import place_order, clear_market, get_resource_market, MarketOrderError
+from market_history import get_price_changes
+from resource_cache import get_resource, get_resource_ids, resolve_quantities
+from country_schema import get_country_schema, get_country_schemas
+from prompt_templates import build_prompt
+from prompt_encoding import encode_country_schema, encode_marketplace, encode_available_actions
 from models import (
-    Game, Turn, Country, Industry, Action, Resource, Stockpile,
-    StartNewIndustryAction, ExpandIndustryAction, UpgradeTechnologyAction, IndustryInput, IndustryOutput, TechnologyUpgrade,
-    MarketTransaction
+    Game, Turn, Country, Industry, Resource, ResourceMarket,
+    StartNewIndustryAction, ExpandIndustryAction, UpgradeTechnologyAction, IndustryInput, IndustryOutput, TechnologyUpgrade
 )
 from sqlalchemy import and_
 from decimal import Decimal
@@ -16,66 +23,180 @@ from decimal import Decimal
 class InvalidActionException(Exception):
     pass
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Fields every action of the AI's response must have, by action type
+ACTION_FIELDS = {
+    "StartNewIndustry": {"ActionID": (int, str)},
+    "ExpandIndustry": {"ActionID": (int, str)},
+    "UpgradeTechnology": {"ActionID": (int, str)},
+    "BuySellResource": {"Details": dict},
+}
+TRADE_FIELDS = {"TransactionType": {"Buy", "Sell"}, "ResourceName": str, "Quantity": NUMBER}
+
 
-def process_ai_turn(game: Game, turn_number: int, session: Session):
+def process_ai_turn(game: Game, turn_number: int, session: Session, max_concurrency: int = 1, apply_order: str = "id", seed=None, strategy=None):
     """
     Processes the turn for all AI-controlled countries.
+
+    With max_concurrency above 1, every country's prompt is snapshotted before any action is
+    applied, the decisions are fetched in parallel and then applied one country at a time.
+
+    Args:
+        game (Game): The current game instance.
+        turn_number (int): The current turn number.
+        session (Session): The SQLAlchemy session.
+        max_concurrency (int): Maximum number of LLM requests in flight at once.
+        apply_order (str): Order in which countries act, "id" for ascending country ID or
+            "random" for a shuffle seeded with `seed`.
+        seed: Seed for the "random" apply order and the rule-based player.
+        strategy (str): Strategy used for every country instead of its own ai_strategy.
     """
-    countries = session.query(Country).filter_by(game_id=game.id, is_ai=True).all()
+    countries = session.query(Country).filter_by(game_id=game.id, is_ai=True).order_by(Country.id).all()
     if not countries:
         print("No AI-controlled countries found for the current game.")
         return
 
-    for country in countries:
-        print(f"Processing AI decisions for country: {country.name}")
-        # Prepare the prompt for the AI
-        prompt = prepare_ai_prompt(country, turn_number, session)
-
-        # Get the AI's decision
-        response_text = get_openai_response(prompt)
-
-        # Parse the AI's response to get the actions list
-        actions_data = parse_ai_response(response_text)
-
-        # Apply each action to the game state
-        if actions_data:
-            try:
-                for action_data in actions_data:
-                    apply_ai_action(country, turn_number, action_data, session)
-                print(f"Applied actions for country {country.name}.")
-            except InvalidActionException as e:
-                session.rollback()
-                print(f"AI for country {country.name} made an invalid action: {e}")
-                print(f"The turn is wasted, no actions were performed.")
-        else:
-            print(f"Failed to process AI decisions for country {country.name}.")
+    if apply_order == "random":
+        random.Random(seed).shuffle(countries)
+    elif apply_order != "id":
+        raise ValueError(f"Unknown apply order: {apply_order}.")
+
+    # Load every country's schema with one query, the prompts then read it from the cache
+    get_country_schemas(countries, session, turn_number)
+
+    if strategy != "rule_based" and is_llm_degraded():
+        print("LLM provider is degraded, every country uses the rule-based player this turn.")
+        strategy = "rule_based"
+
+    if max_concurrency > 1:
+        # Every decision is based on the state at the start of the phase
+        responses = {}
+        llm_requests = []
+        for country in countries:
+            if get_country_strategy(country, strategy) == "rule_based":
+                responses[country.id] = get_rule_based_response(country, turn_number, session, seed)
+            else:
+                llm_requests.append((country, prepare_ai_prompt(country, turn_number, session)))
+
+        if llm_requests:
+            print(f"Requesting AI decisions for {len(llm_requests)} countries with up to {max_concurrency} in parallel...")
+            llm_responses = get_openai_responses([("ai_turn", prompt) for _, prompt in llm_requests], max_concurrency=max_concurrency)
+            for (country, _), response_text in zip(llm_requests, llm_responses):
+                responses[country.id] = response_text
+
+        for country in countries:
+            print(f"Processing AI decisions for country: {country.name}")
+            if not responses[country.id]:
+                # The request failed, the country still gets a turn
+                responses[country.id] = get_fallback_response(country, turn_number, session, seed)
+            apply_ai_actions(country, turn_number, parse_ai_response(responses[country.id]), session)
+    else:
+        for country in countries:
+            print(f"Processing AI decisions for country: {country.name}")
+            if get_country_strategy(country, strategy) == "rule_based":
+                # Pick the actions locally
+                response_text = get_rule_based_response(country, turn_number, session, seed)
+            else:
+                # Prepare the prompt for the AI
+                prompt = prepare_ai_prompt(country, turn_number, session)
+
+                # Stream the AI's decision, each action is applied as soon as it has arrived
+                actions_stream = StreamedItems(stream_openai_response(prompt, call_site="ai_turn"), "Actions", validate_ai_action)
+                if actions_stream.start():
+                    apply_ai_actions(country, turn_number, actions_stream, session)
+                    continue
+
+                # The request failed, the country still gets a turn
+                response_text = get_fallback_response(country, turn_number, session, seed)
+
+            # Parse the AI's response to get the actions list
+            actions_data = parse_ai_response(response_text)
+
+            # Apply each action to the game state
+            apply_ai_actions(country, turn_number, actions_data, session)
+
+    # Fill the trades of every country at once
+    clear_market(game.id, turn_number, session)
+
+def get_country_strategy(country: Country, strategy=None):
+    """
+    Returns the strategy that makes a country's decisions, 'llm' or 'rule_based'.
+    """
+    country_strategy = strategy or country.ai_strategy or "llm"
+    if country_strategy not in ("llm", "rule_based"):
+        raise ValueError(f"Unknown AI strategy: {country_strategy}.")
+    return country_strategy
 
-def prepare_ai_prompt(country: Country, turn_number: int, session: Session):
+def get_rule_based_response(country: Country, turn_number: int, session: Session, seed=None):
     """
-    Prepares the prompt for the AI-controlled country using LLMTurn.md.
+    Picks a country's actions with the local rule-based player.
+
+    Returns:
+        str: The decision as JSON, in the same format as the LLM response.
+    """
+    country_schema = get_country_schema(country, session, turn_number)
+    available_actions = get_available_actions(country, turn_number, session)
+    marketplace_data = get_marketplace_data(session, country.game_id, turn_number)
+    return decide_actions(country_schema, available_actions, marketplace_data, turn_number, seed=seed)
+
+def get_fallback_response(country: Country, turn_number: int, session: Session, seed=None):
+    """
+    Picks a country's actions with the rule-based player after its LLM request failed.
+    """
+    print(f"No AI decision received for {country.name}, falling back to the rule-based player.")
+    return get_rule_based_response(country, turn_number, session, seed)
+
+def apply_ai_actions(country: Country, turn_number: int, actions_data, session: Session):
     """
-    # Read the LLMTurn.md prompt
-    with open('prompts/gameplay/LLMTurn.md', 'r') as f:
-        base_prompt = f.read()
+    Applies all actions chosen by the AI for a country, wasting the turn if any of them is invalid.
+
+    The actions run in a savepoint, so a wasted turn discards the actions of this country already
+    applied and leaves the other countries' changes in the session for the caller to commit.
 
+    Args:
+        actions_data: List of actions, or StreamedItems applying each action as it arrives. A
+            streamed response that turns out to be malformed wastes the turn like an invalid action.
+    """
+    applied_actions = 0
+    try:
+        with session.begin_nested():
+            for action_data in actions_data:
+                apply_ai_action(country, turn_number, action_data, session)
+                applied_actions += 1
+    except InvalidActionException as e:
+        print(f"AI for country {country.name} made an invalid action: {e}")
+        print(f"The turn is wasted, no actions were performed.")
+        return
+    except MalformedJSONError as e:
+        print(f"AI response for country {country.name} was malformed: {e}")
+        print(f"The turn is wasted, no actions were performed.")
+        return
+
+    if applied_actions:
+        print(f"Applied actions for country {country.name}.")
+    else:
+        print(f"Failed to process AI decisions for country {country.name}.")
+
+def prepare_ai_prompt(country: Country, turn_number: int, session: Session, prompt_mode: str = None):
+    """
+    Prepares the prompt for the AI-controlled country using LLMTurn.md.
+
+    Args:
+        prompt_mode (str): "verbose" or "compact", see prompt_encoding.PROMPT_MODE.
+    """
     # Prepare the country schema
-    country_schema = prepare_country_schema(country, session)
-    country_schema_json = json.dumps(country_schema, indent=2)
+    country_schema = get_country_schema(country, session, turn_number)
+    country_schema_block = encode_country_schema(country_schema, prompt_mode)
 
     # Get the available actions for the country at this turn
     available_actions = get_available_actions(country, turn_number, session)
-    available_actions_json = json.dumps(available_actions, indent=2)
+    available_actions_block = encode_available_actions(available_actions, prompt_mode)
 
     # Get the marketplace prices
-    marketplace_data = get_marketplace_data(session)
-    marketplace_data_json = json.dumps(marketplace_data, indent=2)
+    marketplace_data = get_marketplace_data(session, country.game_id, turn_number)
+    marketplace_data_block = encode_marketplace(marketplace_data, country_schema, available_actions, prompt_mode)
 
-    # Prepare the final prompt
-    prompt = f"{base_prompt}\n\n### **Current Turn Information**\nTurn Number: {turn_number}\n\n### **Country Schema**\n```json\n{country_schema_json}\n```\n\n### **Marketplace Prices**\n```json\n{marketplace_data_json}\n```\n\n### **Available Actions**\n```json\n{available_actions_json}\n```\n\n**Note: Options for BuySellResource actions are not pre-generated and should be decided based on the given data.**"
+    # Prepare the final prompt, the static instructions come first so that they can be cached
+    prompt = build_prompt("ai_turn", f"\n\n### **Current Turn Information**\nTurn Number: {turn_number}\n\n### **Country Schema**\n{country_schema_block}\n\n### **Marketplace Prices**\n{marketplace_data_block}\n\n### **Available Actions**\n{available_actions_block}\n\n**Note: Options for BuySellResource actions are not pre-generated and should be decided based on the given data.**")
 
     return prompt
 
@@ -147,20 +268,28 @@ def get_available_actions(country: Country, turn_number: int, session: Session):
 
     return actions
 
-def get_marketplace_data(session: Session):
+def get_marketplace_data(session: Session, game_id: int, turn_number: int = None):
     """
-    Retrieves the current marketplace prices.
+    Retrieves the current marketplace prices of a game.
+
+    Given the turn, each resource with price history also gets its PriceChange over the last
+    turns, see market_history.get_price_changes.
     """
-    resources = session.query(Resource).all()
+    price_changes = get_price_changes(game_id, turn_number, session) if turn_number is not None else {}
+    markets = session.query(ResourceMarket, Resource.name).join(
+        Resource, ResourceMarket.resource_id == Resource.id
+    ).filter(ResourceMarket.game_id == game_id).order_by(ResourceMarket.resource_id)
     marketplace = {}
-    for resource in resources:
-        marketplace[resource.name] = {
-            "CurrentPrice": float(resource.current_price),
-            "QuantityThreshold": resource.quantity_threshold,
-            "MaxTransactionPerTurn": resource.max_transaction_per_turn,
-            "MaxPrice": float(resource.max_price),
-            "MinPrice": float(resource.min_price)
+    for market, name in markets:
+        marketplace[name] = {
+            "CurrentPrice": float(market.current_price),
+            "QuantityThreshold": market.quantity_threshold,
+            "MaxTransactionPerTurn": market.max_transaction_per_turn,
+            "MaxPrice": float(market.max_price),
+            "MinPrice": float(market.min_price)
         }
+        if name in price_changes:
+            marketplace[name]["PriceChange"] = price_changes[name]
     return {"Marketplace": marketplace}
 
 def parse_ai_response(response_text):
@@ -168,24 +297,25 @@ def parse_ai_response(response_text):
     Parses the AI's response to get the actions.
     """
     try:
-        # Remove code fences if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]  # Remove ```json
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]  # Remove ```
-        response_text = response_text.strip()
-
-        # Parse JSON
-        ai_response = json.loads(response_text)
-        actions = ai_response.get("Actions", [])
-
-        return actions
-    except json.JSONDecodeError as e:
+        return parse_json_items(response_text, "Actions", validate_ai_action)
+    except MalformedJSONError as e:
         print("Failed to parse AI response JSON.")
         print("Response text:", response_text)
         print("Error message:", str(e))
         return []
 
+def validate_ai_action(action_data):
+    """
+    Checks that an action of the AI's response has the fields its action type needs.
+
+    Raises:
+        MalformedJSONError: If the action is invalid.
+    """
+    check_fields(action_data, {"ActionType": set(ACTION_FIELDS)}, "action")
+    check_fields(action_data, ACTION_FIELDS[action_data["ActionType"]], f"{action_data['ActionType']} action")
+    if action_data["ActionType"] == "BuySellResource":
+        check_fields(action_data["Details"], TRADE_FIELDS, "BuySellResource details")
+
 def apply_ai_action(country: Country, turn_number: int, action_data, session: Session):
     """
     Applies the AI-selected action to the game state.
@@ -222,7 +352,6 @@ def apply_ai_action(country: Country, turn_number: int, action_data, session: Se
 
         base_action.selected = True
         session.add(base_action)
-        session.commit()
 
         # Apply the action
         if action_type == "StartNewIndustry":
@@ -267,9 +396,9 @@ def apply_start_new_industry_action(action: StartNewIndustryAction, country: Cou
     country.unemployed_skilled_workers -= action.skilled_workers_required
     country.unemployed_unskilled_workers -= action.unskilled_workers_required
 
-    # Create the new industry
+    # Create the new industry, through the country's collection so that it is up to date
     industry = Industry(
-        country_id=country.id,
+        country=country,
         industry_id=action.industry_id,
         type=action.industry_type,
         sub_type=action.sub_type,
@@ -281,24 +410,25 @@ def apply_start_new_industry_action(action: StartNewIndustryAction, country: Cou
     session.add(industry)
     session.flush()
 
-    # Add Industry Inputs
     inputs_required = json.loads(action.inputs_required)
-    for resource_name, quantity in inputs_required.items():
-        resource = get_or_create_resource(resource_name, session)
+    outputs_produced = json.loads(action.outputs_produced)
+    # Resolve the resource names of both at once
+    get_resource_ids(list(inputs_required) + list(outputs_produced), session)
+
+    # Add Industry Inputs
+    for resource_id, quantity in resolve_quantities(inputs_required, session).items():
         industry_input = IndustryInput(
             industry_id=industry.id,
-            resource_id=resource.id,
+            resource_id=resource_id,
             quantity=quantity,
         )
         session.add(industry_input)
 
     # Add Industry Outputs
-    outputs_produced = json.loads(action.outputs_produced)
-    for resource_name, quantity in outputs_produced.items():
-        resource = get_or_create_resource(resource_name, session)
+    for resource_id, quantity in resolve_quantities(outputs_produced, session).items():
         industry_output = IndustryOutput(
             industry_id=industry.id,
-            resource_id=resource.id,
+            resource_id=resource_id,
             quantity=quantity,
         )
         session.add(industry_output)
@@ -363,6 +493,9 @@ def apply_upgrade_technology_action(action: UpgradeTechnologyAction, country: Co
 def apply_buy_sell_resource_action(action_data, country: Country, turn_number: int, session: Session):
     """
     Applies a BuySellResource action to the game state.
+
+    The trade is placed as an order with TotalCost or TotalRevenue as its limit, and filled when
+    the market clears at the end of the decision phase, see market.clear_market.
     """
     details = action_data.get("Details", {})
     transaction_type = details.get("TransactionType")
@@ -374,214 +507,21 @@ def apply_buy_sell_resource_action(action_data, country: Country, turn_number: i
     if not all([transaction_type, resource_name, quantity, total_price]):
         raise InvalidActionException(f"Invalid BuySellResource action data for country {country.name}.")
 
-    # Convert total_price to Decimal
-    total_price = Decimal(str(total_price))
+    if transaction_type not in ("Buy", "Sell"):
+        raise InvalidActionException(f"Invalid TransactionType '{transaction_type}' for BuySellResource action.")
 
-    # Get the resource
-    resource = session.query(Resource).filter_by(name=resource_name).first()
+    # Get the resource, under any of its spellings
+    resource = get_resource(resource_name, session)
     if not resource:
         raise InvalidActionException(f"Resource '{resource_name}' not found.")
 
-    # Get or create the country's stockpile for the resource
-    stockpile = session.query(Stockpile).filter_by(country_id=country.id, resource_id=resource.id).first()
-    if not stockpile:
-        if transaction_type == "Sell":
-            raise InvalidActionException(f"Country '{country.name}' does not have any stockpile of '{resource_name}' to sell.")
-        # If stockpile doesn't exist, create it with zero quantity for buying
-        stockpile = Stockpile(country_id=country.id, resource_id=resource.id, quantity=0)
-        session.add(stockpile)
-        session.flush()  # To get stockpile.id
-
-    max_transaction_per_turn = resource.max_transaction_per_turn
-
-    if quantity > max_transaction_per_turn:
-        raise InvalidActionException(f"Transaction quantity {quantity} exceeds MaxTransactionPerTurn for resource '{resource_name}'.")
-
-    if transaction_type == "Buy":
-        # Check if country has enough capital
-        if country.government_capital < total_price:
-            raise InvalidActionException(f"Country '{country.name}' does not have enough capital to buy {quantity} of '{resource_name}' (needs {total_price}, has {country.government_capital}).")
-
-        # Update country's capital
-        country.government_capital -= total_price
-
-        # Update stockpile
-        stockpile.quantity += quantity
-
-        print(f"Country '{country.name}' bought {quantity} of '{resource_name}' for {total_price}.")
-
-    elif transaction_type == "Sell":
-        # Check if country has enough resource in stockpile
-        if stockpile.quantity < quantity:
-            raise InvalidActionException(f"Country '{country.name}' does not have enough '{resource_name}' to sell {quantity} (has {stockpile.quantity}).")
-
-        # Update stockpile
-        stockpile.quantity -= quantity
-
-        # Update country's capital
-        country.government_capital += total_price
-
-        print(f"Country '{country.name}' sold {quantity} of '{resource_name}' for {total_price}.")
-
-    else:
-        raise InvalidActionException(f"Invalid TransactionType '{transaction_type}' for BuySellResource action.")
-
-    # Record the transaction
-    # Get the current turn
-    turn = session.query(Turn).filter(
-        and_(Turn.game_id == country.game_id, Turn.turn_number == turn_number)
-    ).first()
-    if not turn:
-        # Create a new Turn if it doesn't exist
-        turn = Turn(
-            game_id=country.game_id,
-            turn_number=turn_number
-        )
-        session.add(turn)
-        session.flush()
-
-    # Calculate price per unit as Decimal
-    price_per_unit = total_price / Decimal(quantity)
-
-    transaction = MarketTransaction(
-        turn_id=turn.id,
-        country_id=country.id,
-        resource_id=resource.id,
-        transaction_type=transaction_type,
-        quantity=quantity,
-        price_per_unit=price_per_unit,
-        total_price=total_price
-    )
-    session.add(transaction)
-
-    # Adjust the resource price after the transaction
-    quantity_threshold = resource.quantity_threshold
-    if quantity_threshold == 0:
+    market = get_resource_market(country.game_id, resource.id, session)
+    if market and market.quantity_threshold == 0:
         raise InvalidActionException(f"Resource '{resource_name}' has zero quantity_threshold.")
 
-    # Calculate the percentage change proportionally using Decimal
-    percentage_change = Decimal('0.05') * (Decimal(quantity) / Decimal(quantity_threshold))
-
-    if transaction_type == "Buy":
-        # Buying increases demand, price goes up
-        new_price = resource.current_price * (Decimal('1') + percentage_change)
-    elif transaction_type == "Sell":
-        # Selling increases supply, price goes down
-        new_price = resource.current_price * (Decimal('1') - percentage_change)
-    else:
-        raise InvalidActionException(f"Invalid TransactionType '{transaction_type}' for BuySellResource action.")
-
-    # Ensure new price is within MinPrice and MaxPrice
-    new_price = max(min(new_price, resource.max_price), resource.min_price)
-    print(f"Adjusted price of '{resource_name}' from {resource.current_price} to {new_price} based on transaction of {quantity} units.")
-    resource.current_price = new_price
-
-def get_or_create_resource(resource_name, session: Session):
-    """
-    Gets a Resource by name, or creates it if it doesn't exist.
-    """
-    resource = session.query(Resource).filter_by(name=resource_name).first()
-    if not resource:
-        # Create a new Resource with default values
-        resource = Resource(
-            name=resource_name,
-            base_price=Decimal('0.00'),  # Placeholder, to be set later
-            current_price=Decimal('0.00'),  # Placeholder, to be set later
-            quantity_threshold=0,  # Placeholder, to be set later
-            max_transaction_per_turn=0,  # Placeholder, to be set later
-            max_price=Decimal('0.00'),  # Placeholder, to be set later
-            min_price=Decimal('0.00'),  # Placeholder, to be set later
-        )
-        session.add(resource)
-        session.flush()  # Get resource.id
-    return resource
-
-def get_openai_response(prompt):
-    """
-    Sends the prompt to the OpenAI API and returns the response text.
-    """
     try:
-        # Send the prompt to OpenAI API
-        response = client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-        )
-        response_text = response.choices[0].message.content.strip()
-        return response_text
-    except Exception as e:
-        print(f"OpenAI API error: {e}")
-        return ""
-
-def prepare_country_schema(country: Country, session: Session):
-    """
-    Prepares the country schema as a dictionary for the prompt.
-    """
-    # Industries
-    industries = []
-    for industry in country.industries:
-        # Inputs
-        inputs = {}
-        for industry_input in industry.inputs:
-            resource_name = industry_input.resource.name
-            quantity = industry_input.quantity
-            inputs[resource_name] = quantity
-
-        # Outputs
-        outputs = {}
-        for industry_output in industry.outputs:
-            resource_name = industry_output.resource.name
-            quantity = industry_output.quantity
-            outputs[resource_name] = quantity
-
-        industry_data = {
-            "Industry ID": industry.industry_id,
-            "Type": industry.type,
-            "Sub-Type": industry.sub_type,
-            "Production Level": industry.production_level,
-            "Technology Level": industry.technology_level,
-            "Inputs": inputs,
-            "Outputs": outputs,
-            "Skilled Workers Employed": industry.skilled_workers_employed,
-            "Unskilled Workers Employed": industry.unskilled_workers_employed
-        }
-        industries.append(industry_data)
-
-    # Workforce
-    workforce = {
-        "Unemployed Skilled Workers": country.unemployed_skilled_workers,
-        "Unemployed Unskilled Workers": country.unemployed_unskilled_workers
-    }
-
-    # Stockpiles
-    stockpiles = {}
-    for stockpile in country.stockpiles:
-        resource_name = stockpile.resource.name
-        quantity = stockpile.quantity
-        stockpiles[resource_name] = quantity
-
-    # Natural Resources
-    natural_resources = {}
-    for nat_resource in country.natural_resources:
-        resource_name = nat_resource.resource.name
-        resource_info = {
-            "Total Reserves": nat_resource.total_reserves,
-            "Extraction Rate": nat_resource.extraction_rate
-        }
-        natural_resources[resource_name] = resource_info
-
-    # Country schema
-    country_schema = {
-        "Country Name": country.name,
-        "Government Capital Pool": float(country.government_capital),
-        "Industries": industries,
-        "Workforce": workforce,
-        "Stockpiles": stockpiles,
-        "Natural Resources": natural_resources
-    }
+        place_order(country, turn_number, resource, transaction_type, quantity, total_price, session)
+    except MarketOrderError as e:
+        raise InvalidActionException(str(e))
 
-    return country_schema
\ No newline at end of file
+    print(f"Country '{country.name}' placed an order to {transaction_type.lower()} {quantity} of '{resource_name}' for {total_price}.")
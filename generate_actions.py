@@ -1,22 +1,43 @@
 # gameplay.py
 
-import os
 import json
-from openai import OpenAI
 from sqlalchemy.orm import Session
+from llm_client import get_openai_responses, stream_openai_response, is_llm_degraded
+from json_stream import StreamedItems, MalformedJSONError, parse_json_items, check_fields, NUMBER
+import procedural_options
+from country_schema import get_country_schema, get_country_schemas
+from prompt_templates import build_prompt
+from prompt_encoding import encode_country_schema
 from models import (
-    Game, Turn, Country, Industry, Action,
+    Game, Turn, Country, Industry,
     StartNewIndustryAction, ExpandIndustryAction, UpgradeTechnologyAction
 )
 from sqlalchemy import and_
 
-# Get API Key from environment variable OPENROUTER_API_KEY
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-
-def generate_action_options_for_all_countries(game: Game, turn_number: int, session: Session):
+# Procedural generator of each kind of options, also used when an LLM request fails
+PROCEDURAL_GENERATORS = {
+    'NewIndustries': procedural_options.generate_new_industry_options,
+    'IndustryExpansions': procedural_options.generate_expand_industry_options,
+    'TechnologyUpgrades': procedural_options.generate_tech_upgrade_options,
+}
+
+# Fields every option of each kind must have before it is stored
+OPTION_FIELDS = {
+    'NewIndustries': {
+        'Industry ID': str, 'Type': {'Primary', 'Secondary', 'Tertiary'}, 'Sub-Type': str, 'Setup Cost': NUMBER,
+        'Production Level': int, 'Technology Level': int, 'Skilled Workers Required': int, 'Unskilled Workers Required': int,
+    },
+    'IndustryExpansions': {
+        'Industry ID': str, 'New Production Level': int, 'Expansion Cost': NUMBER,
+        'Additional Skilled Workers Required': int, 'Additional Unskilled Workers Required': int,
+    },
+    'TechnologyUpgrades': {
+        'Industry ID': str, 'New Technology Level': int, 'Upgrade Cost': NUMBER, 'Time to Complete': int,
+    },
+}
+
+
+def generate_action_options_for_all_countries(game: Game, turn_number: int, session: Session, max_concurrency: int = 1, option_mode: str = "llm", seed=None):
     """
     Generates action options for all countries at the start of a turn.
 
@@ -24,6 +45,11 @@ def generate_action_options_for_all_countries(game: Game, turn_number: int, sess
         game (Game): The current game instance.
         turn_number (int): The current turn number.
         session (Session): The SQLAlchemy session.
+        max_concurrency (int): Maximum number of LLM requests in flight at once.
+            With 1, countries and option kinds are processed one after another.
+        option_mode (str): "llm" to ask the LLM for options, or "procedural" to derive them
+            locally from the game's industries and resources.
+        seed: Seed for the procedural generator, also used for the options of failed LLM requests.
     """
     countries = session.query(Country).filter_by(game_id=game.id).all()
     if not countries:
@@ -32,18 +58,130 @@ def generate_action_options_for_all_countries(game: Game, turn_number: int, sess
 
     print(f"Generating action options for Turn {turn_number}...")
 
+    # Load every country's schema with one query, the generators then read it from the cache
+    get_country_schemas(countries, session, turn_number)
+
+    if option_mode == "llm" and is_llm_degraded():
+        print("LLM provider is degraded, generating the options procedurally this turn.")
+        option_mode = "procedural"
+
+    if option_mode == "procedural":
+        generate_action_options_procedurally(countries, turn_number, session, seed)
+    elif option_mode != "llm":
+        raise ValueError(f"Unknown option mode: {option_mode}.")
+    elif max_concurrency > 1:
+        generate_action_options_concurrently(countries, turn_number, session, max_concurrency, seed)
+    else:
+        # Industry catalogue of the procedural fallback, built on the first failed request
+        catalogues = {}
+        for country in countries:
+            print(f"Processing country: {country.name}")
+            # Generate options for new industries
+            generate_new_industry_options(country, turn_number, session, seed, catalogues)
+            # Generate options for expanding industries
+            generate_expand_industry_options(country, turn_number, session, seed, catalogues)
+            # Generate options for technology upgrades
+            generate_tech_upgrade_options(country, turn_number, session, seed, catalogues)
+
+    print(f"Action options for Turn {turn_number} have been generated.")
+
+def generate_action_options_concurrently(countries, turn_number: int, session: Session, max_concurrency: int, seed=None):
+    """
+    Generates the options of every kind for all countries with the LLM requests sent in parallel.
+
+    All prompts are built up front on the calling thread, so the session is never used by the
+    worker threads. The responses are then parsed and stored one by one in country order, through
+    the same store functions as the sequential path.
+
+    Args:
+        countries (list): List of Country instances.
+        turn_number (int): The current turn number.
+        session (Session): The SQLAlchemy session.
+        max_concurrency (int): Maximum number of LLM requests in flight at once.
+        seed: Seed for the procedural options of failed requests.
+    """
+    option_kinds = [
+        ("new industry", "generate_new_industries", 'NewIndustries', store_new_industry_actions),
+        ("expand industry", "generate_expand_options", 'IndustryExpansions', store_expand_industry_actions),
+        ("technology upgrade", "generate_tech_upgrades", 'TechnologyUpgrades', store_tech_upgrade_actions),
+    ]
+
+    # Snapshot every prompt before any request is sent
+    jobs = []
+    for country in countries:
+        country_schema = get_country_schema(country, session, turn_number)
+        for option_kind, call_site, key, store_actions in option_kinds:
+            prompt = prepare_option_prompt(call_site, country_schema)
+            jobs.append((country, option_kind, key, store_actions, (call_site, prompt)))
+
+    print(f"Sending {len(jobs)} option requests with up to {max_concurrency} in parallel...")
+    responses = get_openai_responses([job[4] for job in jobs], max_concurrency=max_concurrency)
+
+    # Store the results in submission order so the DB writes stay serialized and deterministic
+    catalogues = {}
+    for (country, option_kind, key, store_actions, _), response_text in zip(jobs, responses):
+        options_data = parse_action_response(response_text, key=key)
+        if options_data:
+            store_actions(country, turn_number, options_data, session)
+        elif not response_text:
+            generate_fallback_options(country, turn_number, session, key, store_actions, seed, catalogues)
+        else:
+            print(f"Failed to generate {option_kind} options for {country.name}.")
+
+def generate_action_options_procedurally(countries, turn_number: int, session: Session, seed=None):
+    """
+    Generates the options of every kind for all countries without the LLM.
+
+    Args:
+        countries (list): List of Country instances.
+        turn_number (int): The current turn number.
+        session (Session): The SQLAlchemy session.
+        seed: Seed for the procedural generator.
+    """
+    option_kinds = [
+        ('NewIndustries', store_new_industry_actions),
+        ('IndustryExpansions', store_expand_industry_actions),
+        ('TechnologyUpgrades', store_tech_upgrade_actions),
+    ]
+    catalogue = procedural_options.build_industry_catalogue(countries[0].game_id, session)
+
     for country in countries:
         print(f"Processing country: {country.name}")
-        # Generate options for new industries
-        generate_new_industry_options(country, turn_number, session)
-        # Generate options for expanding industries
-        generate_expand_industry_options(country, turn_number, session)
-        # Generate options for technology upgrades
-        generate_tech_upgrade_options(country, turn_number, session)
+        country_schema = get_country_schema(country, session, turn_number)
 
-    print(f"Action options for Turn {turn_number} have been generated.")
+        for key, store_actions in option_kinds:
+            rng = procedural_options.make_rng(seed, country_schema, turn_number, key)
+            options_data = PROCEDURAL_GENERATORS[key](country_schema, catalogue, rng)
+            if options_data:
+                store_actions(country, turn_number, options_data, session)
+
+def generate_fallback_options(country: Country, turn_number: int, session: Session, key: str, store_actions, seed=None, catalogues=None):
+    """
+    Generates one kind of options for a country procedurally after its LLM request failed.
 
-def generate_new_industry_options(country: Country, turn_number: int, session: Session):
+    Args:
+        country (Country): The country instance.
+        turn_number (int): The current turn number.
+        session (Session): The SQLAlchemy session.
+        key (str): The kind of options, e.g. 'NewIndustries'.
+        store_actions (callable): The store function of that kind of options.
+        seed: Seed for the procedural generator.
+        catalogues (dict): Industry catalogue by game ID, shared by the fallbacks of a phase so
+            that it is built once.
+    """
+    print(f"No {key} options received for {country.name}, generating them procedurally.")
+    country_schema = get_country_schema(country, session, turn_number)
+    if catalogues is None:
+        catalogues = {}
+    if country.game_id not in catalogues:
+        catalogues[country.game_id] = procedural_options.build_industry_catalogue(country.game_id, session)
+    catalogue = catalogues[country.game_id]
+    rng = procedural_options.make_rng(seed, country_schema, turn_number, key)
+    options_data = PROCEDURAL_GENERATORS[key](country_schema, catalogue, rng)
+    if options_data:
+        store_actions(country, turn_number, options_data, session)
+
+def generate_new_industry_options(country: Country, turn_number: int, session: Session, seed=None, catalogues=None):
     """
     Generates new industry options for a country.
 
@@ -51,31 +189,23 @@ def generate_new_industry_options(country: Country, turn_number: int, session: S
         country (Country): The country instance.
         turn_number (int): The current turn number.
         session (Session): The SQLAlchemy session.
+        seed: Seed for the procedural options if the request fails.
+        catalogues (dict): Industry catalogue by game ID, see generate_fallback_options.
     """
     # Get the country's schema
-    country_schema = prepare_country_schema(country, session)
-
-    # Read the prompt for generating new industries
-    with open('prompts/gameplay/generateNewIndustries.md', 'r') as f:
-        base_prompt = f.read()
+    country_schema = get_country_schema(country, session, turn_number)
 
     # Prepare the prompt by inserting the country schema
-    country_schema_json = json.dumps(country_schema, indent=2)
-    prompt = f"{base_prompt}\n\n---\n\n**Country Schema:**\n\n```json\n{country_schema_json}\n```"
-
-    # Get the OpenAI API response
-    response_text = get_openai_response(prompt)
+    prompt = prepare_option_prompt("generate_new_industries", country_schema)
 
-    # Parse the JSON response
-    new_industries_data = parse_action_response(response_text, key='NewIndustries')
-
-    # Store the actions in the database
-    if new_industries_data:
-        store_new_industry_actions(country, turn_number, new_industries_data, session)
+    # Stream the options, each one is stored as soon as it has arrived
+    options_stream = StreamedItems(stream_openai_response(prompt, call_site="generate_new_industries"), 'NewIndustries', lambda option: validate_option(option, 'NewIndustries'))
+    if options_stream.start():
+        store_new_industry_actions(country, turn_number, options_stream, session)
     else:
-        print(f"Failed to generate new industry options for {country.name}.")
+        generate_fallback_options(country, turn_number, session, 'NewIndustries', store_new_industry_actions, seed, catalogues)
 
-def generate_expand_industry_options(country: Country, turn_number: int, session: Session):
+def generate_expand_industry_options(country: Country, turn_number: int, session: Session, seed=None, catalogues=None):
     """
     Generates expand industry options for a country.
 
@@ -83,31 +213,23 @@ def generate_expand_industry_options(country: Country, turn_number: int, session
         country (Country): The country instance.
         turn_number (int): The current turn number.
         session (Session): The SQLAlchemy session.
+        seed: Seed for the procedural options if the request fails.
+        catalogues (dict): Industry catalogue by game ID, see generate_fallback_options.
     """
     # Get the country's schema
-    country_schema = prepare_country_schema(country, session)
-
-    # Read the prompt for generating expand options
-    with open('prompts/gameplay/generateExpandOptions.md', 'r') as f:
-        base_prompt = f.read()
+    country_schema = get_country_schema(country, session, turn_number)
 
     # Prepare the prompt by inserting the country schema
-    country_schema_json = json.dumps(country_schema, indent=2)
-    prompt = f"{base_prompt}\n\n---\n\n**Country Schema:**\n\n```json\n{country_schema_json}\n```"
-
-    # Get the OpenAI API response
-    response_text = get_openai_response(prompt)
-
-    # Parse the JSON response
-    expand_options_data = parse_action_response(response_text, key='IndustryExpansions')
+    prompt = prepare_option_prompt("generate_expand_options", country_schema)
 
-    # Store the actions in the database
-    if expand_options_data:
-        store_expand_industry_actions(country, turn_number, expand_options_data, session)
+    # Stream the options, each one is stored as soon as it has arrived
+    options_stream = StreamedItems(stream_openai_response(prompt, call_site="generate_expand_options"), 'IndustryExpansions', lambda option: validate_option(option, 'IndustryExpansions'))
+    if options_stream.start():
+        store_expand_industry_actions(country, turn_number, options_stream, session)
     else:
-        print(f"Failed to generate expand industry options for {country.name}.")
+        generate_fallback_options(country, turn_number, session, 'IndustryExpansions', store_expand_industry_actions, seed, catalogues)
 
-def generate_tech_upgrade_options(country: Country, turn_number: int, session: Session):
+def generate_tech_upgrade_options(country: Country, turn_number: int, session: Session, seed=None, catalogues=None):
     """
     Generates technology upgrade options for a country.
 
@@ -115,56 +237,36 @@ def generate_tech_upgrade_options(country: Country, turn_number: int, session: S
         country (Country): The country instance.
         turn_number (int): The current turn number.
         session (Session): The SQLAlchemy session.
+        seed: Seed for the procedural options if the request fails.
+        catalogues (dict): Industry catalogue by game ID, see generate_fallback_options.
     """
     # Get the country's schema
-    country_schema = prepare_country_schema(country, session)
-
-    # Read the prompt for generating tech upgrade options
-    with open('prompts/gameplay/generateTechUpgradeOptions.md', 'r') as f:
-        base_prompt = f.read()
+    country_schema = get_country_schema(country, session, turn_number)
 
     # Prepare the prompt by inserting the country schema
-    country_schema_json = json.dumps(country_schema, indent=2)
-    prompt = f"{base_prompt}\n\n---\n\n**Country Schema:**\n\n```json\n{country_schema_json}\n```"
-
-    # Get the OpenAI API response
-    response_text = get_openai_response(prompt)
+    prompt = prepare_option_prompt("generate_tech_upgrades", country_schema)
 
-    # Parse the JSON response
-    tech_upgrade_data = parse_action_response(response_text, key='TechnologyUpgrades')
-
-    # Store the actions in the database
-    if tech_upgrade_data:
-        store_tech_upgrade_actions(country, turn_number, tech_upgrade_data, session)
+    # Stream the options, each one is stored as soon as it has arrived
+    options_stream = StreamedItems(stream_openai_response(prompt, call_site="generate_tech_upgrades"), 'TechnologyUpgrades', lambda option: validate_option(option, 'TechnologyUpgrades'))
+    if options_stream.start():
+        store_tech_upgrade_actions(country, turn_number, options_stream, session)
     else:
-        print(f"Failed to generate technology upgrade options for {country.name}.")
+        generate_fallback_options(country, turn_number, session, 'TechnologyUpgrades', store_tech_upgrade_actions, seed, catalogues)
 
-def get_openai_response(prompt):
+def prepare_option_prompt(call_site: str, country_schema: dict, prompt_mode: str = None):
     """
-    Sends the prompt to the OpenAI API and returns the response text.
+    Prepares an option generation prompt by appending the country schema to the call site's template.
 
     Args:
-        prompt (str): The prompt to send.
+        call_site (str): The call site whose template is used (e.g. 'generate_new_industries').
+        country_schema (dict): The country schema.
+        prompt_mode (str): "verbose" or "compact", see prompt_encoding.PROMPT_MODE.
 
     Returns:
-        str: The response text from OpenAI.
+        str: The prepared prompt.
     """
-    try:
-        # Send the prompt to OpenAI API
-        response = client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-        )
-        response_text = response.choices[0].message.content.strip()
-        return response_text
-    except Exception as e:
-        print(f"OpenAI API error: {e}")
-        return ""
+    country_schema_block = encode_country_schema(country_schema, prompt_mode)
+    return build_prompt(call_site, f"\n\n---\n\n**Country Schema:**\n\n{country_schema_block}")
 
 def parse_action_response(response_text, key):
     """
@@ -178,23 +280,22 @@ def parse_action_response(response_text, key):
         list: Parsed action data if successful, None otherwise.
     """
     try:
-        # Remove code fences if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]  # Remove ```json
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]  # Remove ```
-        response_text = response_text.strip()
-
-        # Parse JSON
-        action_data = json.loads(response_text)
-
-        return action_data.get(key, [])
-    except json.JSONDecodeError as e:
+        return parse_json_items(response_text, key, lambda option: validate_option(option, key))
+    except MalformedJSONError as e:
         print("Failed to parse JSON response.")
         print("Response text:", response_text)
         print("Error message:", str(e))
         return None
 
+def validate_option(option, key):
+    """
+    Checks that an option has the fields of its kind.
+
+    Raises:
+        MalformedJSONError: If the option is invalid.
+    """
+    check_fields(option, OPTION_FIELDS[key], f"{key} option")
+
 def store_new_industry_actions(country: Country, turn_number: int, new_industries_data, session: Session):
     """
     Stores StartNewIndustryAction instances in the database.
@@ -202,7 +303,7 @@ def store_new_industry_actions(country: Country, turn_number: int, new_industrie
     Args:
         country (Country): The Country instance.
         turn_number (int): The current turn number.
-        new_industries_data (list): List of new industry options.
+        new_industries_data: List of new industry options, or StreamedItems storing them as they arrive.
         session (Session): The SQLAlchemy session.
     """
     try:
@@ -219,6 +320,7 @@ def store_new_industry_actions(country: Country, turn_number: int, new_industrie
             session.add(turn)
             session.flush()
 
+        stored_options = 0
         for industry_option in new_industries_data:
             action = StartNewIndustryAction(
                 turn_id=turn.id,
@@ -236,9 +338,10 @@ def store_new_industry_actions(country: Country, turn_number: int, new_industrie
                 unskilled_workers_required=industry_option.get('Unskilled Workers Required'),
             )
             session.add(action)
+            stored_options += 1
 
         session.commit()
-        print(f"Stored {len(new_industries_data)} new industry options for country {country.name}.")
+        print(f"Stored {stored_options} new industry options for country {country.name}.")
 
     except Exception as e:
         session.rollback()
@@ -251,7 +354,7 @@ def store_expand_industry_actions(country: Country, turn_number: int, expand_opt
     Args:
         country (Country): The Country instance.
         turn_number (int): The current turn number.
-        expand_options_data (list): List of expand industry options.
+        expand_options_data: List of expand industry options, or StreamedItems storing them as they arrive.
         session (Session): The SQLAlchemy session.
     """
     try:
@@ -268,6 +371,7 @@ def store_expand_industry_actions(country: Country, turn_number: int, expand_opt
             session.add(turn)
             session.flush()
 
+        stored_options = 0
         for expand_option in expand_options_data:
             # Get the industry
             industry = session.query(Industry).filter_by(
@@ -291,9 +395,10 @@ def store_expand_industry_actions(country: Country, turn_number: int, expand_opt
                 additional_inputs_required=json.dumps(expand_option.get('Additional Inputs Required', {})),
             )
             session.add(action)
+            stored_options += 1
 
         session.commit()
-        print(f"Stored {len(expand_options_data)} expand industry options for country {country.name}.")
+        print(f"Stored {stored_options} expand industry options for country {country.name}.")
 
     except Exception as e:
         session.rollback()
@@ -317,6 +422,7 @@ def store_tech_upgrade_actions(country: Country, turn_number: int, tech_upgrade_
             session.add(turn)
             session.flush()
 
+        stored_options = 0
         for upgrade_option in tech_upgrade_data:
             # Get the industry
             industry = session.query(Industry).filter_by(
@@ -341,90 +447,11 @@ def store_tech_upgrade_actions(country: Country, turn_number: int, tech_upgrade_
                 benefits=benefits_json,  # Store benefits as a JSON string
             )
             session.add(action)
+            stored_options += 1
 
         session.commit()
-        print(f"Stored {len(tech_upgrade_data)} technology upgrade options for country {country.name}.")
+        print(f"Stored {stored_options} technology upgrade options for country {country.name}.")
 
     except Exception as e:
         session.rollback()
         print(f"Error storing technology upgrade actions for {country.name}: {e}")
-
-
-# HELPER FUNCTION
-
-def prepare_country_schema(country: Country, session: Session):
-    """
-    Prepares the country schema as a dictionary for the prompt.
-
-    Args:
-        country (Country): The Country instance.
-        session (Session): The SQLAlchemy session.
-
-    Returns:
-        dict: The country schema.
-    """
-    # Industries
-    industries = []
-    for industry in country.industries:
-        # Inputs
-        inputs = {}
-        for industry_input in industry.inputs:
-            resource_name = industry_input.resource.name
-            quantity = industry_input.quantity
-            inputs[resource_name] = quantity
-
-        # Outputs
-        outputs = {}
-        for industry_output in industry.outputs:
-            resource_name = industry_output.resource.name
-            quantity = industry_output.quantity
-            outputs[resource_name] = quantity
-
-        industry_data = {
-            "Industry ID": industry.industry_id,
-            "Type": industry.type,
-            "Sub-Type": industry.sub_type,
-            "Production Level": industry.production_level,
-            "Technology Level": industry.technology_level,
-            "Inputs": inputs,
-            "Outputs": outputs,
-            "Skilled Workers Employed": industry.skilled_workers_employed,
-            "Unskilled Workers Employed": industry.unskilled_workers_employed
-        }
-        industries.append(industry_data)
-
-    # Workforce
-    workforce = {
-        "Unemployed Skilled Workers": country.unemployed_skilled_workers,
-        "Unemployed Unskilled Workers": country.unemployed_unskilled_workers
-    }
-
-    # Stockpiles
-    stockpiles = {}
-    for stockpile in country.stockpiles:
-        resource_name = stockpile.resource.name
-        quantity = stockpile.quantity
-        stockpiles[resource_name] = quantity
-
-    # Natural Resources
-    natural_resources = {}
-    for nat_resource in country.natural_resources:
-        resource_name = nat_resource.resource.name
-        resource_info = {
-            "Total Reserves": nat_resource.total_reserves,
-            "Extraction Rate": nat_resource.extraction_rate
-        }
-        natural_resources[resource_name] = resource_info
-
-    # Country schema
-    country_schema = {
-        "Country Name": country.name,
-        "Government Capital Pool": float(country.government_capital),
-        "Industries": industries,
-        "Workforce": workforce,
-        "Stockpiles": stockpiles,
-        "Natural Resources": natural_resources
-    }
-
-    return country_schema
-
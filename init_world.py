@@ -1,15 +1,17 @@
 # init_world.py
 
-import os
 import json
-from openai import OpenAI
+import time
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from models import Country, Industry, IndustryInput, IndustryOutput, Stockpile, NaturalResource, Resource
+from json_stream import parse_json_text, MalformedJSONError
+from llm_client import get_openai_response, is_llm_degraded
+from prompt_templates import build_prompt
+from resource_cache import get_resource_ids, resolve_quantities
+from models import Country, Industry, IndustryInput, IndustryOutput, Stockpile, NaturalResource
 
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Attempts at generating each country before it is given up
+COUNTRY_GENERATION_ATTEMPTS = 3
 
 
 def generate_initial_world(game, num_players, session: Session):
@@ -26,24 +28,35 @@ def generate_initial_world(game, num_players, session: Session):
 
     for i in range(num_players):
         print(f"Generating country {i+1}/{num_players}...")
-        # Generate country data using OpenAI API
-        country_data = generate_country(existing_countries)
+        # Generate country data using the LLM, a failed or unparsable response is asked again
+        country_data = None
+        for attempt in range(COUNTRY_GENERATION_ATTEMPTS):
+            if is_llm_degraded():
+                break
+            country_data = generate_country(existing_countries, use_cache=attempt == 0)
+            if country_data:
+                break
         if country_data:
-            # Add the country to the database
-            add_country_to_db(country_data, game.id, session)
-            # Append the country's schema to existing_countries
+            # Append the country's schema to existing_countries, all are added to the database at the end
             existing_countries.append(country_data)
         else:
             print(f"Failed to generate country {i+1}.")
 
-    print("All AI countries have been generated.")
+    # Add the whole world to the database in one transaction
+    added = add_countries_to_db(existing_countries, game.id, session)
 
-def generate_country(existing_countries):
+    if added < num_players:
+        print(f"WARNING: only {added} of {num_players} AI countries could be generated.")
+    else:
+        print("All AI countries have been generated.")
+
+def generate_country(existing_countries, use_cache=True):
     """
     Generates a country's data using the OpenAI API.
 
     Args:
         existing_countries (list): List of existing countries' data.
+        use_cache (bool): Whether a cached response can be used, False to ask again.
 
     Returns:
         dict: Parsed country data if successful, None otherwise.
@@ -52,7 +65,7 @@ def generate_country(existing_countries):
     prompt = generate_prompt(existing_countries)
 
     # Get the OpenAI API response
-    response_text = get_openai_response(prompt)
+    response_text = get_openai_response(prompt, call_site="generate_country", use_cache=use_cache)
 
     # Parse the JSON response
     country_data = parse_country_response(response_text)
@@ -69,47 +82,15 @@ def generate_prompt(existing_countries):
     Returns:
         str: The prepared prompt.
     """
-    # Read the contents of generatePlayers.md
-    with open('prompts/initialize/generatePlayers.md', 'r') as f:
-        base_prompt = f.read()
-
     # Include existing countries in the prompt if any
     if existing_countries:
         existing_countries_json = json.dumps(existing_countries, indent=2)
-        prompt = f"{base_prompt}\n\nExisting Countries:\n{existing_countries_json}"
+        prompt = build_prompt("generate_country", f"\n\nExisting Countries:\n{existing_countries_json}")
     else:
-        prompt = base_prompt
+        prompt = build_prompt("generate_country")
 
     return prompt
 
-def get_openai_response(prompt):
-    """
-    Sends the prompt to the OpenAI API and returns the response text.
-
-    Args:
-        prompt (str): The prompt to send.
-
-    Returns:
-        str: The response text from OpenAI.
-    """
-
-    try:
-        # Send the prompt to OpenAI API
-        response = client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=[
-                {   
-                    "role": "user", 
-                    "content": prompt
-                } 
-            ],
-        )
-        response_text = response.choices[0].message.content.strip()
-        return response_text
-    except Exception as e:
-        print(f"OpenAI API error: {e}")
-        return ""
-
 def parse_country_response(response_text):
     """
     Parses the JSON response from OpenAI into a Python dictionary.
@@ -120,141 +101,197 @@ def parse_country_response(response_text):
     Returns:
         dict: Parsed country data if successful, None otherwise.
     """
-    # The response is expected to be in JSON format within code fences
+    # The response is expected to be in JSON format, optionally within code fences
     try:
-        # Remove code fences if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]  # Remove ```json
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]  # Remove ```
-        response_text = response_text.strip()
-
-        # Parse JSON
-        country_data = json.loads(response_text)
+        country_data = parse_json_text(response_text)
         return country_data
-    except json.JSONDecodeError as e:
+    except MalformedJSONError as e:
         print("Failed to parse JSON response.")
         print("Response text:", response_text)
         print("Error message:", str(e))
         return None
 
-def add_country_to_db(country_data, game_id, session: Session):
+def add_countries_to_db(countries_data, game_id, session: Session):
     """
-    Maps the country data to SQLAlchemy models and inserts them into the database.
+    Inserts every country of the world into the database at once, and commits.
+
+    The resources of all countries are resolved first. Each table is then written with one
+    multi-row INSERT, see insert_returning_ids for the countries and industries whose IDs the
+    rows of the other tables need, and the world is committed in a single transaction. A
+    country whose data is incomplete is left out.
 
     Args:
-        country_data (dict): The country data to insert.
+        countries_data (list): The data of each country to insert.
         game_id (int): The ID of the current game.
         session (Session): The SQLAlchemy session.
+
+    Returns:
+        int: The number of countries inserted.
     """
+    start = time.perf_counter()
     try:
-        # Create Country instance
-        country = Country(
-            game_id=game_id,
-            name=country_data["Country Name"],
-            is_ai=True,
-            government_capital=country_data["Government Capital Pool"],
-            # Workforce details
-            total_skilled_workers=(
-                country_data["Workforce"]["Unemployed Skilled Workers"] +
-                sum(industry["Skilled Workers Employed"] for industry in country_data["Industries"])
-            ),
-            total_unskilled_workers=(
-                country_data["Workforce"]["Unemployed Unskilled Workers"] +
-                sum(industry["Unskilled Workers Employed"] for industry in country_data["Industries"])
-            ),
-            unemployed_skilled_workers=country_data["Workforce"]["Unemployed Skilled Workers"],
-            unemployed_unskilled_workers=country_data["Workforce"]["Unemployed Unskilled Workers"],
-        )
-        session.add(country)
-        session.flush()  # Get country.id
-
-        # Add Industries
-        for industry_data in country_data["Industries"]:
-            industry = Industry(
-                country_id=country.id,
-                industry_id=industry_data["Industry ID"],
-                type=industry_data["Type"],
-                sub_type=industry_data["Sub-Type"],
-                production_level=industry_data["Production Level"],
-                technology_level=industry_data["Technology Level"],
-                skilled_workers_employed=industry_data["Skilled Workers Employed"],
-                unskilled_workers_employed=industry_data["Unskilled Workers Employed"],
-            )
-            session.add(industry)
-            session.flush()  # Get industry.id
-
-            # Add Industry Inputs
-            for resource_name, quantity in industry_data.get("Inputs", {}).items():
-                resource = get_or_create_resource(resource_name, session)
-                industry_input = IndustryInput(
-                    industry_id=industry.id,
-                    resource_id=resource.id,
-                    quantity=quantity,
-                )
-                session.add(industry_input)
-
-            # Add Industry Outputs
-            for resource_name, quantity in industry_data.get("Outputs", {}).items():
-                resource = get_or_create_resource(resource_name, session)
-                industry_output = IndustryOutput(
-                    industry_id=industry.id,
-                    resource_id=resource.id,
-                    quantity=quantity,
-                )
-                session.add(industry_output)
-
-        # Add Stockpiles
-        for resource_name, quantity in country_data.get("Stockpiles", {}).items():
-            resource = get_or_create_resource(resource_name, session)
-            stockpile = Stockpile(
-                country_id=country.id,
-                resource_id=resource.id,
-                quantity=quantity,
-            )
-            session.add(stockpile)
-
-        # Add Natural Resources
-        for resource_name, resource_info in country_data.get("Natural Resources", {}).items():
-            resource = get_or_create_resource(resource_name, session)
-            natural_resource = NaturalResource(
-                country_id=country.id,
-                resource_id=resource.id,
-                total_reserves=resource_info["Total Reserves"],
-                extraction_rate=resource_info["Extraction Rate"],
-            )
-            session.add(natural_resource)
+        # Resolve every resource name of the world at once
+        names = []
+        for country_data in countries_data:
+            try:
+                names += get_resource_names(country_data)
+            except (TypeError, AttributeError):
+                pass  # Reported when the country's rows are built
+        get_resource_ids(names, session)
+
+        countries = []
+        for country_data in countries_data:
+            try:
+                countries.append(build_country_rows(country_data, game_id, session))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"Error adding country to the database: {e}")
+        if not countries:
+            return 0
+
+        country_ids = insert_returning_ids(Country, [country["country"] for country in countries], session)
+
+        industry_rows = []
+        for country, country_id in zip(countries, country_ids):
+            for industry in country["industries"]:
+                industry["industry"]["country_id"] = country_id
+                industry_rows.append(industry["industry"])
+        industry_ids = insert_returning_ids(Industry, industry_rows, session)
+
+        input_rows, output_rows, stockpile_rows, natural_resource_rows = [], [], [], []
+        industries = (industry for country in countries for industry in country["industries"])
+        for industry, industry_id in zip(industries, industry_ids):
+            input_rows += [dict(row, industry_id=industry_id) for row in industry["inputs"]]
+            output_rows += [dict(row, industry_id=industry_id) for row in industry["outputs"]]
+        for country, country_id in zip(countries, country_ids):
+            stockpile_rows += [dict(row, country_id=country_id) for row in country["stockpiles"]]
+            natural_resource_rows += [dict(row, country_id=country_id) for row in country["natural_resources"]]
+
+        for model, rows in ((IndustryInput, input_rows), (IndustryOutput, output_rows),
+                            (Stockpile, stockpile_rows), (NaturalResource, natural_resource_rows)):
+            if rows:
+                session.execute(insert(model), rows)
 
         session.commit()
-        print(f"Country '{country.name}' added to the database.")
-
     except Exception as e:
         session.rollback()
-        print(f"Error adding country to the database: {e}")
+        print(f"Error adding the countries to the database: {e}")
+        return 0
+
+    for country in countries:
+        print(f"Country '{country['country']['name']}' added to the database.")
+    print(f"Added {len(countries)} countries with {len(industry_rows)} industries to the database in {time.perf_counter() - start:.3f}s.")
+    return len(countries)
 
-def get_or_create_resource(resource_name, session: Session):
+def insert_returning_ids(model, rows, session: Session):
     """
-    Gets a Resource by name, or creates it if it doesn't exist.
+    Inserts rows into a table with an integer primary key and returns their IDs, in order.
+
+    SQLite cannot return the IDs of a multi-row INSERT in order, so only the first row is
+    inserted on its own: its ID is one more than the largest in the table, and the write lock
+    it takes keeps other connections from inserting until the commit, so the next IDs are
+    free and given to the other rows. Other databases use INSERT ... RETURNING.
 
     Args:
-        resource_name (str): The name of the resource.
+        model: The model of the table.
+        rows (list): The rows, as dictionaries of column values without the ID.
         session (Session): The SQLAlchemy session.
 
     Returns:
-        Resource: The Resource instance.
+        list: The ID of each row.
+    """
+    if not rows:
+        return []
+    if session.get_bind().dialect.name != "sqlite":
+        return list(session.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows))
+
+    first_id = session.scalar(insert(model).values(rows[0]).returning(model.id))
+    ids = list(range(first_id, first_id + len(rows)))
+    if len(rows) > 1:
+        session.execute(insert(model), [dict(row, id=row_id) for row, row_id in zip(rows[1:], ids[1:])])
+    return ids
+
+def build_country_rows(country_data, game_id, session: Session):
+    """
+    Maps a country's data to the rows of its tables, without the IDs the database assigns.
+
+    The resource names must have been resolved already, see add_countries_to_db.
+
+    Returns:
+        dict: The "country" row, its "industries" each with its "industry" row and its
+            "inputs" and "outputs" rows, and its "stockpiles" and "natural_resources" rows.
+    """
+    workforce = country_data["Workforce"]
+    country = {
+        "game_id": game_id,
+        "name": country_data["Country Name"],
+        "is_ai": True,
+        "government_capital": country_data["Government Capital Pool"],
+        # Workforce details
+        "total_skilled_workers": (
+            workforce["Unemployed Skilled Workers"] +
+            sum(industry["Skilled Workers Employed"] for industry in country_data["Industries"])
+        ),
+        "total_unskilled_workers": (
+            workforce["Unemployed Unskilled Workers"] +
+            sum(industry["Unskilled Workers Employed"] for industry in country_data["Industries"])
+        ),
+        "unemployed_skilled_workers": workforce["Unemployed Skilled Workers"],
+        "unemployed_unskilled_workers": workforce["Unemployed Unskilled Workers"],
+    }
+
+    industries = []
+    for industry_data in country_data["Industries"]:
+        industries.append({
+            "industry": {
+                "industry_id": industry_data["Industry ID"],
+                "type": industry_data["Type"],
+                "sub_type": industry_data["Sub-Type"],
+                "production_level": industry_data["Production Level"],
+                "technology_level": industry_data["Technology Level"],
+                "skilled_workers_employed": industry_data["Skilled Workers Employed"],
+                "unskilled_workers_employed": industry_data["Unskilled Workers Employed"],
+            },
+            "inputs": [
+                {"resource_id": resource_id, "quantity": quantity}
+                for resource_id, quantity in resolve_quantities(industry_data.get("Inputs", {}), session).items()
+            ],
+            "outputs": [
+                {"resource_id": resource_id, "quantity": quantity}
+                for resource_id, quantity in resolve_quantities(industry_data.get("Outputs", {}), session).items()
+            ],
+        })
+
+    stockpiles = [
+        {"resource_id": resource_id, "quantity": quantity}
+        for resource_id, quantity in resolve_quantities(country_data.get("Stockpiles", {}), session).items()
+    ]
+
+    # The first of several spellings of a natural resource is kept
+    natural_resources = {}
+    natural_resources_data = country_data.get("Natural Resources", {})
+    resource_ids = get_resource_ids(natural_resources_data, session)
+    for resource_name, resource_info in natural_resources_data.items():
+        natural_resources.setdefault(resource_ids[resource_name], {
+            "resource_id": resource_ids[resource_name],
+            "total_reserves": resource_info["Total Reserves"],
+            "extraction_rate": resource_info["Extraction Rate"],
+        })
+
+    return {
+        "country": country,
+        "industries": industries,
+        "stockpiles": stockpiles,
+        "natural_resources": list(natural_resources.values()),
+    }
+
+def get_resource_names(country_data):
+    """
+    Returns the names of every resource a country's data mentions, in order of appearance.
     """
-    resource = session.query(Resource).filter_by(name=resource_name).first()
-    if not resource:
-        # Create a new Resource with default values
-        resource = Resource(
-            name=resource_name,
-            base_price=0,  # Placeholder, to be set later
-            current_price=0,  # Placeholder, to be set later
-            quantity_threshold=0,  # Placeholder, to be set later
-            max_transaction_per_turn=0,  # Placeholder, to be set later
-            max_price=0,  # Placeholder, to be set later
-            min_price=0,  # Placeholder, to be set later
-        )
-        session.add(resource)
-        session.flush()  # Get resource.id
-    return resource
+    names = {}
+    for industry_data in country_data.get("Industries", []):
+        names.update(dict.fromkeys(industry_data.get("Inputs", {})))
+        names.update(dict.fromkeys(industry_data.get("Outputs", {})))
+    names.update(dict.fromkeys(country_data.get("Stockpiles", {})))
+    names.update(dict.fromkeys(country_data.get("Natural Resources", {})))
+    return list(names)
@@ -0,0 +1,282 @@
+# json_stream.py
+
+import json
+
+# Types accepted for numeric fields
+NUMBER = (int, float)
+
+
+class MalformedJSONError(ValueError):
+    """Raised when an LLM response is not the JSON document that was asked for."""
+    pass
+
+
+class JSONStreamParser:
+    """
+    Incrementally parses a JSON object as its text arrives in chunks.
+
+    The object may be wrapped in a ```json code fence. When items_key is given, every element
+    of the array under that top-level key is returned by feed as soon as its text is complete.
+    Structural errors (text before the object, mismatched brackets, junk where a key is expected
+    or after the object) are raised as soon as the offending character arrives.
+
+    Args:
+        items_key (str): Top-level key of the array whose elements are returned as they complete.
+    """
+
+    def __init__(self, items_key=None):
+        self.items_key = items_key
+        self.text = ""
+        self.pos = 0
+        self.start = None
+        self.end = None
+        # One entry per open container: [bracket, expecting a key, last key] (keys only for objects)
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.items_depth = None
+        self.item_start = None
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of text.
+
+        Returns:
+            list: The elements of the items array completed by this chunk.
+
+        Raises:
+            MalformedJSONError: If the text can no longer be a valid response.
+        """
+        self.text += chunk
+        items = []
+        text = self.text
+        while self.pos < len(text):
+            if self.start is None:
+                if not self._skip_prefix():
+                    break
+                continue
+            if self.end is not None:
+                self._check_suffix()
+                break
+            item = self._scan(text[self.pos])
+            if item is not None:
+                items.append(item)
+            self.pos += 1
+        return items
+
+    def finish(self):
+        """
+        Checks that the whole object arrived and returns it.
+
+        Returns:
+            dict: The parsed object.
+
+        Raises:
+            MalformedJSONError: If the response is empty, incomplete or invalid.
+        """
+        if self.start is None:
+            raise MalformedJSONError("The response does not contain a JSON object.")
+        if self.end is None:
+            raise MalformedJSONError("The response ended before the JSON object was complete.")
+        self._check_suffix()
+        try:
+            return json.loads(self.text[self.start:self.end + 1])
+        except json.JSONDecodeError as e:
+            raise MalformedJSONError(f"Invalid JSON: {e}") from e
+
+    def _skip_prefix(self):
+        # Skips whitespace and an opening code fence before the object, returns False to wait for more text
+        text = self.text
+        while self.pos < len(text) and text[self.pos].isspace():
+            self.pos += 1
+        if self.pos >= len(text):
+            return False
+        if text.startswith("`", self.pos):
+            if len(text) - self.pos < 3:
+                return False
+            if not text.startswith("```", self.pos):
+                raise MalformedJSONError("The response does not start with a JSON object.")
+            end = self.pos + 3
+            while end < len(text) and text[end].isalpha():
+                end += 1
+            if end >= len(text):
+                return False
+            self.pos = end
+            return True
+        if text[self.pos] != "{":
+            raise MalformedJSONError("The response does not start with a JSON object.")
+        self.start = self.pos
+        return True
+
+    def _check_suffix(self):
+        # Only whitespace and a closing code fence may follow the object
+        suffix = self.text[self.end + 1:].strip()
+        if suffix and not "```".startswith(suffix):
+            raise MalformedJSONError("Unexpected text after the JSON object.")
+
+    def _scan(self, char):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                frame = self.stack[-1]
+                if frame[0] == "{" and frame[1]:
+                    frame[1] = False
+                    frame[2] = self.text[self.string_start:self.pos + 1]
+            return None
+
+        if char.isspace():
+            return None
+        frame = self.stack[-1] if self.stack else None
+        if frame is not None and frame[0] == "{" and frame[1] and char not in '"}':
+            raise MalformedJSONError(f"Expected a key at position {self.pos}, got '{char}'.")
+
+        if char == '"':
+            self.in_string = True
+            self.string_start = self.pos
+        elif char in "{[":
+            if (char == "[" and len(self.stack) == 1 and self.items_key is not None
+                    and frame[2] == json.dumps(self.items_key)):
+                self.items_depth = 2
+            if char == "{" and self.items_depth is not None and len(self.stack) == self.items_depth:
+                self.item_start = self.pos
+            self.stack.append([char, char == "{", None])
+        elif char in "}]":
+            if frame is None or (frame[0] == "{") != (char == "}"):
+                raise MalformedJSONError(f"Unexpected '{char}' at position {self.pos}.")
+            self.stack.pop()
+            if not self.stack:
+                self.end = self.pos
+                return None
+            if char == "]" and len(self.stack) + 1 == self.items_depth:
+                self.items_depth = None
+            if char == "}" and self.item_start is not None and len(self.stack) == self.items_depth:
+                item_text = self.text[self.item_start:self.pos + 1]
+                self.item_start = None
+                try:
+                    return json.loads(item_text)
+                except json.JSONDecodeError as e:
+                    raise MalformedJSONError(f"Invalid item in '{self.items_key}': {e}") from e
+        elif char == ",":
+            if frame is not None and frame[0] == "{":
+                frame[1] = True
+        return None
+
+
+class StreamedItems:
+    """
+    Iterates over the items of a streamed JSON response as they arrive.
+
+    Every item is validated before it is returned. When the response turns out to be malformed,
+    the stream is closed, which cancels the request, and MalformedJSONError is raised. After a
+    complete iteration, `document` holds the whole parsed response.
+
+    Args:
+        chunks: Iterator over the response text chunks, e.g. llm_client.stream_openai_response.
+        items_key (str): Top-level key of the array whose elements are returned.
+        validate_item (callable): Raises MalformedJSONError for an invalid item.
+    """
+
+    def __init__(self, chunks, items_key, validate_item=None):
+        self.chunks = iter(chunks)
+        self.items_key = items_key
+        self.validate_item = validate_item
+        self.parser = JSONStreamParser(items_key)
+        self.received = False
+        self.count = 0
+        self.document = None
+        self._first_chunk = None
+
+    def start(self):
+        """
+        Waits for the first text of the response.
+
+        Returns:
+            bool: Whether any text arrived, False if the request failed or was not sent.
+        """
+        if not self.received:
+            for chunk in self.chunks:
+                if chunk:
+                    self.received = True
+                    self._first_chunk = chunk
+                    break
+        return self.received
+
+    def __iter__(self):
+        self.start()
+        try:
+            if self._first_chunk is not None:
+                chunk, self._first_chunk = self._first_chunk, None
+                yield from self._feed(chunk)
+            for chunk in self.chunks:
+                yield from self._feed(chunk)
+            self.document = self.parser.finish()
+        except MalformedJSONError:
+            self.close()
+            raise
+
+    def close(self):
+        """Stops reading the response and cancels the request."""
+        close = getattr(self.chunks, "close", None)
+        if close:
+            close()
+
+    @property
+    def text(self):
+        return self.parser.text
+
+    def _feed(self, chunk):
+        for item in self.parser.feed(chunk):
+            if self.validate_item:
+                self.validate_item(item)
+            self.count += 1
+            yield item
+
+
+def parse_json_text(text):
+    """
+    Parses a complete response holding a JSON object, optionally in a code fence.
+
+    Raises:
+        MalformedJSONError: If the response is not a single valid JSON object.
+    """
+    parser = JSONStreamParser()
+    parser.feed(text or "")
+    return parser.finish()
+
+def parse_json_items(text, items_key, validate_item=None):
+    """
+    Parses a complete response and returns the validated items under items_key.
+
+    Raises:
+        MalformedJSONError: If the response or one of its items is invalid.
+    """
+    return list(StreamedItems([text or ""], items_key, validate_item))
+
+def check_fields(item, fields, description="item"):
+    """
+    Checks that an item has every required field with the expected type or value.
+
+    Args:
+        item: The parsed item.
+        fields (dict): Field name to a type, a tuple of types, or a set of allowed values.
+        description (str): Name of the item used in error messages.
+
+    Raises:
+        MalformedJSONError: If the item is not an object or a field is missing or invalid.
+    """
+    if not isinstance(item, dict):
+        raise MalformedJSONError(f"Expected an object for {description}, got {type(item).__name__}.")
+    for name, expected in fields.items():
+        if name not in item:
+            raise MalformedJSONError(f"Missing '{name}' in {description}.")
+        value = item[name]
+        if isinstance(expected, (set, frozenset)):
+            if value not in expected:
+                raise MalformedJSONError(f"Invalid '{name}' in {description}: {value!r}.")
+        elif not isinstance(value, expected) or isinstance(value, bool):
+            raise MalformedJSONError(f"Invalid '{name}' in {description}: {value!r}.")
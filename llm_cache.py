@@ -0,0 +1,163 @@
+# llm_cache.py
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+# Cache location and limits, overridable with environment variables
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Set LLM_CACHE=off to bypass the cache entirely
+CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM responses stored in a local SQLite file.
+
+    Entries are keyed by a hash of the model and the prompt. Entries older than the TTL are
+    dropped, and the least recently used ones are evicted once the entry count or total size
+    goes over its limit.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used_at ON responses (last_used_at)")
+        self.evict()
+
+    @staticmethod
+    def make_key(model, prompt):
+        """
+        Returns the cache key for a model and prompt.
+        """
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, model, prompt):
+        """
+        Returns the cached response for a model and prompt, or None on a miss.
+        """
+        key = self.make_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, model, prompt, response):
+        """
+        Stores the response for a model and prompt, evicting old entries if needed.
+        """
+        key = self.make_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+        self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently used ones until the cache is within its limits.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self.evictions += max(cursor.rowcount, 0)
+
+            count, total_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                return
+
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used_at").fetchall()
+            evicted_keys = []
+            for key, size in rows:
+                if count <= self.max_entries and total_size <= self.max_bytes:
+                    break
+                evicted_keys.append((key,))
+                count -= 1
+                total_size -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+            self.evictions += len(evicted_keys)
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """
+        Returns the hit, miss and eviction counters along with the current cache size.
+        """
+        with self._lock:
+            count, total_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total_size,
+        }
+
+
+def get_cache():
+    """
+    Returns the process-wide response cache, or None if caching is disabled.
+    """
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache()
+    return _cache
+
+def set_cache_enabled(enabled: bool):
+    """
+    Turns the response cache on or off for the rest of the process.
+    """
+    global CACHE_ENABLED
+    CACHE_ENABLED = enabled
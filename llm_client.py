@@ -0,0 +1,405 @@
+# llm_client.py
+
+import os
+import atexit
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from llm_cache import get_cache
+from prompt_encoding import record_prompt
+from llm_resilience import call_with_retry, call_with_retry_async, get_circuit_breaker, CircuitOpenError
+from llm_transport import OpenRouterTransport, RecordingTransport, ReplayTransport, ReplayMissError
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Model used by each call site, overridable with LLM_MODEL_<CALL_SITE> environment variables
+DEFAULT_MODEL = "openai/gpt-4o-mini"
+CALL_SITE_MODELS = {
+    "generate_country": DEFAULT_MODEL,
+    "generate_marketplace": DEFAULT_MODEL,
+    "generate_new_industries": DEFAULT_MODEL,
+    "generate_expand_options": DEFAULT_MODEL,
+    "generate_tech_upgrades": DEFAULT_MODEL,
+    "ai_turn": DEFAULT_MODEL,
+    "pick_winner": "openai/gpt-4",
+}
+
+# Connection pool shared by every request, kept alive between turns
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 32
+KEEPALIVE_EXPIRY = 120.0
+
+# Timeouts in seconds
+CONNECT_TIMEOUT = 10.0
+REQUEST_TIMEOUT = 180.0
+
+# Default number of requests in flight for the fan-out helpers
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Transport used for every request: "live", "record" (live plus a log of every call) or
+# "replay" (serve a recorded log offline, optionally sleeping LLM_REPLAY_LATENCY seconds
+# or the "recorded" latency per call)
+TRANSPORT_MODE = os.getenv("LLM_TRANSPORT", "live")
+TRANSPORT_LOG = os.getenv("LLM_TRANSPORT_LOG", "llm_recording.jsonl.gz")
+REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY")
+
+_client = None
+_transport = None
+_model_override = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+_loop = None
+_loop_pid = None
+
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+def _http_timeout():
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+def get_client():
+    """
+    Returns the process-wide OpenAI client, creating it on first use.
+
+    Returns:
+        OpenAI: The client pointed at OpenRouter with a pooled keep-alive HTTP client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    base_url=OPENROUTER_BASE_URL,
+                    api_key=os.getenv("OPENROUTER_API_KEY"),
+                    timeout=_http_timeout(),
+                    # Retries are done by llm_resilience
+                    max_retries=0,
+                    http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+                )
+    return _client
+
+def get_async_client():
+    """
+    Returns the AsyncOpenAI client for the running event loop, creating it on first use.
+
+    Returns:
+        AsyncOpenAI: The async client pointed at OpenRouter with a pooled keep-alive HTTP client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            timeout=_http_timeout(),
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout()),
+        )
+        _async_clients[loop] = client
+    return client
+
+def get_event_loop():
+    """
+    Returns the event loop the fan-out requests of this process run on, started on first use.
+
+    The loop runs in a daemon thread for as long as the process, so its AsyncOpenAI client keeps
+    its connections alive between phases. A forked worker process starts its own loop.
+    """
+    global _loop, _loop_pid
+    with _client_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+            _loop, _loop_pid = loop, os.getpid()
+        return _loop
+
+def configure_transport(mode, log_path=TRANSPORT_LOG, latency=None, latency_scale=1.0, include_prompts=False):
+    """
+    Builds the transport for a mode and makes it the one used by every request.
+
+    Args:
+        mode (str): "live", "record" or "replay".
+        log_path (str): Log written in record mode and read in replay mode.
+        latency: Replay latency, None, "recorded" or a number of seconds.
+        latency_scale (float): Multiplier applied to the replay latency.
+        include_prompts (bool): Whether record mode also writes the prompt text.
+
+    Returns:
+        The configured transport.
+    """
+    live = OpenRouterTransport(get_client, get_async_client)
+    if mode == "live":
+        transport = live
+    elif mode == "record":
+        transport = RecordingTransport(live, log_path, include_prompts=include_prompts)
+    elif mode == "replay":
+        if latency not in (None, "recorded"):
+            latency = float(latency)
+        transport = ReplayTransport(log_path, latency=latency, latency_scale=latency_scale)
+    else:
+        raise ValueError(f"Unknown LLM transport mode: {mode}.")
+    set_transport(transport)
+    return transport
+
+def set_transport(transport):
+    """
+    Replaces the transport used by every request.
+    """
+    global _transport
+    _transport = transport
+
+def get_transport():
+    """
+    Returns the transport used by every request, configuring it from the environment on first use.
+    """
+    if _transport is None:
+        with _client_lock:
+            if _transport is None:
+                configure_transport(TRANSPORT_MODE, TRANSPORT_LOG, latency=REPLAY_LATENCY)
+    return _transport
+
+def close_transport():
+    """
+    Closes the transport, e.g. its recording log. The next request configures a new one.
+    """
+    global _transport
+    with _client_lock:
+        transport, _transport = _transport, None
+    close = getattr(transport, "close", None)
+    if close:
+        close()
+
+# Worker processes exit without running atexit handlers, worker_pool closes the transport itself
+atexit.register(close_transport)
+
+def set_model(model):
+    """
+    Uses one model for every call site, or restores the per-call-site models if model is None.
+    """
+    global _model_override
+    _model_override = model
+
+def get_model(call_site=None):
+    """
+    Returns the model to use for a call site, the one given to set_model if any.
+
+    Args:
+        call_site (str): Name of the call site (e.g. 'ai_turn'), or None for the default model.
+
+    Returns:
+        str: The model name.
+    """
+    if _model_override:
+        return _model_override
+    if call_site:
+        model = os.getenv(f"LLM_MODEL_{call_site.upper()}")
+        if model:
+            return model
+        return CALL_SITE_MODELS.get(call_site, DEFAULT_MODEL)
+    return os.getenv("LLM_MODEL", DEFAULT_MODEL)
+
+def is_llm_degraded():
+    """
+    Tells whether the LLM provider is considered degraded, so callers should use their local
+    fallback instead of sending requests.
+    """
+    return get_circuit_breaker().is_open
+
+class _LLMRequest:
+    """
+    What the entry points share for one request: its model and transport, the response cache and
+    the handling of failed requests.
+    """
+
+    def __init__(self, prompt, call_site, model, use_cache):
+        self.prompt = prompt
+        self.call_site = call_site
+        self.model = model or get_model(call_site)
+        record_prompt(call_site, prompt)
+        self.transport = get_transport()
+        self.cache = get_cache() if use_cache and not self.transport.bypass_cache else None
+        self.description = f"LLM request for {call_site or 'default'}"
+
+    def cached(self):
+        """
+        Returns the cached response, or None if there is none or the cache is not used.
+        """
+        return self.cache.get(self.model, self.prompt) if self.cache else None
+
+    def store(self, response_text):
+        """
+        Adds a response to the cache, unless it is empty.
+        """
+        if self.cache and response_text:
+            self.cache.set(self.model, self.prompt, response_text)
+
+    @contextmanager
+    def reporting_errors(self):
+        """
+        Prints why the request failed instead of raising, the caller then falls back.
+        """
+        try:
+            yield
+        except CircuitOpenError as e:
+            print(e)
+        except ReplayMissError:
+            # A replay must not silently diverge from the recorded game
+            raise
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+
+def get_openai_response(prompt, call_site=None, model=None, use_cache=True):
+    """
+    Sends the prompt to the LLM and returns the response text.
+
+    Args:
+        prompt (str): The prompt to send.
+        call_site (str): Name of the call site, used to pick the model.
+        model (str): Model to use instead of the call site's model.
+        use_cache (bool): Whether to serve and store the response through the response cache.
+
+    Retryable errors (rate limits, timeouts, server errors) are retried with backoff, see
+    llm_resilience. While the provider is degraded no request is sent at all.
+
+    Returns:
+        str: The response text, or an empty string if the request failed or was not sent.
+            Callers with a local fallback should use it then.
+
+    Raises:
+        ReplayMissError: If a replayed game sends a prompt that is not in the recording.
+    """
+    request = _LLMRequest(prompt, call_site, model, use_cache)
+    cached_text = request.cached()
+    if cached_text is not None:
+        return cached_text
+
+    response_text = ""
+    with request.reporting_errors():
+        response_text = call_with_retry(lambda: request.transport.complete(request.model, prompt, call_site=call_site), description=request.description)
+    request.store(response_text)
+    return response_text
+
+def stream_openai_response(prompt, call_site=None, model=None, use_cache=True):
+    """
+    Sends the prompt to the LLM and yields the response text as it arrives.
+
+    Opening the stream is retried like get_openai_response. A cached response is yielded in a
+    single chunk, and a complete streamed response is added to the cache. Closing the generator
+    early cancels the request.
+
+    Args:
+        prompt (str): The prompt to send.
+        call_site (str): Name of the call site, used to pick the model.
+        model (str): Model to use instead of the call site's model.
+        use_cache (bool): Whether to serve and store the response through the response cache.
+
+    Yields:
+        str: Chunks of the response text. Nothing is yielded if the request failed or was not sent.
+    """
+    request = _LLMRequest(prompt, call_site, model, use_cache)
+    cached_text = request.cached()
+    if cached_text is not None:
+        yield cached_text
+        return
+
+    chunks = None
+    with request.reporting_errors():
+        chunks = call_with_retry(lambda: request.transport.stream(request.model, prompt, call_site=call_site), description=request.description)
+    if chunks is None:
+        return
+
+    parts = []
+    completed = False
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        completed = True
+    except Exception as e:
+        print(f"OpenAI API error while streaming: {e}")
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+    if completed:
+        request.store("".join(parts).strip())
+
+async def get_openai_response_async(prompt, call_site=None, model=None, use_cache=True):
+    """
+    Async version of get_openai_response.
+
+    Args:
+        prompt (str): The prompt to send.
+        call_site (str): Name of the call site, used to pick the model.
+        model (str): Model to use instead of the call site's model.
+        use_cache (bool): Whether to serve and store the response through the response cache.
+
+    Returns:
+        str: The response text, or an empty string if the request failed.
+    """
+    request = _LLMRequest(prompt, call_site, model, use_cache)
+    cached_text = request.cached()
+    if cached_text is not None:
+        return cached_text
+
+    complete_async = getattr(request.transport, "complete_async", None)
+    if complete_async is None:
+        # Transports without an async method are run in a thread of the loop's executor
+        send = lambda: asyncio.to_thread(request.transport.complete, request.model, prompt, call_site=call_site)
+    else:
+        send = lambda: complete_async(request.model, prompt, call_site=call_site)
+
+    response_text = ""
+    with request.reporting_errors():
+        response_text = await call_with_retry_async(send, description=request.description)
+    request.store(response_text)
+    return response_text
+
+def get_openai_responses(requests, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Sends several prompts at once and returns the responses in order.
+
+    The requests are sent by gather_openai_responses on the process's event loop, see
+    get_event_loop, and this waits for all of them.
+
+    Args:
+        requests (list): List of (call_site, prompt) tuples.
+        max_concurrency (int): Maximum number of requests in flight at once.
+
+    Returns:
+        list: The response texts, in the same order as the requests.
+    """
+    if not requests:
+        return []
+    future = asyncio.run_coroutine_threadsafe(gather_openai_responses(requests, max_concurrency), get_event_loop())
+    return future.result()
+
+async def gather_openai_responses(requests, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Async version of get_openai_responses.
+
+    Args:
+        requests (list): List of (call_site, prompt) tuples.
+        max_concurrency (int): Maximum number of requests in flight at once.
+
+    Returns:
+        list: The response texts, in the same order as the requests.
+    """
+    if not requests:
+        return []
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def send(call_site, prompt):
+        async with semaphore:
+            return await get_openai_response_async(prompt, call_site=call_site)
+
+    return list(await asyncio.gather(*(send(call_site, prompt) for call_site, prompt in requests)))
@@ -0,0 +1,240 @@
+# llm_resilience.py
+
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+import openai
+
+# Attempts per request, including the first one
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+# Exponential backoff in seconds: a random delay up to BASE_DELAY * 2 ** (attempt - 1), capped at MAX_DELAY
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# Longest Retry-After the provider can ask for before the request is given up instead
+MAX_RETRY_AFTER = 120.0
+
+# Consecutive failed requests that open the circuit, and seconds it stays open before a trial request
+FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN", "60"))
+
+# Error classes and whether they are retried. Checked in order, the first match wins.
+RETRY_POLICY = [
+    (openai.RateLimitError, True),
+    (openai.APITimeoutError, True),
+    (openai.APIConnectionError, True),
+    (openai.InternalServerError, True),
+    (openai.ConflictError, True),
+    (openai.AuthenticationError, False),
+    (openai.PermissionDeniedError, False),
+    (openai.BadRequestError, False),
+    (openai.NotFoundError, False),
+    (openai.UnprocessableEntityError, False),
+]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a provider that keeps failing.
+
+    A request counts as failed once it is given up after its retries. After FAILURE_THRESHOLD
+    consecutive failed requests the circuit opens and requests are refused for COOLDOWN seconds.
+    A single trial request with a single attempt is then let through: the circuit closes again if
+    it succeeds and stays open for another cooldown if it fails.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """Whether requests are currently refused, so callers should use their local fallback."""
+        with self._lock:
+            return self.opened_at is not None and (self.trial_in_flight or self.clock() - self.opened_at < self.cooldown)
+
+    def allow_request(self):
+        """
+        Returns "closed" if the request can be sent normally, "trial" if it is the single trial
+        request of an open circuit, or None if it must not be sent.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.trial_in_flight or self.clock() - self.opened_at < self.cooldown:
+                return None
+            self.trial_in_flight = True
+            return "trial"
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print("LLM provider recovered, closing the circuit.")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+                print(f"LLM provider degraded after {self.failures} failed requests, using local fallbacks for {self.cooldown:.0f}s.")
+                self.opened_at = self.clock()
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """Ends a trial request that failed for a reason unrelated to the provider's health."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+
+_breaker = CircuitBreaker()
+
+
+def get_circuit_breaker():
+    """
+    Returns the circuit breaker shared by every LLM request.
+    """
+    return _breaker
+
+def is_retryable(error):
+    """
+    Tells whether a failed request is worth retrying, following RETRY_POLICY.
+    """
+    for error_class, retry in RETRY_POLICY:
+        if isinstance(error, error_class):
+            return retry
+    # Other status errors are retried when the provider says they are on its side
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+def retry_after(error):
+    """
+    Returns the delay in seconds the provider asked for in a Retry-After header, or None.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return max(float(milliseconds) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, error=None, rng=random):
+    """
+    Returns how long to wait before the next attempt.
+
+    The provider's Retry-After is honored when given, otherwise the delay is a full-jitter
+    exponential backoff.
+
+    Args:
+        attempt (int): Number of the attempt that just failed, starting at 1.
+        error (Exception): The error of that attempt.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    requested = retry_after(error) if error is not None else None
+    if requested is not None:
+        return requested
+    return rng.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** (attempt - 1)))
+
+def call_with_retry(send, description="LLM request", max_attempts=MAX_ATTEMPTS, breaker=None, sleep=time.sleep):
+    """
+    Sends a request, retrying retryable errors with backoff, through the circuit breaker.
+
+    Args:
+        send (callable): Sends the request and returns its result.
+        description (str): Shown in the retry messages.
+        max_attempts (int): Attempts including the first one.
+        breaker (CircuitBreaker): The circuit breaker, the shared one if not given.
+        sleep (callable): Used to wait between attempts.
+
+    Returns:
+        The result of send.
+
+    Raises:
+        CircuitOpenError: If the circuit is open.
+        Exception: The last error if it is not retryable or every attempt failed.
+    """
+    breaker = breaker or _breaker
+    for attempt in range(1, max_attempts + 1):
+        state = breaker.allow_request()
+        if state is None:
+            raise CircuitOpenError(f"{description} not sent, the LLM provider is degraded.")
+        try:
+            result = send()
+        except Exception as e:
+            # The trial request of an open circuit gets a single attempt
+            delay = _after_failure(e, attempt, 1 if state == "trial" else max_attempts, description, breaker)
+            sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+async def call_with_retry_async(send, description="LLM request", max_attempts=MAX_ATTEMPTS, breaker=None):
+    """
+    Async version of call_with_retry, send returns an awaitable.
+    """
+    breaker = breaker or _breaker
+    for attempt in range(1, max_attempts + 1):
+        state = breaker.allow_request()
+        if state is None:
+            raise CircuitOpenError(f"{description} not sent, the LLM provider is degraded.")
+        try:
+            result = await send()
+        except Exception as e:
+            # The trial request of an open circuit gets a single attempt
+            delay = _after_failure(e, attempt, 1 if state == "trial" else max_attempts, description, breaker)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+def _after_failure(error, attempt, max_attempts, description, breaker):
+    # Re-raises the error when the request is given up, otherwise returns the delay before the next attempt
+    if not is_retryable(error):
+        # Errors such as a bad request say nothing about the provider's health
+        breaker.release_trial()
+        raise error
+    delay = backoff_delay(attempt, error)
+    if attempt >= max_attempts or delay > MAX_RETRY_AFTER:
+        breaker.record_failure()
+        raise error
+    print(f"{description} failed ({type(error).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{max_attempts}).")
+    return delay
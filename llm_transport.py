@@ -0,0 +1,239 @@
+# llm_transport.py
+
+import os
+import gzip
+import json
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+from llm_cache import LLMResponseCache
+
+
+class ReplayMissError(LookupError):
+    """Raised when a replayed game sends a prompt that is not in the recording."""
+    pass
+
+
+def _open_log(path, mode):
+    # Logs ending in .gz are gzip-compressed JSONL, anything else is plain JSONL
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class OpenRouterTransport:
+    """
+    Sends chat completions to the provider through the shared OpenAI clients.
+    """
+    bypass_cache = False
+
+    def __init__(self, get_client, get_async_client):
+        self._get_client = get_client
+        self._get_async_client = get_async_client
+
+    def complete(self, model, prompt, call_site=None):
+        response = self._get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+        )
+        return response.choices[0].message.content.strip()
+
+    async def complete_async(self, model, prompt, call_site=None):
+        response = await self._get_async_client().chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+        )
+        return response.choices[0].message.content.strip()
+
+    def stream(self, model, prompt, call_site=None):
+        """
+        Opens a streamed completion and returns an iterator over its text chunks.
+
+        The request is sent before this returns, so connection and rate limit errors are raised
+        here. Closing the iterator aborts the request.
+        """
+        response = self._get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            stream=True,
+        )
+        return self._iterate(response)
+
+    @staticmethod
+    def _iterate(response):
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()
+
+
+class RecordingTransport:
+    """
+    Wraps another transport and appends every prompt and response pair to a JSONL log.
+
+    Each line holds the call site, model, prompt hash, response and the measured latency.
+    Prompts themselves are only written when include_prompts is set, to keep logs compact.
+    The response cache is bypassed so that every call of the game ends up in the log.
+
+    Every entry is appended with a single unbuffered write, as its own gzip member when the
+    log ends in .gz, so that several processes can record to the same log and an entry is
+    never lost in a buffer when a worker process exits without closing the transport.
+    """
+    bypass_cache = True
+
+    def __init__(self, inner, path, include_prompts=False):
+        self.inner = inner
+        self.path = path
+        self.include_prompts = include_prompts
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _write(self, call_site, model, prompt, response_text, latency):
+        entry = {
+            "call_site": call_site,
+            "model": model,
+            "key": LLMResponseCache.make_key(model, prompt),
+            "response": response_text,
+            "latency": round(latency, 4),
+        }
+        if self.include_prompts:
+            entry["prompt"] = prompt
+        data = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        if self.path.endswith(".gz"):
+            data = gzip.compress(data)
+        with self._lock:
+            if self._fd is None:
+                raise ValueError(f"Recording to {self.path} is closed.")
+            os.write(self._fd, data)
+
+    def complete(self, model, prompt, call_site=None):
+        started = time.perf_counter()
+        response_text = self.inner.complete(model, prompt, call_site=call_site)
+        self._write(call_site, model, prompt, response_text, time.perf_counter() - started)
+        return response_text
+
+    async def complete_async(self, model, prompt, call_site=None):
+        started = time.perf_counter()
+        complete_async = getattr(self.inner, "complete_async", None)
+        if complete_async is None:
+            response_text = await asyncio.to_thread(self.inner.complete, model, prompt, call_site=call_site)
+        else:
+            response_text = await complete_async(model, prompt, call_site=call_site)
+        self._write(call_site, model, prompt, response_text, time.perf_counter() - started)
+        return response_text
+
+    def stream(self, model, prompt, call_site=None):
+        started = time.perf_counter()
+        return self._record_stream(self.inner.stream(model, prompt, call_site=call_site), call_site, model, prompt, started)
+
+    def _record_stream(self, chunks, call_site, model, prompt, started):
+        # A stream cancelled by the caller is recorded up to where it stopped, so that a replay
+        # stops at the same point
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+            self._write(call_site, model, prompt, "".join(parts).strip(), time.perf_counter() - started)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class ReplayTransport:
+    """
+    Serves responses from a recorded log without touching the network.
+
+    Responses are looked up by model and prompt hash. When the same prompt was recorded
+    several times, the responses are served in recorded order and the last one is repeated
+    once they run out.
+
+    Args:
+        path (str): Path to the recorded JSONL log (optionally .gz).
+        latency: None to answer immediately, "recorded" to sleep for the recorded latency,
+            or a number of seconds to sleep before every response.
+        latency_scale (float): Multiplier applied to the injected latency.
+    """
+    bypass_cache = True
+
+    def __init__(self, path, latency=None, latency_scale=1.0):
+        self.path = path
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.served = 0
+        self._lock = threading.Lock()
+        self._entries = defaultdict(deque)
+        self._last = {}
+        with _open_log(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def _next_entry(self, model, prompt):
+        key = LLMResponseCache.make_key(model, prompt)
+        with self._lock:
+            pending = self._entries.get(key)
+            if pending:
+                entry = pending.popleft()
+                self._last[key] = entry
+            elif key in self._last:
+                entry = self._last[key]
+            else:
+                raise ReplayMissError(f"No recorded response for model '{model}' and prompt hash {key[:12]}.")
+            self.served += 1
+        return entry
+
+    def _delay(self, entry):
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return entry.get("latency", 0.0) * self.latency_scale
+        return float(self.latency) * self.latency_scale
+
+    def complete(self, model, prompt, call_site=None):
+        entry = self._next_entry(model, prompt)
+        delay = self._delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return entry["response"]
+
+    def stream(self, model, prompt, call_site=None):
+        entry = self._next_entry(model, prompt)
+        delay = self._delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return iter([entry["response"]])
+
+    async def complete_async(self, model, prompt, call_site=None):
+        entry = self._next_entry(model, prompt)
+        delay = self._delay(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return entry["response"]
@@ -1,22 +1,15 @@
 # main.py
 
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
 from models import User, Game
 from datetime import datetime
-from init_world import generate_initial_world
-from init_marketplace import generate_marketplace_data
-from generate_actions import generate_action_options_for_all_countries
-from gameplay import process_ai_turn
-from pick_winner import pick_winner
-from background_logic import process_background_logic
-
-# Database setup
-DATABASE_URL = "sqlite:///game.db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+from prompt_templates import load_templates
+from simulation import play_game, LLM_MAX_CONCURRENCY
+from database import SessionLocal
 
 def main():
+    # Load and validate the prompt templates before anything is asked from the player
+    load_templates()
+
     session = SessionLocal()
 
     # Ask for username
@@ -65,38 +58,8 @@ def main():
     session.commit()
     print(f"Game started with {num_players} AI players.")
 
-    print("Game initialization in progress...")
-
-    # Generate the initial world (countries and their data)
-    generate_initial_world(game, num_players, session)
-
-    # Generate initial marketplace data
-    generate_marketplace_data(game.id, session)
-
-    print("Game initialization complete.")
-
-    # Start the game loop for each turn
-    for turn_number in range(1, game.total_turns + 1):
-        print(f"\n--- Turn {turn_number} ---")
-
-        # Execute background logic
-        process_background_logic(game=game, turn_number=turn_number, session=session)
-
-        # Generate action options for all countries
-        generate_action_options_for_all_countries(game, turn_number, session)
-
-        # Process AI turns
-        process_ai_turn(game, turn_number, session)
-
-        # Update the current turn number in the game
-        game.current_turn_number = turn_number
-        session.commit()
-
-    print("\nGame has ended after 10 turns.") 
-
-    # Determine the winner
-    print("Determining the winner...")
-    pick_winner(game.id, session)
+    # Generate the world, play every turn and determine the winner
+    play_game(game, num_players, session, max_concurrency=LLM_MAX_CONCURRENCY)
 
     # Close the session
     session.close()
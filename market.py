@@ -0,0 +1,289 @@
+# market.py
+
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy.orm import Session
+from models import Turn, Country, Resource, Stockpile, ResourceMarket, MarketOrder, MarketTransaction, MarketPrice
+
+# Price change for a net flow of quantity_threshold units bought from (or sold to) the house in a turn
+PRICE_IMPACT = Decimal('0.05')
+# Totals are rounded to cents, an order whose limit misses the clearing price by less is still filled
+LIMIT_TOLERANCE = Decimal('0.01')
+CENT = Decimal('0.01')
+
+
+class MarketOrderError(Exception):
+    """Raised when an order cannot be placed."""
+    pass
+
+
+def get_or_create_turn(game_id: int, turn_number: int, session: Session):
+    """
+    Gets the Turn of a game by number, or creates it if it doesn't exist.
+    """
+    turn = session.query(Turn).filter_by(game_id=game_id, turn_number=turn_number).first()
+    if not turn:
+        turn = Turn(game_id=game_id, turn_number=turn_number)
+        session.add(turn)
+        session.flush()
+    return turn
+
+def get_resource_market(game_id: int, resource_id: int, session: Session):
+    """
+    Gets the market of a resource in a game, or None if the resource is not traded in the game.
+    """
+    return session.query(ResourceMarket).filter_by(game_id=game_id, resource_id=resource_id).first()
+
+def is_traded(market: ResourceMarket):
+    """
+    Tells whether a resource market takes orders, it needs a price and a quantity threshold.
+    """
+    return market is not None and market.quantity_threshold != 0 and market.current_price > 0
+
+def place_order(country: Country, turn_number: int, resource: Resource, order_type: str, quantity: int, limit_total, session: Session):
+    """
+    Places a buy or sell order, filled when the market clears at the end of the decision phase.
+
+    The buyer's limit total is taken from its capital, and the seller's quantity from its
+    stockpile, until then. Whatever is not used is given back at clearing. The country's
+    stockpiles and orders are read from its collections, so they are queried once per country
+    however many orders it places.
+
+    Args:
+        country (Country): The country placing the order.
+        turn_number (int): The current turn number.
+        resource (Resource): The resource traded.
+        order_type (str): "Buy" or "Sell".
+        quantity (int): Number of units.
+        limit_total: Highest total the buyer pays, or lowest total the seller accepts.
+        session (Session): The SQLAlchemy session.
+
+    Returns:
+        MarketOrder: The order.
+
+    Raises:
+        MarketOrderError: If the order is invalid or the country cannot cover it.
+    """
+    if order_type not in ("Buy", "Sell"):
+        raise MarketOrderError(f"Invalid order type '{order_type}'.")
+    if isinstance(quantity, float) and quantity.is_integer():
+        quantity = int(quantity)
+    if not isinstance(quantity, int) or quantity <= 0:
+        raise MarketOrderError(f"Invalid quantity {quantity} for '{resource.name}', it must be a positive whole number.")
+    limit_total = Decimal(str(limit_total))
+    if limit_total <= 0:
+        raise MarketOrderError(f"Invalid total {limit_total} for '{resource.name}'.")
+    market = get_resource_market(country.game_id, resource.id, session)
+    if not is_traded(market):
+        raise MarketOrderError(f"Resource '{resource.name}' is not traded on the market.")
+
+    turn = get_or_create_turn(country.game_id, turn_number, session)
+
+    # The limit applies to everything a country buys, or sells, of a resource in a turn
+    ordered = sum(
+        order.quantity for order in country.market_orders
+        if order.turn_id == turn.id and order.resource_id == resource.id and order.order_type == order_type
+    )
+    if ordered + quantity > market.max_transaction_per_turn:
+        raise MarketOrderError(f"Ordering {quantity} more '{resource.name}' exceeds MaxTransactionPerTurn ({market.max_transaction_per_turn}, already ordered {ordered}).")
+
+    stockpile = next((stockpile for stockpile in country.stockpiles if stockpile.resource_id == resource.id), None)
+    escrow = Decimal('0')
+    if order_type == "Buy":
+        if country.government_capital < limit_total:
+            raise MarketOrderError(f"Country '{country.name}' does not have enough capital to buy {quantity} of '{resource.name}' (needs {limit_total}, has {country.government_capital}).")
+        country.government_capital -= limit_total
+        escrow = limit_total
+        if not stockpile:
+            # Created now so that the purchase has somewhere to go
+            stockpile = Stockpile(country=country, resource_id=resource.id, quantity=0)
+            session.add(stockpile)
+    else:
+        if not stockpile or stockpile.quantity < quantity:
+            held = stockpile.quantity if stockpile else 0
+            raise MarketOrderError(f"Country '{country.name}' does not have enough '{resource.name}' to sell {quantity} (has {held}).")
+        stockpile.quantity -= quantity
+
+    # Added through the country's collection, which the next orders are checked against
+    order = MarketOrder(
+        turn_id=turn.id,
+        country=country,
+        resource_id=resource.id,
+        order_type=order_type,
+        quantity=quantity,
+        limit_total=limit_total,
+        escrow=escrow,
+        is_cleared=False,
+        is_filled=False
+    )
+    session.add(order)
+    session.flush()
+    return order
+
+def clear_market(game_id: int, turn_number: int, session: Session):
+    """
+    Clears every resource's orders of a turn at once and records the turn's prices.
+
+    Each resource market of the game is cleared as a call auction at its current price, with the house (the world
+    market) as the counterparty of the net imbalance, so the outcome does not depend on the
+    order in which countries acted. Buy orders whose limit reaches the price and sell orders
+    whose limit does not exceed it are filled, the others are given back. The house's net flow
+    then moves the price for the next turn by PRICE_IMPACT per quantity_threshold units, within
+    min_price and max_price. The turn's prices and volumes are then written, see record_market_prices.
+
+    Changes are left in the session for the caller to commit.
+
+    Args:
+        game_id (int): The game ID.
+        turn_number (int): The turn whose orders are cleared.
+        session (Session): The SQLAlchemy session.
+
+    Returns:
+        dict: By resource name, the clearing price, quantities bought and sold, capital traded
+            and the next price.
+    """
+    turn = get_or_create_turn(game_id, turn_number, session)
+
+    orders_by_resource = {}
+    orders = session.query(MarketOrder).filter_by(turn_id=turn.id, is_cleared=False).order_by(MarketOrder.id).all()
+    for order in orders:
+        orders_by_resource.setdefault(order.resource_id, []).append(order)
+    stockpiles = load_order_stockpiles(orders, session)
+
+    results = {}
+    markets = session.query(ResourceMarket).filter_by(game_id=game_id).order_by(ResourceMarket.resource_id).all()
+    for market in markets:
+        if not is_traded(market):
+            # place_order refuses its orders
+            continue
+        resource = market.resource
+        resource_orders = orders_by_resource.get(resource.id, [])
+
+        clearing_price = Decimal(market.current_price)
+        bought, sold, turnover = clear_resource_orders(resource, clearing_price, resource_orders, turn, session, stockpiles)
+        next_price = next_market_price(market, clearing_price, bought - sold)
+        if next_price != clearing_price:
+            market.current_price = next_price
+
+        if resource_orders:
+            print(f"Market for '{resource.name}' cleared at {clearing_price}: {bought} bought, {sold} sold, next price {next_price}.")
+        results[resource] = {"price": clearing_price, "bought": bought, "sold": sold, "turnover": turnover, "next_price": next_price}
+
+    record_market_prices(turn, results, session)
+    return {resource.name: result for resource, result in results.items()}
+
+def record_market_prices(turn: Turn, results: dict, session: Session):
+    """
+    Writes the price history of a turn, one MarketPrice row per resource, all at once.
+
+    The history is append-only: resources that already have a row for the turn keep it.
+
+    Args:
+        turn (Turn): The turn.
+        results (dict): The clearing results by Resource, as built by clear_market.
+        session (Session): The SQLAlchemy session.
+    """
+    recorded = {resource_id for resource_id, in session.query(MarketPrice.resource_id).filter_by(turn_id=turn.id)}
+    session.add_all([
+        MarketPrice(
+            turn_id=turn.id,
+            resource_id=resource.id,
+            price=result["price"],
+            close_price=result["next_price"],
+            high_price=max(result["price"], result["next_price"]),
+            low_price=min(result["price"], result["next_price"]),
+            volume_bought=result["bought"],
+            volume_sold=result["sold"],
+            turnover=result["turnover"]
+        )
+        for resource, result in results.items() if resource.id not in recorded
+    ])
+
+def load_order_stockpiles(orders, session: Session):
+    """
+    Loads the stockpiles the orders are filled into or given back to, with one query.
+
+    Returns:
+        dict: Stockpiles by (country ID, resource ID).
+    """
+    if not orders:
+        return {}
+    country_ids = {order.country_id for order in orders}
+    resource_ids = {order.resource_id for order in orders}
+    stockpiles = session.query(Stockpile).filter(
+        Stockpile.country_id.in_(country_ids),
+        Stockpile.resource_id.in_(resource_ids)
+    ).all()
+    return {(stockpile.country_id, stockpile.resource_id): stockpile for stockpile in stockpiles}
+
+def clear_resource_orders(resource: Resource, clearing_price: Decimal, orders, turn: Turn, session: Session,
+                          stockpiles: dict = None):
+    """
+    Fills or returns the orders of one resource at the clearing price.
+
+    Args:
+        stockpiles (dict): Stockpiles by (country ID, resource ID), loaded for the orders if not given.
+            Stockpiles created for the orders are added to it.
+
+    Returns:
+        tuple: The quantities bought and sold, and the capital that changed hands.
+    """
+    if stockpiles is None:
+        stockpiles = load_order_stockpiles(orders, session)
+    bought = 0
+    sold = 0
+    turnover = Decimal('0')
+    for order in orders:
+        country = order.country
+        stockpile = stockpiles.get((country.id, resource.id))
+        if not stockpile:
+            stockpile = Stockpile(country=country, resource_id=resource.id, quantity=0)
+            session.add(stockpile)
+            stockpiles[country.id, resource.id] = stockpile
+
+        total = (clearing_price * order.quantity).quantize(CENT, rounding=ROUND_HALF_UP)
+        limit_total = Decimal(order.limit_total)
+        if order.order_type == "Buy":
+            order.is_filled = total <= limit_total + LIMIT_TOLERANCE
+            if order.is_filled:
+                # Never more than the buyer set aside
+                total = min(total, Decimal(order.escrow))
+                stockpile.quantity += order.quantity
+                bought += order.quantity
+                print(f"Country '{country.name}' bought {order.quantity} of '{resource.name}' for {total}.")
+            else:
+                total = Decimal('0')
+                print(f"Buy order of country '{country.name}' for {order.quantity} of '{resource.name}' was not filled, its limit {limit_total} is below the price of {clearing_price} per unit.")
+            country.government_capital += Decimal(order.escrow) - total
+        else:
+            order.is_filled = total >= limit_total - LIMIT_TOLERANCE
+            if order.is_filled:
+                country.government_capital += total
+                sold += order.quantity
+                print(f"Country '{country.name}' sold {order.quantity} of '{resource.name}' for {total}.")
+            else:
+                stockpile.quantity += order.quantity
+                print(f"Sell order of country '{country.name}' for {order.quantity} of '{resource.name}' was not filled, its limit {limit_total} is above the price of {clearing_price} per unit.")
+
+        order.is_cleared = True
+        if order.is_filled:
+            turnover += total
+            session.add(MarketTransaction(
+                turn_id=turn.id,
+                country_id=country.id,
+                resource_id=resource.id,
+                transaction_type=order.order_type,
+                quantity=order.quantity,
+                price_per_unit=clearing_price,
+                total_price=total
+            ))
+    return bought, sold, turnover
+
+def next_market_price(market: ResourceMarket, clearing_price: Decimal, net_bought: int):
+    """
+    Returns the price after the house bought (negative) or sold (positive) net_bought units,
+    within the market's min_price and max_price.
+    """
+    if not net_bought or not market.quantity_threshold:
+        return clearing_price
+    new_price = clearing_price * (Decimal('1') + PRICE_IMPACT * Decimal(net_bought) / Decimal(market.quantity_threshold))
+    return max(min(new_price, Decimal(market.max_price)), Decimal(market.min_price))
@@ -0,0 +1,140 @@
+# market_history.py
+
+import sys
+from decimal import Decimal
+from sqlalchemy.orm import Session, sessionmaker
+from database import create_game_engine
+from models import Turn, Resource, ResourceMarket, MarketPrice
+
+# Number of past turns the price change shown in the prompts is measured over
+PRICE_CHANGE_TURNS = 5
+
+
+def get_price_series(game_id: int, session: Session, first_turn: int = None, last_turn: int = None, resource_names=None):
+    """
+    Returns the price and volume of every resource turn by turn, from the recorded price history.
+
+    Args:
+        game_id (int): The game ID.
+        session (Session): The SQLAlchemy session.
+        first_turn (int): First turn number of the range, the game's first if not given.
+        last_turn (int): Last turn number of the range, the latest recorded if not given.
+        resource_names (list): Resources to include, every resource if not given.
+
+    Returns:
+        dict: By resource name, the list of turns in order, each with its Turn number, Open,
+            High, Low and Close prices, Volume, Bought and Sold quantities and Turnover.
+    """
+    query = session.query(MarketPrice, Turn.turn_number, Resource.name).join(
+        Turn, MarketPrice.turn_id == Turn.id
+    ).join(
+        Resource, MarketPrice.resource_id == Resource.id
+    ).filter(Turn.game_id == game_id)
+    if first_turn is not None:
+        query = query.filter(Turn.turn_number >= first_turn)
+    if last_turn is not None:
+        query = query.filter(Turn.turn_number <= last_turn)
+    if resource_names is not None:
+        query = query.filter(Resource.name.in_(list(resource_names)))
+
+    series = {}
+    for price, turn_number, resource_name in query.order_by(Resource.name, Turn.turn_number):
+        close_price = price.close_price if price.close_price is not None else price.price
+        series.setdefault(resource_name, []).append({
+            "Turn": turn_number,
+            "Open": float(price.price),
+            "High": float(price.high_price if price.high_price is not None else max(price.price, close_price)),
+            "Low": float(price.low_price if price.low_price is not None else min(price.price, close_price)),
+            "Close": float(close_price),
+            "Volume": price.volume_bought + price.volume_sold,
+            "Bought": price.volume_bought,
+            "Sold": price.volume_sold,
+            "Turnover": float(price.turnover)
+        })
+    return series
+
+def get_ohlc(game_id: int, session: Session, first_turn: int = None, last_turn: int = None, resource_names=None):
+    """
+    Returns the open, high, low and close prices and the volumes of every resource over a range of turns.
+
+    Takes the same arguments as get_price_series.
+
+    Returns:
+        dict: By resource name, the First and Last turn numbers recorded in the range, Open,
+            High, Low and Close prices, Volume, Bought and Sold quantities and Turnover.
+    """
+    ohlc = {}
+    for resource_name, turns in get_price_series(game_id, session, first_turn, last_turn, resource_names).items():
+        ohlc[resource_name] = {
+            "First": turns[0]["Turn"],
+            "Last": turns[-1]["Turn"],
+            "Open": turns[0]["Open"],
+            "High": max(turn["High"] for turn in turns),
+            "Low": min(turn["Low"] for turn in turns),
+            "Close": turns[-1]["Close"],
+            "Volume": sum(turn["Volume"] for turn in turns),
+            "Bought": sum(turn["Bought"] for turn in turns),
+            "Sold": sum(turn["Sold"] for turn in turns),
+            "Turnover": sum(turn["Turnover"] for turn in turns)
+        }
+    return ohlc
+
+def get_price_changes(game_id: int, turn_number: int, session: Session, turns: int = PRICE_CHANGE_TURNS):
+    """
+    Returns how much each resource's price moved over the last turns before a turn.
+
+    Args:
+        game_id (int): The game ID.
+        turn_number (int): The current turn number.
+        session (Session): The SQLAlchemy session.
+        turns (int): Number of past turns the change is measured over.
+
+    Returns:
+        dict: By resource name, the change in percent from the price the earliest of those
+            turns opened at to the current price. Resources without history are left out.
+    """
+    first_turn = max(turn_number - turns, 1)
+    if first_turn >= turn_number:
+        return {}
+    rows = session.query(Resource.name, ResourceMarket.current_price, MarketPrice.price).join(
+        ResourceMarket, ResourceMarket.resource_id == Resource.id
+    ).join(
+        MarketPrice, MarketPrice.resource_id == Resource.id
+    ).join(
+        Turn, MarketPrice.turn_id == Turn.id
+    ).filter(
+        ResourceMarket.game_id == game_id, Turn.game_id == game_id, Turn.turn_number == first_turn
+    )
+    return {
+        name: round(float((Decimal(current_price) - Decimal(opening_price)) / Decimal(opening_price) * 100), 1)
+        for name, current_price, opening_price in rows if opening_price
+    }
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python market_history.py <database file> [game ID] [first turn] [last turn]")
+        return 1
+
+    engine = create_game_engine(f"sqlite:///{argv[0]}")
+    game_id = int(argv[1]) if len(argv) > 1 else 1
+    first_turn = int(argv[2]) if len(argv) > 2 else None
+    last_turn = int(argv[3]) if len(argv) > 3 else None
+
+    session = sessionmaker(bind=engine)()
+    try:
+        ohlc = get_ohlc(game_id, session, first_turn, last_turn)
+    finally:
+        session.close()
+
+    if not ohlc:
+        print(f"No price history recorded for game {game_id}.")
+        return 0
+    print(f"{'Resource':<24}{'Turns':>9}{'Open':>12}{'High':>12}{'Low':>12}{'Close':>12}{'Volume':>10}")
+    for name, data in sorted(ohlc.items()):
+        turns = f"{data['First']}-{data['Last']}"
+        print(f"{name:<24}{turns:>9}{data['Open']:>12.2f}{data['High']:>12.2f}{data['Low']:>12.2f}{data['Close']:>12.2f}{data['Volume']:>10}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+# migrations/__init__.py
+from .runner import upgrade, current_revision, applied_revisions, pending_revisions, VERSION_TABLE
+from .operations import (
+    has_table,
+    has_column,
+    add_column,
+    create_index,
+    batch_recreate_table,
+    backfill_in_batches
+)
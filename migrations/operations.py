@@ -0,0 +1,140 @@
+# migrations/operations.py
+import re
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable, CreateColumn, CreateIndex, DropTable
+
+# Rows updated per transaction by backfill_in_batches
+BACKFILL_BATCH_SIZE = 5000
+
+
+def has_table(connection, table_name):
+    return inspect(connection).has_table(table_name)
+
+def has_column(connection, table_name, column_name):
+    return column_name in {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+def has_index(connection, table_name, index_name):
+    return index_name in {index["name"] for index in inspect(connection).get_indexes(table_name)}
+
+def add_column(connection, table_name, column):
+    """
+    Adds a column to a table unless it already has it.
+
+    SQLite can only add columns that are nullable or have a server default.
+
+    Args:
+        connection: The connection of the migration.
+        table_name (str): The table.
+        column (Column): The new column, not attached to any table.
+
+    Returns:
+        bool: Whether the column was added.
+    """
+    if has_column(connection, table_name, column.name):
+        return False
+    definition = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {definition}"))
+    return True
+
+def create_index(bind, index):
+    """
+    Creates an index unless it already exists.
+
+    Given an engine, the index is built in a transaction of its own, which keeps the write lock
+    on large tables as short as possible, and concurrently with writes on PostgreSQL.
+
+    Args:
+        bind: The connection of the migration, or the engine for a non-transactional migration.
+        index (Index): The index, as defined on the model's table.
+
+    Returns:
+        bool: Whether the index was created.
+    """
+    if not isinstance(bind, Engine):
+        if has_index(bind, index.table.name, index.name):
+            return False
+        bind.execute(CreateIndex(index))
+        return True
+
+    if bind.dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if has_index(connection, index.table.name, index.name):
+                return False
+            statement = str(CreateIndex(index).compile(dialect=bind.dialect))
+            connection.execute(text(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", statement)))
+        return True
+
+    with bind.begin() as connection:
+        return create_index(connection, index)
+
+def batch_recreate_table(connection, table, copy_columns=None):
+    """
+    Rebuilds a table with a new definition, keeping its rows.
+
+    This is how changes SQLite's ALTER TABLE cannot make are applied, such as dropping a column
+    or changing a constraint: the new table is created under a temporary name, the rows are
+    copied, the old table is dropped and the new one renamed, then its indexes are created.
+
+    Args:
+        connection: The connection of the migration.
+        table (Table): The new definition of the table, usually the model's table.
+        copy_columns (dict): SQL expressions over the old table's columns filling new columns,
+            by column name. Columns present in both tables are copied as they are.
+    """
+    metadata = MetaData()
+    # The referenced tables are only needed to write the foreign keys of the new table
+    for foreign_key in table.foreign_keys:
+        if foreign_key.column.table.name not in metadata.tables:
+            foreign_key.column.table.to_metadata(metadata)
+    temporary_name = f"_batch_{table.name}"
+    new_table = table.to_metadata(metadata, name=temporary_name)
+
+    old_columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    expressions = dict(copy_columns or {})
+    for column in table.columns:
+        if column.name not in expressions and column.name in old_columns:
+            expressions[column.name] = f'"{column.name}"'
+
+    connection.execute(DropTable(new_table, if_exists=True))
+    connection.execute(CreateTable(new_table))
+    names = ", ".join(f'"{name}"' for name in expressions)
+    connection.execute(text(
+        f"INSERT INTO {temporary_name} ({names}) SELECT {', '.join(expressions.values())} FROM {table.name}"
+    ))
+    connection.execute(text(f"DROP TABLE {table.name}"))
+    connection.execute(text(f"ALTER TABLE {temporary_name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        connection.execute(CreateIndex(index))
+
+def backfill_in_batches(engine, table_name, assignments, where="1 = 1", key="id", batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Runs an UPDATE over a large table in batches of key ranges, each in a transaction of its own,
+    so that the game can keep writing between batches. The update must be safe to run again.
+
+    Args:
+        engine: The engine, for a non-transactional migration.
+        table_name (str): The table.
+        assignments (str): The SET clause, e.g. "volume = quantity".
+        where (str): Condition selecting the rows to update.
+        key (str): Integer key column the batches are ranges of.
+        batch_size (int): Width of each key range.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    with engine.connect() as connection:
+        low, high = connection.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table_name}")).one()
+    if low is None:
+        return 0
+
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        with engine.begin() as connection:
+            result = connection.execute(
+                text(f"UPDATE {table_name} SET {assignments} WHERE {key} >= :start AND {key} < :end AND ({where})"),
+                {"start": start, "end": start + batch_size},
+            )
+            updated += result.rowcount
+    return updated
@@ -0,0 +1,93 @@
+# migrations/runner.py
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, String, DateTime, inspect, select
+from .versions import REVISIONS
+
+# Table recording every applied revision
+VERSION_TABLE = "schema_version"
+
+_metadata = MetaData()
+schema_version = Table(
+    VERSION_TABLE, _metadata,
+    Column("revision", String, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def applied_revisions(engine):
+    """
+    Returns the revisions already applied to a database, in order.
+    """
+    if not inspect(engine).has_table(VERSION_TABLE):
+        return []
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(schema_version.c.revision)).scalars())
+    return [migration.revision for migration in REVISIONS if migration.revision in applied]
+
+def current_revision(engine):
+    """
+    Returns the latest revision applied to a database, or None for a database without any.
+    """
+    applied = applied_revisions(engine)
+    return applied[-1] if applied else None
+
+def pending_revisions(engine):
+    """
+    Returns the migration modules not applied to a database yet, in order.
+    """
+    applied = set(applied_revisions(engine))
+    return [migration for migration in REVISIONS if migration.revision not in applied]
+
+def upgrade(engine, target=None):
+    """
+    Applies the pending migrations to a database, in order.
+
+    A transactional migration runs in a single transaction together with the recording of its
+    revision, so it is either applied and recorded or not applied at all. Migrations marked
+    `transactional = False` get the engine and manage their own transactions, so that long
+    steps on large tables do not hold one write lock for their whole duration. Such migrations
+    must be safe to run again after an interruption.
+
+    Databases created before revisions were recorded go through every migration. Migrations
+    therefore skip the changes that are already in place.
+
+    Args:
+        engine: The SQLAlchemy engine of the database.
+        target (str): Last revision to apply, the latest if not given.
+
+    Returns:
+        list: The revisions applied.
+    """
+    revisions = [migration.revision for migration in REVISIONS]
+    if target is not None and target not in revisions:
+        raise ValueError(f"Unknown schema revision: {target}.")
+    last = revisions.index(target) if target is not None else len(revisions) - 1
+
+    _metadata.create_all(engine)
+    applied = []
+    for migration in pending_revisions(engine):
+        if revisions.index(migration.revision) > last:
+            break
+        print(f"Applying schema revision {migration.revision}: {migration.description}")
+        if getattr(migration, "transactional", True):
+            with engine.begin() as connection:
+                if connection.dialect.name == "sqlite" and not connection.connection.driver_connection.in_transaction:
+                    # The sqlite3 driver only opens transactions before DML, DDL would be committed at once,
+                    # unless the engine begins them itself, see database.create_game_engine
+                    connection.exec_driver_sql("BEGIN")
+                migration.upgrade(connection)
+                _record(connection, migration)
+        else:
+            migration.upgrade(engine)
+            with engine.begin() as connection:
+                _record(connection, migration)
+        applied.append(migration.revision)
+    return applied
+
+def _record(connection, migration):
+    connection.execute(schema_version.insert().values(
+        revision=migration.revision,
+        description=migration.description,
+        applied_at=datetime.now(),
+    ))
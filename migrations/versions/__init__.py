@@ -0,0 +1,19 @@
+# migrations/versions/__init__.py
+from . import v0001_initial_schema
+from . import v0002_country_ai_strategy
+from . import v0003_lookup_indexes
+from . import v0004_market_orders
+from . import v0005_market_price_history
+from . import v0006_resource_markets
+from . import v0007_market_order_country_index
+
+# Every migration, in the order they are applied
+REVISIONS = [
+    v0001_initial_schema,
+    v0002_country_ai_strategy,
+    v0003_lookup_indexes,
+    v0004_market_orders,
+    v0005_market_price_history,
+    v0006_resource_markets,
+    v0007_market_order_country_index,
+]
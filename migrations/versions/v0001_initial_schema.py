@@ -0,0 +1,210 @@
+# migrations/versions/v0001_initial_schema.py
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, Boolean, Numeric, Text, DateTime, Enum, ForeignKey, UniqueConstraint
+)
+
+revision = "0001"
+description = "Create the tables"
+
+# The tables as they were before the schema had revisions, the following revisions change them
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String, unique=True, nullable=False),
+)
+
+Table(
+    "games", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("current_turn_number", Integer),
+    Column("total_turns", Integer),
+    Column("created_at", DateTime, nullable=False),
+    Column("is_active", Boolean),
+)
+
+Table(
+    "turns", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("game_id", Integer, ForeignKey("games.id"), nullable=False),
+    Column("turn_number", Integer, nullable=False),
+)
+
+Table(
+    "resources", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True, nullable=False),
+    # Market properties, shared by every game
+    Column("base_price", Numeric, nullable=False),
+    Column("current_price", Numeric, nullable=False),
+    Column("quantity_threshold", Integer, nullable=False),
+    Column("max_transaction_per_turn", Integer, nullable=False),
+    Column("max_price", Numeric, nullable=False),
+    Column("min_price", Numeric, nullable=False),
+)
+
+Table(
+    "countries", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("game_id", Integer, ForeignKey("games.id"), nullable=False),
+    Column("name", String, nullable=False),
+    Column("is_ai", Boolean),
+    Column("government_capital", Numeric, nullable=False),
+    Column("total_skilled_workers", Integer, nullable=False),
+    Column("total_unskilled_workers", Integer, nullable=False),
+    Column("unemployed_skilled_workers", Integer, nullable=False),
+    Column("unemployed_unskilled_workers", Integer, nullable=False),
+)
+
+Table(
+    "stockpiles", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("country_id", Integer, ForeignKey("countries.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    UniqueConstraint("country_id", "resource_id", name="_country_resource_uc"),
+)
+
+Table(
+    "natural_resources", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("country_id", Integer, ForeignKey("countries.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("total_reserves", Integer, nullable=False),
+    Column("extraction_rate", Integer, nullable=False),
+    UniqueConstraint("country_id", "resource_id", name="_country_resource_natural_uc"),
+)
+
+Table(
+    "industries", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("country_id", Integer, ForeignKey("countries.id"), nullable=False),
+    Column("industry_id", String, nullable=False),
+    Column("type", Enum("Primary", "Secondary", "Tertiary", name="industry_type"), nullable=False),
+    Column("sub_type", String, nullable=False),
+    Column("production_level", Integer, nullable=False),
+    Column("technology_level", Integer, nullable=False),
+    Column("skilled_workers_employed", Integer, nullable=False),
+    Column("unskilled_workers_employed", Integer, nullable=False),
+)
+
+Table(
+    "industry_inputs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("industry_id", Integer, ForeignKey("industries.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+)
+
+Table(
+    "industry_outputs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("industry_id", Integer, ForeignKey("industries.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+)
+
+Table(
+    "technology_upgrades", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("industry_id", Integer, ForeignKey("industries.id"), nullable=False),
+    Column("initiated_turn_id", Integer, ForeignKey("turns.id"), nullable=False),
+    Column("new_technology_level", Integer, nullable=False),
+    Column("upgrade_cost", Numeric, nullable=False),
+    Column("total_time_required", Integer, nullable=False),
+    Column("remaining_time", Integer, nullable=False),
+    Column("benefits", Text),
+    Column("is_completed", Boolean),
+)
+
+Table(
+    "industry_expansions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("industry_id", Integer, ForeignKey("industries.id"), nullable=False),
+    Column("initiated_turn_id", Integer, ForeignKey("turns.id"), nullable=False),
+    Column("new_production_level", Integer, nullable=False),
+    Column("expansion_cost", Numeric, nullable=False),
+    Column("total_time_required", Integer, nullable=False),
+    Column("remaining_time", Integer, nullable=False),
+    Column("additional_skilled_workers_required", Integer, nullable=False),
+    Column("additional_unskilled_workers_required", Integer, nullable=False),
+    Column("increase_in_outputs", Text),
+    Column("additional_inputs_required", Text),
+    Column("is_completed", Boolean),
+)
+
+Table(
+    "actions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("turn_id", Integer, ForeignKey("turns.id"), nullable=False),
+    Column("country_id", Integer, ForeignKey("countries.id"), nullable=False),
+    Column("type", String, nullable=False),
+)
+
+Table(
+    "start_new_industry_actions", metadata,
+    Column("id", Integer, ForeignKey("actions.id"), primary_key=True),
+    Column("selected", Boolean),
+    Column("industry_id", String, nullable=False),
+    Column("industry_type", Enum("Primary", "Secondary", "Tertiary", name="industry_type"), nullable=False),
+    Column("sub_type", String, nullable=False),
+    Column("setup_cost", Numeric, nullable=False),
+    Column("production_level", Integer, nullable=False),
+    Column("technology_level", Integer, nullable=False),
+    Column("inputs_required", Text),
+    Column("outputs_produced", Text),
+    Column("skilled_workers_required", Integer, nullable=False),
+    Column("unskilled_workers_required", Integer, nullable=False),
+)
+
+Table(
+    "expand_industry_actions", metadata,
+    Column("id", Integer, ForeignKey("actions.id"), primary_key=True),
+    Column("selected", Boolean),
+    Column("industry_id", Integer, ForeignKey("industries.id"), nullable=False),
+    Column("new_production_level", Integer, nullable=False),
+    Column("expansion_cost", Numeric, nullable=False),
+    Column("additional_skilled_workers_required", Integer, nullable=False),
+    Column("additional_unskilled_workers_required", Integer, nullable=False),
+    Column("increase_in_outputs", Text),
+    Column("additional_inputs_required", Text),
+)
+
+Table(
+    "upgrade_technology_actions", metadata,
+    Column("id", Integer, ForeignKey("actions.id"), primary_key=True),
+    Column("selected", Boolean),
+    Column("industry_id", Integer, ForeignKey("industries.id"), nullable=False),
+    Column("new_technology_level", Integer, nullable=False),
+    Column("upgrade_cost", Numeric, nullable=False),
+    Column("time_to_complete", Integer, nullable=False),
+    Column("benefits", Text),
+)
+
+Table(
+    "market_transactions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("turn_id", Integer, ForeignKey("turns.id"), nullable=False),
+    Column("country_id", Integer, ForeignKey("countries.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("transaction_type", Enum("Buy", "Sell", name="transaction_type"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("price_per_unit", Numeric, nullable=False),
+    Column("total_price", Numeric, nullable=False),
+)
+
+Table(
+    "market_prices", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("turn_id", Integer, ForeignKey("turns.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("price", Numeric, nullable=False),
+    UniqueConstraint("turn_id", "resource_id", name="_turn_resource_price_uc"),
+)
+
+
+def upgrade(connection):
+    # Databases created before revisions were recorded already have the tables
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,10 @@
+# migrations/versions/v0002_country_ai_strategy.py
+from sqlalchemy import Column, String
+from ..operations import add_column
+
+revision = "0002"
+description = "Add countries.ai_strategy"
+
+
+def upgrade(connection):
+    add_column(connection, "countries", Column("ai_strategy", String, nullable=False, server_default="llm"))
@@ -0,0 +1,47 @@
+# migrations/versions/v0003_lookup_indexes.py
+from sqlalchemy import MetaData, Table, Column, Integer, String, Boolean, Index
+from ..operations import create_index
+
+revision = "0003"
+description = "Index the hot lookup columns"
+
+# Each index is built in a transaction of its own, actions and market_transactions can be large
+transactional = False
+
+# Only the indexed columns of each table are declared, the indexes are all this revision creates
+metadata = MetaData()
+countries = Table("countries", metadata, Column("id", Integer, primary_key=True),
+                  Column("game_id", Integer), Column("is_ai", Boolean))
+turns = Table("turns", metadata, Column("id", Integer, primary_key=True),
+              Column("game_id", Integer), Column("turn_number", Integer))
+actions = Table("actions", metadata, Column("id", Integer, primary_key=True),
+                Column("turn_id", Integer), Column("country_id", Integer))
+industries = Table("industries", metadata, Column("id", Integer, primary_key=True),
+                   Column("country_id", Integer), Column("industry_id", String))
+industry_inputs = Table("industry_inputs", metadata, Column("id", Integer, primary_key=True),
+                        Column("industry_id", Integer))
+industry_outputs = Table("industry_outputs", metadata, Column("id", Integer, primary_key=True),
+                         Column("industry_id", Integer))
+technology_upgrades = Table("technology_upgrades", metadata, Column("id", Integer, primary_key=True),
+                            Column("industry_id", Integer))
+industry_expansions = Table("industry_expansions", metadata, Column("id", Integer, primary_key=True),
+                            Column("industry_id", Integer))
+market_transactions = Table("market_transactions", metadata, Column("id", Integer, primary_key=True),
+                            Column("turn_id", Integer), Column("resource_id", Integer))
+
+INDEXES = [
+    Index("ix_countries_game_id_is_ai", countries.c.game_id, countries.c.is_ai),
+    Index("ix_turns_game_id_turn_number", turns.c.game_id, turns.c.turn_number),
+    Index("ix_actions_turn_id_country_id", actions.c.turn_id, actions.c.country_id),
+    Index("ix_industries_country_id_industry_id", industries.c.country_id, industries.c.industry_id),
+    Index("ix_industry_inputs_industry_id", industry_inputs.c.industry_id),
+    Index("ix_industry_outputs_industry_id", industry_outputs.c.industry_id),
+    Index("ix_technology_upgrades_industry_id", technology_upgrades.c.industry_id),
+    Index("ix_industry_expansions_industry_id", industry_expansions.c.industry_id),
+    Index("ix_market_transactions_turn_id_resource_id", market_transactions.c.turn_id, market_transactions.c.resource_id),
+]
+
+
+def upgrade(engine):
+    for index in INDEXES:
+        create_index(engine, index)
@@ -0,0 +1,30 @@
+# migrations/versions/v0004_market_orders.py
+from sqlalchemy import MetaData, Table, Column, Integer, Numeric, Boolean, Enum, ForeignKey, Index
+
+revision = "0004"
+description = "Add market_orders"
+
+metadata = MetaData()
+# Referenced by the foreign keys, these tables exist already
+Table("turns", metadata, Column("id", Integer, primary_key=True))
+Table("countries", metadata, Column("id", Integer, primary_key=True))
+Table("resources", metadata, Column("id", Integer, primary_key=True))
+
+market_orders = Table(
+    "market_orders", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("turn_id", Integer, ForeignKey("turns.id"), nullable=False),
+    Column("country_id", Integer, ForeignKey("countries.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("order_type", Enum("Buy", "Sell", name="order_type"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("limit_total", Numeric, nullable=False),
+    Column("escrow", Numeric, nullable=False),
+    Column("is_cleared", Boolean, nullable=False),
+    Column("is_filled", Boolean, nullable=False),
+    Index("ix_market_orders_turn_id_resource_id", "turn_id", "resource_id"),
+)
+
+
+def upgrade(connection):
+    market_orders.create(connection, checkfirst=True)
@@ -0,0 +1,56 @@
+# migrations/versions/v0005_market_price_history.py
+from sqlalchemy import Column, Integer, Numeric
+from ..operations import add_column, backfill_in_batches
+
+revision = "0005"
+description = "Add the closing, high and low prices and the volumes to market_prices"
+
+# The backfill runs in batches, market_prices has a row per resource per turn of every game
+transactional = False
+
+COLUMNS = [
+    Column("close_price", Numeric),
+    Column("high_price", Numeric),
+    Column("low_price", Numeric),
+    Column("volume_bought", Integer, nullable=False, server_default="0"),
+    Column("volume_sold", Integer, nullable=False, server_default="0"),
+    Column("turnover", Numeric, nullable=False, server_default="0"),
+]
+
+# The turn closed at the price the next turn of the same game cleared at
+NEXT_PRICE = """(
+    SELECT next_price.price FROM market_prices AS next_price
+    JOIN turns AS next_turn ON next_turn.id = next_price.turn_id
+    JOIN turns AS turn ON turn.id = market_prices.turn_id
+    WHERE next_price.resource_id = market_prices.resource_id
+    AND next_turn.game_id = turn.game_id AND next_turn.turn_number = turn.turn_number + 1
+)"""
+
+
+def _traded(column, transaction_type=None):
+    condition = f" AND transaction_type = '{transaction_type}'" if transaction_type else ""
+    return (
+        f"(SELECT COALESCE(SUM({column}), 0) FROM market_transactions"
+        f" WHERE turn_id = market_prices.turn_id AND resource_id = market_prices.resource_id{condition})"
+    )
+
+
+def upgrade(engine):
+    with engine.begin() as connection:
+        for column in COLUMNS:
+            add_column(connection, "market_prices", column)
+
+    backfill_in_batches(
+        engine, "market_prices",
+        f"close_price = COALESCE({NEXT_PRICE}, price), "
+        f"volume_bought = {_traded('quantity', 'Buy')}, "
+        f"volume_sold = {_traded('quantity', 'Sell')}, "
+        f"turnover = {_traded('total_price')}",
+        where="close_price IS NULL",
+    )
+    backfill_in_batches(
+        engine, "market_prices",
+        "high_price = CASE WHEN close_price > price THEN close_price ELSE price END, "
+        "low_price = CASE WHEN close_price < price THEN close_price ELSE price END",
+        where="high_price IS NULL",
+    )
@@ -0,0 +1,49 @@
+# migrations/versions/v0006_resource_markets.py
+from sqlalchemy import MetaData, Table, Column, Integer, String, Numeric, ForeignKey, UniqueConstraint, text
+from ..operations import has_column, batch_recreate_table
+
+revision = "0006"
+description = "Move the market properties of resources to per-game resource_markets"
+
+metadata = MetaData()
+Table("games", metadata, Column("id", Integer, primary_key=True))
+
+# The resources without their market properties
+resources = Table(
+    "resources", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True, nullable=False),
+)
+
+resource_markets = Table(
+    "resource_markets", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("game_id", Integer, ForeignKey("games.id"), nullable=False),
+    Column("resource_id", Integer, ForeignKey("resources.id"), nullable=False),
+    Column("base_price", Numeric, nullable=False),
+    Column("current_price", Numeric, nullable=False),
+    Column("quantity_threshold", Integer, nullable=False),
+    Column("max_transaction_per_turn", Integer, nullable=False),
+    Column("max_price", Numeric, nullable=False),
+    Column("min_price", Numeric, nullable=False),
+    UniqueConstraint("game_id", "resource_id", name="_game_resource_market_uc"),
+)
+
+MARKET_COLUMNS = ["base_price", "current_price", "quantity_threshold", "max_transaction_per_turn", "max_price", "min_price"]
+
+
+def upgrade(connection):
+    resource_markets.create(connection, checkfirst=True)
+    if not has_column(connection, "resources", "current_price"):
+        return
+
+    # Every game starts from the prices the resources had when they were shared
+    columns = ", ".join(MARKET_COLUMNS)
+    connection.execute(text(
+        f"INSERT INTO resource_markets (game_id, resource_id, {columns}) "
+        f"SELECT games.id, resources.id, {', '.join(f'resources.{column}' for column in MARKET_COLUMNS)} "
+        f"FROM games CROSS JOIN resources "
+        f"WHERE NOT EXISTS (SELECT 1 FROM resource_markets "
+        f"WHERE resource_markets.game_id = games.id AND resource_markets.resource_id = resources.id)"
+    ))
+    batch_recreate_table(connection, resources)
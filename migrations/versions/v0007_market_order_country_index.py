@@ -0,0 +1,24 @@
+# migrations/versions/v0007_market_order_country_index.py
+from sqlalchemy import MetaData, Table, Column, Integer, Index
+from ..operations import create_index
+
+revision = "0007"
+description = "Index the market orders of a country"
+
+# The index is built in a transaction of its own, market_orders can be large
+transactional = False
+
+metadata = MetaData()
+market_orders = Table(
+    "market_orders", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("turn_id", Integer, nullable=False),
+    Column("country_id", Integer, nullable=False),
+)
+ix_market_orders_country_id_turn_id = Index(
+    "ix_market_orders_country_id_turn_id", market_orders.c.country_id, market_orders.c.turn_id
+)
+
+
+def upgrade(engine):
+    create_index(engine, ix_market_orders_country_id_turn_id)
@@ -12,5 +12,5 @@ from .action import (
     UpgradeTechnologyAction
 )
 from .transaction import MarketTransaction
-from .market import MarketPrice
+from .market import ResourceMarket, MarketPrice, MarketOrder
 
@@ -1,5 +1,5 @@
 # models/action.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum, Numeric, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum, Numeric, Text, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -10,6 +10,10 @@ class Action(Base):
     turn_id = Column(Integer, ForeignKey('turns.id'), nullable=False)
     country_id = Column(Integer, ForeignKey('countries.id'), nullable=False)
     type = Column(String, nullable=False)
+    # Index for the options of a country in a turn
+    __table_args__ = (
+        Index('ix_actions_turn_id_country_id', 'turn_id', 'country_id'),
+    )
     # Polymorphic configuration
     __mapper_args__ = {
         'polymorphic_on': type,
@@ -1,5 +1,5 @@
 # models/country.py
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -10,12 +10,18 @@ class Country(Base):
     game_id = Column(Integer, ForeignKey('games.id'), nullable=False)
     name = Column(String, nullable=False)
     is_ai = Column(Boolean, default=True)
+    # How AI decisions are made: 'llm' or 'rule_based'
+    ai_strategy = Column(String, nullable=False, default='llm', server_default='llm')
     government_capital = Column(Numeric, nullable=False)
     # Workforce
     total_skilled_workers = Column(Integer, nullable=False)
     total_unskilled_workers = Column(Integer, nullable=False)
     unemployed_skilled_workers = Column(Integer, nullable=False)
     unemployed_unskilled_workers = Column(Integer, nullable=False)
+    # Index for the (AI) countries of a game
+    __table_args__ = (
+        Index('ix_countries_game_id_is_ai', 'game_id', 'is_ai'),
+    )
     # Relationships
     game = relationship('Game', back_populates='countries')
     industries = relationship('Industry', back_populates='country')
@@ -23,6 +29,7 @@ class Country(Base):
     natural_resources = relationship('NaturalResource', back_populates='country')
     actions = relationship('Action', back_populates='country')
     transactions = relationship('MarketTransaction', back_populates='country')
+    market_orders = relationship('MarketOrder', back_populates='country')
 
 class Stockpile(Base):
     __tablename__ = 'stockpiles'
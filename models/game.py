@@ -1,5 +1,5 @@
 # models/game.py
-from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -16,6 +16,7 @@ class Game(Base):
     user = relationship('User', back_populates='games')
     countries = relationship('Country', back_populates='game')
     turns = relationship('Turn', back_populates='game', order_by='Turn.turn_number')
+    resource_markets = relationship('ResourceMarket', back_populates='game')
 
 class Turn(Base):
     __tablename__ = 'turns'
@@ -23,8 +24,13 @@ class Turn(Base):
     id = Column(Integer, primary_key=True)
     game_id = Column(Integer, ForeignKey('games.id'), nullable=False)
     turn_number = Column(Integer, nullable=False)
+    # Index for looking up a game's turn by number
+    __table_args__ = (
+        Index('ix_turns_game_id_turn_number', 'game_id', 'turn_number'),
+    )
     # Relationships
     game = relationship('Game', back_populates='turns')
     actions = relationship('Action', back_populates='turn')
     market_transactions = relationship('MarketTransaction', back_populates='turn')
     market_prices = relationship('MarketPrice', back_populates='turn')
+    market_orders = relationship('MarketOrder', back_populates='turn')
@@ -1,6 +1,6 @@
 # models/industry.py
 from sqlalchemy import (
-    Column, Integer, String, Enum, ForeignKey, Numeric, Text, Boolean
+    Column, Integer, String, Enum, ForeignKey, Numeric, Text, Boolean, Index
 )
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -18,6 +18,10 @@ class Industry(Base):
     # Workforce employed after technology reductions
     skilled_workers_employed = Column(Integer, nullable=False)
     unskilled_workers_employed = Column(Integer, nullable=False)
+    # Index for the industries of a country, and one of them by its industry ID
+    __table_args__ = (
+        Index('ix_industries_country_id_industry_id', 'country_id', 'industry_id'),
+    )
     # Relationships
     country = relationship('Country', back_populates='industries')
     inputs = relationship('IndustryInput', back_populates='industry')
@@ -37,6 +41,10 @@ class TechnologyUpgrade(Base):
     remaining_time = Column(Integer, nullable=False)  # Decrements each turn
     benefits = Column(Text, nullable=True)  # JSON string
     is_completed = Column(Boolean, default=False)
+    # Index for the upgrades of an industry
+    __table_args__ = (
+        Index('ix_technology_upgrades_industry_id', 'industry_id'),
+    )
     # Relationships
     industry = relationship('Industry', back_populates='technology_upgrades')
     initiated_turn = relationship('Turn')  # Assuming you might want to access the turn
@@ -56,6 +64,10 @@ class IndustryExpansion(Base):
     increase_in_outputs = Column(Text, nullable=True)  # Added field
     additional_inputs_required = Column(Text, nullable=True)  # Added field
     is_completed = Column(Boolean, default=False)
+    # Index for the expansions of an industry
+    __table_args__ = (
+        Index('ix_industry_expansions_industry_id', 'industry_id'),
+    )
     # Relationships
     industry = relationship('Industry', back_populates='expansions')
     initiated_turn = relationship('Turn')
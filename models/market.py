@@ -1,15 +1,45 @@
 # models/market.py
-from sqlalchemy import Column, Integer, Numeric, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, Numeric, Boolean, Enum, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
+class ResourceMarket(Base):
+    __tablename__ = 'resource_markets'
+
+    id = Column(Integer, primary_key=True)
+    game_id = Column(Integer, ForeignKey('games.id'), nullable=False)
+    resource_id = Column(Integer, ForeignKey('resources.id'), nullable=False)
+    # Market properties of the resource in the game
+    base_price = Column(Numeric, nullable=False)
+    current_price = Column(Numeric, nullable=False)
+    quantity_threshold = Column(Integer, nullable=False)
+    max_transaction_per_turn = Column(Integer, nullable=False)
+    max_price = Column(Numeric, nullable=False)
+    min_price = Column(Numeric, nullable=False)
+    # Unique constraint, also the index for the markets of a game
+    __table_args__ = (
+        UniqueConstraint('game_id', 'resource_id', name='_game_resource_market_uc'),
+    )
+    # Relationships
+    game = relationship('Game', back_populates='resource_markets')
+    resource = relationship('Resource', back_populates='markets')
+
 class MarketPrice(Base):
     __tablename__ = 'market_prices'
 
     id = Column(Integer, primary_key=True)
     turn_id = Column(Integer, ForeignKey('turns.id'), nullable=False)
     resource_id = Column(Integer, ForeignKey('resources.id'), nullable=False)
+    # Price the turn's orders cleared at, which is also the turn's opening price
     price = Column(Numeric, nullable=False)
+    # Price after the turn's trades, the next turn opens at it
+    close_price = Column(Numeric)
+    high_price = Column(Numeric)
+    low_price = Column(Numeric)
+    # Units the countries bought and sold, and the capital that changed hands
+    volume_bought = Column(Integer, nullable=False, server_default='0')
+    volume_sold = Column(Integer, nullable=False, server_default='0')
+    turnover = Column(Numeric, nullable=False, server_default='0')
     # Unique constraint
     __table_args__ = (
         UniqueConstraint('turn_id', 'resource_id', name='_turn_resource_price_uc'),
@@ -17,3 +47,28 @@ class MarketPrice(Base):
     # Relationships
     turn = relationship('Turn', back_populates='market_prices')
     resource = relationship('Resource', back_populates='market_prices')
+
+class MarketOrder(Base):
+    __tablename__ = 'market_orders'
+
+    id = Column(Integer, primary_key=True)
+    turn_id = Column(Integer, ForeignKey('turns.id'), nullable=False)
+    country_id = Column(Integer, ForeignKey('countries.id'), nullable=False)
+    resource_id = Column(Integer, ForeignKey('resources.id'), nullable=False)
+    order_type = Column(Enum('Buy', 'Sell', name='order_type'), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    # Highest total a buyer pays, or lowest total a seller accepts, for the whole quantity
+    limit_total = Column(Numeric, nullable=False)
+    # Capital set aside for a buy order until the market clears (sell orders set aside their quantity)
+    escrow = Column(Numeric, nullable=False, default=0)
+    is_cleared = Column(Boolean, nullable=False, default=False)
+    is_filled = Column(Boolean, nullable=False, default=False)
+    # Indexes for the orders of a resource in a turn, and for the orders of a country
+    __table_args__ = (
+        Index('ix_market_orders_turn_id_resource_id', 'turn_id', 'resource_id'),
+        Index('ix_market_orders_country_id_turn_id', 'country_id', 'turn_id'),
+    )
+    # Relationships
+    turn = relationship('Turn', back_populates='market_orders')
+    country = relationship('Country', back_populates='market_orders')
+    resource = relationship('Resource', back_populates='market_orders')
@@ -1,5 +1,5 @@
 # models/resource.py
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -8,13 +8,6 @@ class Resource(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)
-    # Market properties
-    base_price = Column(Numeric, nullable=False)
-    current_price = Column(Numeric, nullable=False)
-    quantity_threshold = Column(Integer, nullable=False)
-    max_transaction_per_turn = Column(Integer, nullable=False)
-    max_price = Column(Numeric, nullable=False)
-    min_price = Column(Numeric, nullable=False)
     # Relationships
     industry_inputs = relationship('IndustryInput', back_populates='resource')
     industry_outputs = relationship('IndustryOutput', back_populates='resource')
@@ -22,6 +15,8 @@ class Resource(Base):
     natural_resources = relationship('NaturalResource', back_populates='resource')
     transactions = relationship('MarketTransaction', back_populates='resource')
     market_prices = relationship('MarketPrice', back_populates='resource')
+    market_orders = relationship('MarketOrder', back_populates='resource')
+    markets = relationship('ResourceMarket', back_populates='resource')
 
 class IndustryInput(Base):
     __tablename__ = 'industry_inputs'
@@ -31,6 +26,10 @@ class IndustryInput(Base):
     resource_id = Column(Integer, ForeignKey('resources.id'), nullable=False)
     # Quantity per production cycle at current production level
     quantity = Column(Integer, nullable=False)
+    # Index for the inputs of an industry
+    __table_args__ = (
+        Index('ix_industry_inputs_industry_id', 'industry_id'),
+    )
     # Relationships
     industry = relationship('Industry', back_populates='inputs')
     resource = relationship('Resource', back_populates='industry_inputs')
@@ -43,6 +42,10 @@ class IndustryOutput(Base):
     resource_id = Column(Integer, ForeignKey('resources.id'), nullable=False)
     # Quantity per production cycle at current production level
     quantity = Column(Integer, nullable=False)
+    # Index for the outputs of an industry
+    __table_args__ = (
+        Index('ix_industry_outputs_industry_id', 'industry_id'),
+    )
     # Relationships
     industry = relationship('Industry', back_populates='outputs')
     resource = relationship('Resource', back_populates='industry_outputs')
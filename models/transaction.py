@@ -1,5 +1,5 @@
 # models/transaction.py
-from sqlalchemy import Column, Integer, Enum, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, Enum, Numeric, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -14,6 +14,10 @@ class MarketTransaction(Base):
     quantity = Column(Integer, nullable=False)
     price_per_unit = Column(Numeric, nullable=False)
     total_price = Column(Numeric, nullable=False)
+    # Index for the transactions of a resource in a turn
+    __table_args__ = (
+        Index('ix_market_transactions_turn_id_resource_id', 'turn_id', 'resource_id'),
+    )
     # Relationships
     turn = relationship('Turn', back_populates='market_transactions')
     country = relationship('Country', back_populates='transactions')
@@ -1,21 +1,18 @@
 # determine_winner.py
 
-import os
 import json
-from openai import OpenAI
 from sqlalchemy.orm import Session
-from models import (
-    Game, Country, Industry, IndustryInput, IndustryOutput, Stockpile, NaturalResource
-)
+from json_stream import parse_json_text, MalformedJSONError
+from llm_client import get_openai_response
+from llm_transport import ReplayMissError
+from prompt_templates import build_prompt
+from country_schema import get_country_schema, get_country_schemas
+from models import Game, Country
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
 
 def pick_winner(game_id: int, session: Session):
     """
-    Determines the winner of the game after 50 turns by evaluating the final states
+    Determines the winner of the game after its last turn by evaluating the final states
     of all countries using an AI model as per the 'pickWinner.md' prompt.
 
     Args:
@@ -32,9 +29,9 @@ def pick_winner(game_id: int, session: Session):
             print(f"Game with ID {game_id} not found.")
             return
 
-        # Ensure the game has completed 50 turns
-        if game.current_turn_number < 50:
-            print(f"Game has not completed 50 turns. Current turn: {game.current_turn_number}")
+        # Ensure the game has completed all its turns
+        if game.current_turn_number < game.total_turns:
+            print(f"Game has not completed {game.total_turns} turns. Current turn: {game.current_turn_number}")
             return
 
         # Fetch all countries in the game
@@ -47,7 +44,7 @@ def pick_winner(game_id: int, session: Session):
         prompt = prepare_winner_prompt(countries, session)
 
         # Send the prompt to the AI model
-        ai_response_text = get_ai_response(prompt)
+        ai_response_text = get_openai_response(prompt, call_site="pick_winner")
 
         # Parse the AI's response
         winner_data = parse_winner_response(ai_response_text)
@@ -61,6 +58,8 @@ def pick_winner(game_id: int, session: Session):
             print("Failed to determine the winner.")
             return None
 
+    except ReplayMissError:
+        raise
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
@@ -76,11 +75,8 @@ def prepare_winner_prompt(countries, session: Session):
     Returns:
         str: The prepared prompt.
     """
-    # Read the contents of 'pickWinner.md' for the prompt
-    with open('prompts/gameplay/pickWinner.md', 'r') as f:
-        base_prompt = f.read()
-
     # Collect the end-state data for all countries
+    get_country_schemas(countries, session)
     country_data_list = []
     for country in countries:
         country_data = gather_country_end_state(country, session)
@@ -90,7 +86,7 @@ def prepare_winner_prompt(countries, session: Session):
     country_data_json = json.dumps(country_data_list, indent=2)
 
     # Prepare the final prompt by inserting the country data into the base prompt
-    prompt = f"{base_prompt}\n\n### **End-State Data for All Countries:**\n```json\n{country_data_json}\n```\n\n**Remember:** Provide only the JSON output as specified, without additional commentary or text outside the structured format."
+    prompt = build_prompt("pick_winner", f"\n\n### **End-State Data for All Countries:**\n```json\n{country_data_json}\n```\n\n**Remember:** Provide only the JSON output as specified, without additional commentary or text outside the structured format.")
 
     return prompt
 
@@ -105,89 +101,8 @@ def gather_country_end_state(country: Country, session: Session):
     Returns:
         dict: A dictionary containing the country's end-state data.
     """
-    # Industries
-    industries = []
-    for industry in country.industries:
-        # Inputs
-        inputs = {}
-        for industry_input in industry.inputs:
-            resource_name = industry_input.resource.name
-            quantity = industry_input.quantity
-            inputs[resource_name] = quantity
-
-        # Outputs
-        outputs = {}
-        for industry_output in industry.outputs:
-            resource_name = industry_output.resource.name
-            quantity = industry_output.quantity
-            outputs[resource_name] = quantity
-
-        industry_data = {
-            "Industry ID": industry.industry_id,
-            "Type": industry.type,
-            "Sub-Type": industry.sub_type,
-            "Production Level": industry.production_level,
-            "Technology Level": industry.technology_level,
-            "Inputs": inputs,
-            "Outputs": outputs,
-            "Skilled Workers Employed": industry.skilled_workers_employed,
-            "Unskilled Workers Employed": industry.unskilled_workers_employed
-        }
-        industries.append(industry_data)
-
-    # Stockpiles
-    stockpiles = {}
-    for stockpile in country.stockpiles:
-        resource_name = stockpile.resource.name
-        quantity = stockpile.quantity
-        stockpiles[resource_name] = quantity
-
-    # Natural Resources
-    natural_resources = {}
-    for nat_resource in country.natural_resources:
-        resource_name = nat_resource.resource.name
-        resource_info = {
-            "Total Reserves": nat_resource.total_reserves,
-            "Extraction Rate": nat_resource.extraction_rate
-        }
-        natural_resources[resource_name] = resource_info
-
-    # Country data
-    country_data = {
-        "Country Name": country.name,
-        "Government Capital Pool": float(country.government_capital),
-        "Industries": industries,
-        "Stockpiles": stockpiles,
-        "Natural Resources": natural_resources
-    }
-
-    return country_data
-
-def get_ai_response(prompt):
-    """
-    Sends the prompt to the AI model and returns the response text.
-
-    Args:
-        prompt (str): The prompt to send.
-
-    Returns:
-        str: The response text from the AI model.
-    """
-    try:
-        response = client.chat.completions.create(
-            model="openai/gpt-4",
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-        )
-        response_text = response.choices[0].message.content.strip()
-        return response_text
-    except Exception as e:
-        print(f"OpenAI API error: {e}")
-        return ""
+    country_schema = get_country_schema(country, session)
+    return {key: value for key, value in country_schema.items() if key != "Workforce"}
 
 def parse_winner_response(response_text):
     """
@@ -200,17 +115,9 @@ def parse_winner_response(response_text):
         dict: Parsed winner data if successful, None otherwise.
     """
     try:
-        # Remove code fences if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]  # Remove ```json
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]  # Remove ```
-        response_text = response_text.strip()
-
-        # Parse JSON
-        winner_data = json.loads(response_text)
+        winner_data = parse_json_text(response_text)
         return winner_data
-    except json.JSONDecodeError as e:
+    except MalformedJSONError as e:
         print("Failed to parse AI response JSON.")
         print("Response text:", response_text)
         print("Error message:", str(e))
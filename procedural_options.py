@@ -0,0 +1,218 @@
+# procedural_options.py
+
+import random
+from sqlalchemy.orm import Session
+from models import Country, Industry, Resource, ResourceMarket
+
+# Number of new industry options offered each turn
+NEW_INDUSTRY_OPTIONS = 5
+# Capital needed per worker hired, on top of the value-based part of the cost
+COST_PER_SKILLED_WORKER = 1000
+COST_PER_UNSKILLED_WORKER = 250
+# Turns of net output value an investment costs
+PAYBACK_TURNS = 10
+# Minimum cost of any option
+MIN_OPTION_COST = 10000
+# Base cost of a technology upgrade per technology level and production level
+UPGRADE_COST_PER_LEVEL = 25000
+# Technology level above which no further upgrades are offered
+MAX_TECHNOLOGY_LEVEL = 10
+# Relative spread applied to generated costs
+COST_JITTER = 0.1
+
+
+def build_industry_catalogue(game_id: int, session: Session):
+    """
+    Collects the industry recipes and resource prices that options are derived from.
+
+    Every industry of every country in the game is turned into a recipe per production level,
+    keyed by sub-type. IndustryInput/IndustryOutput quantities are already per level, production
+    multiplies them by the level, while the workers employed are divided by it.
+
+    Args:
+        game_id (int): The ID of the current game.
+        session (Session): The SQLAlchemy session.
+
+    Returns:
+        dict: The recipes under "Recipes" and the current price of every resource of the game under "Prices".
+    """
+    recipes = {}
+    industries = session.query(Industry).join(Country).filter(Country.game_id == game_id).order_by(Industry.id).all()
+    for industry in industries:
+        if industry.sub_type in recipes:
+            continue
+        production_level = max(industry.production_level, 1)
+        recipes[industry.sub_type] = {
+            "Type": industry.type,
+            "Sub-Type": industry.sub_type,
+            "Inputs": {industry_input.resource.name: industry_input.quantity for industry_input in industry.inputs},
+            "Outputs": {industry_output.resource.name: industry_output.quantity for industry_output in industry.outputs},
+            "Skilled Workers": max(1, round(industry.skilled_workers_employed / production_level)),
+            "Unskilled Workers": max(1, round(industry.unskilled_workers_employed / production_level)),
+        }
+
+    markets = session.query(Resource.name, ResourceMarket.current_price).join(
+        ResourceMarket, ResourceMarket.resource_id == Resource.id
+    ).filter(ResourceMarket.game_id == game_id)
+    prices = {name: float(current_price) for name, current_price in markets}
+    return {"Recipes": recipes, "Prices": prices}
+
+def make_rng(seed, country_schema: dict, turn_number: int, kind: str):
+    """
+    Returns the random generator for one kind of option of one country at one turn.
+    """
+    return random.Random(f"{seed}-{country_schema['Country Name']}-{turn_number}-{kind}")
+
+def generate_new_industry_options(country_schema: dict, catalogue: dict, rng: random.Random, count: int = NEW_INDUSTRY_OPTIONS):
+    """
+    Generates new industry options for a country.
+
+    Candidates are the recipes of industries that exist elsewhere in the game but not in this
+    country, plus an extraction industry for every natural resource nothing in the country produces
+    yet. Candidates whose inputs the country already holds, produces or extracts come first.
+
+    Args:
+        country_schema (dict): The country schema.
+        catalogue (dict): The recipes and prices from build_industry_catalogue.
+        rng (random.Random): The random generator.
+        count (int): Maximum number of options.
+
+    Returns:
+        list: The options, in the same format as the 'NewIndustries' LLM response.
+    """
+    prices = catalogue["Prices"]
+    own_sub_types = {industry["Sub-Type"] for industry in country_schema["Industries"]}
+    available_resources = set(country_schema.get("Stockpiles", {})) | set(country_schema.get("Natural Resources", {}))
+    produced_resources = set()
+    for industry in country_schema["Industries"]:
+        produced_resources.update(industry.get("Outputs", {}))
+    available_resources |= produced_resources
+
+    candidates = [recipe for sub_type, recipe in sorted(catalogue["Recipes"].items()) if sub_type not in own_sub_types]
+    for resource_name, resource_info in sorted(country_schema.get("Natural Resources", {}).items()):
+        sub_type = f"{resource_name} Extraction"
+        if resource_name in produced_resources or sub_type in own_sub_types or resource_info["Total Reserves"] <= 0:
+            continue
+        candidates.append({
+            "Type": "Primary",
+            "Sub-Type": sub_type,
+            "Inputs": {},
+            "Outputs": {resource_name: max(1, resource_info["Extraction Rate"] // 2)},
+            "Skilled Workers": 20,
+            "Unskilled Workers": 80,
+        })
+
+    def score(recipe):
+        inputs = recipe["Inputs"]
+        coverage = sum(1 for resource_name in inputs if resource_name in available_resources) / len(inputs) if inputs else 1.0
+        return coverage + rng.random() * 0.5
+
+    candidates.sort(key=score, reverse=True)
+
+    next_number = _next_industry_number(country_schema)
+    options = []
+    for recipe in candidates[:count]:
+        net_value = _basket_value(prices, recipe["Outputs"]) - _basket_value(prices, recipe["Inputs"])
+        setup_cost = _option_cost(rng, recipe["Skilled Workers"], recipe["Unskilled Workers"], net_value)
+        options.append({
+            "Industry ID": f"IND{next_number}",
+            "Type": recipe["Type"],
+            "Sub-Type": recipe["Sub-Type"],
+            "Inputs Required": dict(recipe["Inputs"]),
+            "Outputs Produced": dict(recipe["Outputs"]),
+            "Setup Cost": setup_cost,
+            "Skilled Workers Required": recipe["Skilled Workers"],
+            "Unskilled Workers Required": recipe["Unskilled Workers"],
+            "Production Level": 1,
+            "Technology Level": 1,
+        })
+        next_number += 1
+    return options
+
+def generate_expand_industry_options(country_schema: dict, catalogue: dict, rng: random.Random):
+    """
+    Generates an option to raise every industry of a country by one production level.
+
+    Args:
+        country_schema (dict): The country schema.
+        catalogue (dict): The recipes and prices from build_industry_catalogue.
+        rng (random.Random): The random generator.
+
+    Returns:
+        list: The options, in the same format as the 'IndustryExpansions' LLM response.
+    """
+    prices = catalogue["Prices"]
+    options = []
+    for industry in country_schema["Industries"]:
+        production_level = max(industry["Production Level"], 1)
+        # Input and output quantities are per production level already
+        inputs_per_level = dict(industry.get("Inputs", {}))
+        outputs_per_level = dict(industry.get("Outputs", {}))
+        skilled_workers = max(1, round(industry["Skilled Workers Employed"] / production_level))
+        unskilled_workers = max(1, round(industry["Unskilled Workers Employed"] / production_level))
+
+        net_value = _basket_value(prices, outputs_per_level) - _basket_value(prices, inputs_per_level)
+        # Each level costs more than the one before it
+        expansion_cost = _option_cost(rng, skilled_workers, unskilled_workers, net_value) * (1 + 0.25 * production_level)
+        options.append({
+            "Industry ID": industry["Industry ID"],
+            "Current Production Level": industry["Production Level"],
+            "New Production Level": industry["Production Level"] + 1,
+            "Expansion Cost": round(expansion_cost, -2),
+            "Additional Skilled Workers Required": skilled_workers,
+            "Additional Unskilled Workers Required": unskilled_workers,
+            "Increase in Outputs": outputs_per_level,
+            "Additional Inputs Required": inputs_per_level,
+        })
+    return options
+
+def generate_tech_upgrade_options(country_schema: dict, catalogue: dict, rng: random.Random):
+    """
+    Generates an option to raise every industry of a country by one technology level.
+
+    Args:
+        country_schema (dict): The country schema.
+        catalogue (dict): The recipes and prices from build_industry_catalogue.
+        rng (random.Random): The random generator.
+
+    Returns:
+        list: The options, in the same format as the 'TechnologyUpgrades' LLM response.
+    """
+    options = []
+    for industry in country_schema["Industries"]:
+        new_technology_level = industry["Technology Level"] + 1
+        if new_technology_level > MAX_TECHNOLOGY_LEVEL:
+            continue
+        upgrade_cost = UPGRADE_COST_PER_LEVEL * new_technology_level * max(industry["Production Level"], 1)
+        upgrade_cost *= 1 + rng.uniform(-COST_JITTER, COST_JITTER)
+        options.append({
+            "Industry ID": industry["Industry ID"],
+            "Current Technology Level": industry["Technology Level"],
+            "New Technology Level": new_technology_level,
+            "Upgrade Cost": round(upgrade_cost, -2),
+            "Time to Complete": 1 + new_technology_level // 3,
+            "Benefits": {
+                "Unskilled Labor Reduction": rng.randint(5, 15),
+                "Skilled Labor Reduction": rng.randint(0, 10),
+                "Output Increase": rng.randint(10, 25),
+                "Input Decrease": rng.randint(5, 15),
+            },
+        })
+    return options
+
+def _basket_value(prices: dict, quantities: dict):
+    return sum(quantity * prices.get(resource_name, 0) for resource_name, quantity in quantities.items())
+
+def _option_cost(rng: random.Random, skilled_workers: int, unskilled_workers: int, net_value: float):
+    cost = COST_PER_SKILLED_WORKER * skilled_workers + COST_PER_UNSKILLED_WORKER * unskilled_workers
+    cost += PAYBACK_TURNS * max(net_value, 0)
+    cost *= 1 + rng.uniform(-COST_JITTER, COST_JITTER)
+    return round(max(cost, MIN_OPTION_COST), -2)
+
+def _next_industry_number(country_schema: dict):
+    numbers = [0]
+    for industry in country_schema["Industries"]:
+        industry_id = industry["Industry ID"]
+        if industry_id.startswith("IND") and industry_id[3:].isdigit():
+            numbers.append(int(industry_id[3:]))
+    return max(numbers) + 1
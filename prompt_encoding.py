@@ -0,0 +1,217 @@
+# prompt_encoding.py
+
+import io
+import os
+import csv
+import json
+import threading
+
+# How game data is written into the prompts: "verbose" (indented JSON, as originally) or
+# "compact" (minified JSON plus CSV tables, with the market limited to relevant resources)
+PROMPT_MODE = os.getenv("PROMPT_MODE", "verbose")
+
+# Encoding used to count tokens when tiktoken is installed, otherwise tokens are estimated
+TOKEN_ENCODING = "o200k_base"
+# Estimated characters per token when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+INDUSTRY_COLUMNS = [
+    "Industry ID", "Type", "Sub-Type", "Production Level", "Technology Level",
+    "Skilled Workers Employed", "Unskilled Workers Employed", "Inputs", "Outputs",
+]
+MARKET_COLUMNS = ["CurrentPrice", "QuantityThreshold", "MaxTransactionPerTurn", "MaxPrice", "MinPrice", "PriceChange"]
+
+_tokenizer = None
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def set_prompt_mode(mode):
+    """
+    Sets the prompt mode used when none is passed explicitly.
+
+    Args:
+        mode (str): "verbose" or "compact".
+    """
+    global PROMPT_MODE
+    PROMPT_MODE = _check_mode(mode)
+
+def encode_country_schema(country_schema: dict, mode: str = None):
+    """
+    Writes a country schema as a fenced block for a prompt.
+
+    In compact mode the industries and natural resources are CSV tables and the rest is minified JSON.
+
+    Args:
+        country_schema (dict): The country schema.
+        mode (str): "verbose" or "compact", PROMPT_MODE if not given.
+
+    Returns:
+        str: The encoded schema.
+    """
+    if _check_mode(mode or PROMPT_MODE) == "verbose":
+        return f"```json\n{json.dumps(country_schema, indent=2)}\n```"
+
+    summary = {key: value for key, value in country_schema.items() if key not in ("Industries", "Natural Resources")}
+    summary["Stockpiles"] = {name: _number(quantity) for name, quantity in summary.get("Stockpiles", {}).items()}
+
+    industry_rows = [[
+        industry["Industry ID"], industry["Type"], industry["Sub-Type"], industry["Production Level"], industry["Technology Level"],
+        industry["Skilled Workers Employed"], industry["Unskilled Workers Employed"],
+        _pairs(industry.get("Inputs", {})), _pairs(industry.get("Outputs", {})),
+    ] for industry in country_schema.get("Industries", [])]
+
+    natural_resource_rows = [
+        [name, info["Total Reserves"], info["Extraction Rate"]]
+        for name, info in country_schema.get("Natural Resources", {}).items()
+    ]
+
+    return (
+        f"```json\n{_minified(summary)}\n```\n"
+        f"Industries (Inputs and Outputs are Resource:Quantity pairs separated by ';'):\n"
+        f"```csv\n{_csv(INDUSTRY_COLUMNS, industry_rows)}```\n"
+        f"Natural Resources:\n"
+        f"```csv\n{_csv(['Resource', 'Total Reserves', 'Extraction Rate'], natural_resource_rows)}```"
+    )
+
+def encode_marketplace(marketplace_data: dict, country_schema: dict = None, available_actions: dict = None, mode: str = None):
+    """
+    Writes the marketplace data as a fenced block for a prompt.
+
+    In compact mode it is a CSV table with one row per resource, limited to the resources the
+    country consumes, produces, holds or extracts and those used by its available actions.
+
+    Args:
+        marketplace_data (dict): The marketplace data, as built by get_marketplace_data.
+        country_schema (dict): The country schema the relevant resources are taken from.
+        available_actions (dict): The available actions, as built by get_available_actions.
+        mode (str): "verbose" or "compact", PROMPT_MODE if not given.
+
+    Returns:
+        str: The encoded marketplace data.
+    """
+    if _check_mode(mode or PROMPT_MODE) == "verbose":
+        return f"```json\n{json.dumps(marketplace_data, indent=2)}\n```"
+
+    market = marketplace_data.get("Marketplace", {})
+    if country_schema is not None:
+        relevant = relevant_resources(country_schema, available_actions)
+        market = {name: data for name, data in market.items() if name in relevant}
+
+    # PriceChange is only there for resources with price history
+    rows = [[name] + [_number(data.get(column, "")) for column in MARKET_COLUMNS] for name, data in sorted(market.items())]
+    return f"```csv\n{_csv(['Resource'] + MARKET_COLUMNS, rows)}```"
+
+def encode_available_actions(available_actions: dict, mode: str = None):
+    """
+    Writes the available actions as a fenced block for a prompt, minified in compact mode.
+
+    Args:
+        available_actions (dict): The available actions, as built by get_available_actions.
+        mode (str): "verbose" or "compact", PROMPT_MODE if not given.
+
+    Returns:
+        str: The encoded actions.
+    """
+    if _check_mode(mode or PROMPT_MODE) == "verbose":
+        return f"```json\n{json.dumps(available_actions, indent=2)}\n```"
+    return f"```json\n{_minified(available_actions)}\n```"
+
+def relevant_resources(country_schema: dict, available_actions: dict = None):
+    """
+    Returns the names of the resources a country consumes, produces, holds or extracts, plus
+    those used by its available actions.
+    """
+    names = set(country_schema.get("Stockpiles", {})) | set(country_schema.get("Natural Resources", {}))
+    for industry in country_schema.get("Industries", []):
+        names.update(industry.get("Inputs", {}))
+        names.update(industry.get("Outputs", {}))
+    for option in (available_actions or {}).get("StartNewIndustry", []):
+        names.update(option.get("InputsRequired", {}))
+        names.update(option.get("OutputsProduced", {}))
+    for option in (available_actions or {}).get("ExpandIndustry", []):
+        names.update(option.get("AdditionalInputsRequired", {}))
+        names.update(option.get("IncreaseInOutputs", {}))
+    return names
+
+def count_tokens(text: str):
+    """
+    Counts the tokens of a text with tiktoken, or estimates them from its length if tiktoken
+    is not installed.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding(TOKEN_ENCODING)
+        except ImportError:
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def record_prompt(call_site, prompt: str):
+    """
+    Adds a prompt to the size statistics of its call site.
+    """
+    tokens = count_tokens(prompt)
+    with _stats_lock:
+        stats = _stats.setdefault(call_site or "default", {"calls": 0, "tokens": 0, "chars": 0, "max_tokens": 0})
+        stats["calls"] += 1
+        stats["tokens"] += tokens
+        stats["chars"] += len(prompt)
+        stats["max_tokens"] = max(stats["max_tokens"], tokens)
+
+def get_prompt_stats():
+    """
+    Returns the prompt size statistics by call site: number of calls, total and largest token
+    counts and total characters.
+    """
+    with _stats_lock:
+        return {call_site: dict(stats) for call_site, stats in _stats.items()}
+
+def reset_prompt_stats():
+    """
+    Clears the prompt size statistics.
+    """
+    with _stats_lock:
+        _stats.clear()
+
+def print_prompt_stats():
+    """
+    Prints the prompt size statistics by call site.
+    """
+    stats = get_prompt_stats()
+    if not stats:
+        return
+    counted = "tokens" if _tokenizer else "estimated tokens"
+    print(f"Prompt sizes by call site ({counted}, mode: {PROMPT_MODE}):")
+    for call_site, site_stats in sorted(stats.items()):
+        average = site_stats["tokens"] / site_stats["calls"]
+        print(f" - {call_site}: {site_stats['calls']} calls, {site_stats['tokens']} total, {average:.0f} average, {site_stats['max_tokens']} max")
+
+def _check_mode(mode):
+    if mode not in ("verbose", "compact"):
+        raise ValueError(f"Unknown prompt mode: {mode}.")
+    return mode
+
+def _minified(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def _number(value):
+    # Whole numbers without a decimal part, everything else rounded to cents
+    if isinstance(value, float):
+        value = round(value, 2)
+        if value.is_integer():
+            return int(value)
+    return value
+
+def _pairs(quantities: dict):
+    return ";".join(f"{name}:{_number(quantity)}" for name, quantity in quantities.items())
+
+def _csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
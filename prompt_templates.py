@@ -0,0 +1,155 @@
+# prompt_templates.py
+
+import os
+import threading
+from prompt_encoding import count_tokens
+
+# Directory holding the prompt templates, independent of the working directory
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# Template file of each call site, relative to PROMPTS_DIR
+TEMPLATE_FILES = {
+    "generate_country": "initialize/generatePlayers.md",
+    "generate_marketplace": "initialize/initializeMarketplace.md",
+    "generate_new_industries": "gameplay/generateNewIndustries.md",
+    "generate_expand_options": "gameplay/generateExpandOptions.md",
+    "generate_tech_upgrades": "gameplay/generateTechUpgradeOptions.md",
+    "ai_turn": "gameplay/LLMturn.md",
+    "pick_winner": "gameplay/pickWinner.md",
+}
+
+# Providers only cache prompt prefixes from this many tokens on
+MIN_CACHEABLE_PREFIX_TOKENS = 1024
+
+_templates = None
+_stats = {}
+_lock = threading.Lock()
+
+
+class PromptTemplate:
+    """
+    A prompt template: the static instructions every prompt of a call site starts with.
+
+    Prompts are built by appending the per-country data to the static text, so every prompt of
+    the call site shares an identical prefix that the provider can cache.
+    """
+
+    def __init__(self, name, path, text):
+        self.name = name
+        self.path = path
+        self.text = text
+        self.static_tokens = count_tokens(text)
+
+    def render(self, dynamic_text=""):
+        """
+        Returns the prompt made of the static text followed by the dynamic text.
+        """
+        _record_render(self, dynamic_text)
+        return self.text + dynamic_text
+
+
+def load_templates(prompts_dir=PROMPTS_DIR):
+    """
+    Loads and validates every prompt template, replacing the ones already loaded.
+
+    Args:
+        prompts_dir (str): Directory holding the templates.
+
+    Returns:
+        dict: The templates by call site.
+
+    Raises:
+        FileNotFoundError: If a template file is missing.
+        ValueError: If a template is empty or does not ask for a JSON response.
+    """
+    global _templates
+    templates = {}
+    for name, relative_path in TEMPLATE_FILES.items():
+        path = os.path.join(prompts_dir, relative_path)
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if not text.strip():
+            raise ValueError(f"Prompt template '{name}' at {path} is empty.")
+        if "JSON" not in text:
+            raise ValueError(f"Prompt template '{name}' at {path} does not ask for a JSON response.")
+        templates[name] = PromptTemplate(name, path, text)
+
+    with _lock:
+        _templates = templates
+        _stats.clear()
+    return templates
+
+def get_template(name):
+    """
+    Returns the template of a call site, loading every template on first use.
+
+    Args:
+        name (str): The call site, a key of TEMPLATE_FILES.
+
+    Returns:
+        PromptTemplate: The template.
+    """
+    if _templates is None:
+        load_templates()
+    template = _templates.get(name)
+    if template is None:
+        raise KeyError(f"Unknown prompt template: {name}.")
+    return template
+
+def build_prompt(name, dynamic_text=""):
+    """
+    Builds a prompt from a call site's template followed by the per-call data.
+
+    Args:
+        name (str): The call site, a key of TEMPLATE_FILES.
+        dynamic_text (str): The data appended after the static instructions.
+
+    Returns:
+        str: The prompt.
+    """
+    return get_template(name).render(dynamic_text)
+
+def get_template_stats():
+    """
+    Returns for every template the cacheable (static prefix) and dynamic token counts.
+
+    Returns:
+        dict: By call site, the static token count, the number of prompts built, the total and
+            largest dynamic token counts, and the share of all prompt tokens in the static prefix.
+    """
+    if _templates is None:
+        load_templates()
+    report = {}
+    with _lock:
+        for name, template in _templates.items():
+            stats = _stats.get(name, {"renders": 0, "dynamic_tokens": 0, "max_dynamic_tokens": 0})
+            total_tokens = template.static_tokens * stats["renders"] + stats["dynamic_tokens"]
+            report[name] = {
+                "static_tokens": template.static_tokens,
+                "renders": stats["renders"],
+                "dynamic_tokens": stats["dynamic_tokens"],
+                "max_dynamic_tokens": stats["max_dynamic_tokens"],
+                "cacheable_share": template.static_tokens * stats["renders"] / total_tokens if total_tokens else 0.0,
+            }
+    return report
+
+def print_template_stats():
+    """
+    Prints the cacheable and dynamic token counts of every template.
+    """
+    print("Prompt templates (cacheable static prefix vs dynamic data, in tokens):")
+    for name, stats in get_template_stats().items():
+        note = "" if stats["static_tokens"] >= MIN_CACHEABLE_PREFIX_TOKENS else " (prefix too short to be cached)"
+        line = f" - {name}: {stats['static_tokens']} static{note}"
+        if stats["renders"]:
+            average = stats["dynamic_tokens"] / stats["renders"]
+            line += f", {stats['renders']} prompts, {average:.0f} average dynamic, {stats['max_dynamic_tokens']} max dynamic, {stats['cacheable_share']:.0%} cacheable"
+        print(line)
+
+def _record_render(template, dynamic_text):
+    dynamic_tokens = count_tokens(dynamic_text) if dynamic_text else 0
+    with _lock:
+        stats = _stats.setdefault(template.name, {"renders": 0, "dynamic_tokens": 0, "max_dynamic_tokens": 0})
+        stats["renders"] += 1
+        stats["dynamic_tokens"] += dynamic_tokens
+        stats["max_dynamic_tokens"] = max(stats["max_dynamic_tokens"], dynamic_tokens)
@@ -0,0 +1,205 @@
+# query_plans.py
+
+import contextlib
+import io
+import random
+import re
+import sys
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from database import create_game_engine, IN_MEMORY_URL
+from db_setup import create_tables
+from models import User, Game
+from init_world import add_countries_to_db
+from init_marketplace import update_resources_in_db
+from background_logic import process_background_logic
+from generate_actions import generate_action_options_for_all_countries
+from gameplay import process_ai_turn
+from market_history import get_price_series, get_price_changes
+
+# Matches a plan step that reads a whole table or index
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)")
+# Statements whose plans are checked, the others (INSERT, SAVEPOINT, ...) read no table
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+# The sample game whose statements are checked: procedural options and rule-based players, so no LLM is needed
+SAMPLE_SEED = 0
+SAMPLE_COUNTRIES = 3
+SAMPLE_TURNS = 3
+SAMPLE_RESOURCES = {
+    "Iron Ore": 10, "Coal": 8, "Steel": 60, "Grain": 5, "Bread": 15,
+    "Crude Oil": 40, "Fuel": 70, "Silicon": 20, "Electronics": 150,
+}
+
+
+def generate_sample_country(rng: random.Random, index: int):
+    """
+    Returns the data of a country of the sample game, in the format of the LLM's responses.
+    """
+    names = list(SAMPLE_RESOURCES)
+    industries = []
+    for number in range(rng.randint(2, 4)):
+        industries.append({
+            "Industry ID": f"IND{number + 1}",
+            "Type": "Secondary",
+            "Sub-Type": f"Industry {number + 1}",
+            "Production Level": rng.randint(1, 3),
+            "Technology Level": rng.randint(1, 3),
+            "Inputs": {name: rng.randint(10, 100) for name in rng.sample(names, rng.randint(0, 2))},
+            "Outputs": {name: rng.randint(20, 200) for name in rng.sample(names, 1)},
+            "Skilled Workers Employed": rng.randint(10, 100),
+            "Unskilled Workers Employed": rng.randint(50, 400),
+        })
+    return {
+        "Country Name": f"Country {index + 1}",
+        "Government Capital Pool": rng.randint(500000, 2000000),
+        "Industries": industries,
+        "Workforce": {"Unemployed Skilled Workers": rng.randint(100, 500), "Unemployed Unskilled Workers": rng.randint(500, 2000)},
+        "Stockpiles": {name: rng.randint(0, 1000) for name in names},
+        "Natural Resources": {name: {"Total Reserves": rng.randint(1000, 50000), "Extraction Rate": rng.randint(50, 500)}
+                              for name in rng.sample(names, 2)},
+    }
+
+def generate_sample_game(session, seed=SAMPLE_SEED, num_countries=SAMPLE_COUNTRIES, total_turns=SAMPLE_TURNS):
+    """
+    Adds a seeded game with its countries and markets, generated locally.
+
+    Returns:
+        Game: The new game.
+    """
+    user = User(username=f"query_plans_{seed}")
+    session.add(user)
+    session.commit()
+    game = Game(user_id=user.id, current_turn_number=1, total_turns=total_turns, created_at=datetime.now(), is_active=True)
+    session.add(game)
+    session.commit()
+
+    rng = random.Random(seed)
+    add_countries_to_db([generate_sample_country(rng, i) for i in range(num_countries)], game.id, session)
+    update_resources_in_db(game.id, {"Marketplace": {"Resources": {
+        name: {"InitialPrice": price, "QuantityThreshold": 1000, "MaxTransactionPerTurn": 500,
+               "MaxPrice": price * 3, "MinPrice": price / 3}
+        for name, price in SAMPLE_RESOURCES.items()
+    }}}, session)
+    return game
+
+def capture_statements(engine, seed=SAMPLE_SEED):
+    """
+    Plays the turns of the sample game on a database and records the statements it runs.
+
+    Every turn runs the background logic with both production engines in turn, the procedural
+    action options and the rule-based players' decisions with the market clearing, and the
+    market history is read at the end.
+
+    Args:
+        engine: Engine of the database the game is played on.
+        seed: Seed of the sample game.
+
+    Returns:
+        dict: The parameters of the first execution of each distinct statement, by statement.
+    """
+    statements = {}
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        statements.setdefault(statement, parameters)
+
+    session = sessionmaker(bind=engine)()
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            game = generate_sample_game(session, seed)
+            for turn_number in range(1, game.total_turns + 1):
+                engine_name = ("scalar", "vectorized")[turn_number % 2]
+                process_background_logic(game=game, turn_number=turn_number, session=session, engine=engine_name)
+                generate_action_options_for_all_countries(game, turn_number, session, option_mode="procedural", seed=seed)
+                process_ai_turn(game, turn_number, session, seed=seed, strategy="rule_based")
+                game.current_turn_number = turn_number
+                session.commit()
+            get_price_series(game.id, session)
+            get_price_changes(game.id, game.total_turns, session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+        session.close()
+    return statements
+
+def explain(connection, statement, parameters=()):
+    """
+    Returns the steps of SQLite's query plan for a statement.
+
+    Args:
+        connection: Connection to an SQLite database.
+        statement (str): The statement as sent to the database, with its placeholders.
+        parameters: The statement's parameters.
+
+    Returns:
+        list: The plan's step descriptions.
+    """
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def find_full_scans(plan):
+    """
+    Returns the tables a query plan reads entirely.
+    """
+    return [match.group(1) for match in map(FULL_SCAN.match, plan) if match]
+
+def is_explained(statement):
+    return statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS)
+
+def check_query_plans(engine=None, statements=None):
+    """
+    Checks that none of the statements of a game does a full table scan.
+
+    Args:
+        engine: Engine of the SQLite database whose plans are checked, an empty in-memory
+            database with the current schema if not given.
+        statements (dict): Parameters by statement, the statements of the sample game
+            (see capture_statements) if not given.
+
+    Returns:
+        dict: The tables scanned by each statement that does full scans.
+    """
+    if engine is None:
+        engine = create_game_engine(IN_MEMORY_URL)
+        create_tables(engine)
+    if statements is None:
+        sample_engine = create_game_engine(IN_MEMORY_URL)
+        create_tables(sample_engine)
+        try:
+            statements = capture_statements(sample_engine)
+        finally:
+            sample_engine.dispose()
+
+    failures = {}
+    with engine.connect() as connection:
+        for statement, parameters in statements.items():
+            if not is_explained(statement):
+                continue
+            scans = find_full_scans(explain(connection, statement, parameters))
+            if scans:
+                failures[statement] = scans
+    return failures
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    engine = create_game_engine(f"sqlite:///{argv[0]}") if argv else None
+
+    sample_engine = create_game_engine(IN_MEMORY_URL)
+    create_tables(sample_engine)
+    statements = capture_statements(sample_engine)
+    sample_engine.dispose()
+
+    failures = check_query_plans(engine, statements)
+    checked = sum(1 for statement in statements if is_explained(statement))
+    if not failures:
+        print(f"All {checked} statements of the sample game use indexes.")
+        return 0
+    for statement, scans in failures.items():
+        print(f"Statement scans {', '.join(scans)}: {' '.join(statement.split())}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# resource_cache.py
+
+import re
+import threading
+import weakref
+from sqlalchemy import event, select
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Resource
+
+# Key under session.info listing the names the session's transaction created, and in which savepoint
+_CREATED_KEY = "resource_cache_created"
+
+# One cache per database engine, dropped with the engine
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+class ResourceNameCache:
+    """
+    Resource IDs of one database by normalized name.
+
+    Every resource is loaded with one query the first time the cache is used. Afterwards only
+    resources added since, by this process or another one, are read, and only when a name is
+    not found.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.max_id = 0
+        self.lock = threading.RLock()
+
+    def refresh(self, session: Session):
+        """
+        Reads the resources added since the last refresh.
+        """
+        rows = session.execute(
+            select(Resource.id, Resource.name).where(Resource.id > self.max_id).order_by(Resource.id)
+        ).all()
+        for resource_id, name in rows:
+            key = normalize_resource_name(name)
+            # The oldest spelling of a name is kept
+            self.ids.setdefault(key, resource_id)
+            self.max_id = max(self.max_id, resource_id)
+
+    def load_names(self, names, session: Session):
+        """
+        Reads resources by name. On databases such as PostgreSQL IDs can be committed out of
+        order, so a resource committed by another session can have an ID refresh already went past.
+        """
+        rows = session.execute(select(Resource.id, Resource.name).where(Resource.name.in_(list(names)))).all()
+        for resource_id, name in sorted(rows):
+            self.ids.setdefault(normalize_resource_name(name), resource_id)
+
+    def forget(self, keys):
+        """
+        Drops names whose resources were rolled back. Their IDs can be given to new resources,
+        so the next refresh reads again from the lowest of them.
+        """
+        forgotten = [self.ids.pop(key) for key in keys if key in self.ids]
+        if forgotten:
+            self.max_id = min(self.max_id, min(forgotten) - 1)
+
+
+def normalize_resource_name(name):
+    """
+    Returns the key that spelling variants of a resource name share.
+
+    Case, spacing, hyphens and underscores are ignored, as well as the plural of the last word,
+    so "Iron Ore", "iron-ore" and "Iron  Ores" are the same resource.
+    """
+    words = re.sub(r"[\s_\-]+", " ", str(name)).strip().casefold().split(" ")
+    last = words[-1]
+    if len(last) > 4 and last.endswith("ies"):
+        words[-1] = last[:-3] + "y"
+    elif len(last) > 3 and last.endswith("s") and not last.endswith("ss"):
+        words[-1] = last[:-1]
+    return " ".join(words)
+
+def get_resource_ids(names, session: Session, create: bool = True):
+    """
+    Resolves resource names to resource IDs, creating the resources that don't exist yet.
+
+    Names already cached cost no query. The others cost one query for the resources added
+    since the cache was last read and, if some are still missing, one insert that leaves the
+    resources created meanwhile by other sessions untouched. Those are then read by name.
+
+    Args:
+        names (iterable): The resource names, as written by the LLM.
+        session (Session): The SQLAlchemy session.
+        create (bool): Whether to create the missing resources.
+
+    Returns:
+        dict: The resource ID of each name, None for missing names when create is False.
+    """
+    cache = _get_cache(session)
+    keys = {name: normalize_resource_name(name) for name in names}
+    with cache.lock:
+        if any(key not in cache.ids for key in keys.values()):
+            cache.refresh(session)
+
+        missing = {}
+        for name, key in keys.items():
+            if key not in cache.ids:
+                missing.setdefault(key, " ".join(str(name).split()))
+        if missing and create:
+            _insert_resources(list(missing.values()), session)
+            cache.refresh(session)
+            # A name the insert left alone already exists, possibly below the refreshed IDs
+            unresolved = [name for key, name in missing.items() if key not in cache.ids]
+            if unresolved:
+                cache.load_names(unresolved, session)
+            created = session.info.setdefault(_CREATED_KEY, [])
+            created.append((cache, [key for key in missing if key in cache.ids], _open_transactions(session)))
+
+        return {name: cache.ids.get(key) for name, key in keys.items()}
+
+def get_resource_id(name, session: Session, create: bool = True):
+    """
+    Resolves a single resource name, see get_resource_ids.
+    """
+    return get_resource_ids([name], session, create)[name]
+
+def get_resource(name, session: Session, create: bool = False):
+    """
+    Returns the Resource of a name or one of its spelling variants, None if there is none.
+    """
+    resource_id = get_resource_id(name, session, create)
+    return session.get(Resource, resource_id) if resource_id is not None else None
+
+def resolve_quantities(quantities: dict, session: Session, create: bool = True):
+    """
+    Turns quantities by resource name into quantities by resource ID.
+
+    Names that are spellings of the same resource have their quantities added up.
+
+    Args:
+        quantities (dict): Quantities by resource name.
+        session (Session): The SQLAlchemy session.
+        create (bool): Whether to create the missing resources, if not their names are dropped.
+
+    Returns:
+        dict: Quantities by resource ID, in the order of the names.
+    """
+    resource_ids = get_resource_ids(quantities, session, create)
+    resolved = {}
+    for name, quantity in quantities.items():
+        resource_id = resource_ids[name]
+        if resource_id is not None:
+            resolved[resource_id] = resolved.get(resource_id, 0) + quantity
+    return resolved
+
+def clear_resource_cache():
+    """
+    Empties every cache, e.g. after resources were renamed or deleted outside of this module.
+    """
+    with _caches_lock:
+        _caches.clear()
+
+def _get_cache(session: Session):
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = ResourceNameCache()
+        return cache
+
+def _open_transactions(session: Session):
+    # The session's innermost transaction and the ones it is nested in
+    transactions = []
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    while transaction is not None:
+        transactions.append(transaction)
+        transaction = transaction.parent
+    return transactions
+
+def _insert_resources(names, session: Session):
+    # Upsert on the unique name, so that concurrent games creating the same resource do not fail
+    rows = [{"name": name} for name in names]
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        session.execute(sqlite.insert(Resource).values(rows).on_conflict_do_nothing(index_elements=["name"]))
+    elif dialect == "postgresql":
+        session.execute(postgresql.insert(Resource).values(rows).on_conflict_do_nothing(index_elements=["name"]))
+    else:
+        for name in names:
+            try:
+                with session.begin_nested():
+                    session.add(Resource(name=name))
+            except IntegrityError:
+                pass
+
+@event.listens_for(Session, "after_commit")
+def _keep_created(session):
+    # Also called when a savepoint is released, the names are kept for good only by the outermost commit
+    if session.get_nested_transaction() is None:
+        session.info.pop(_CREATED_KEY, None)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_created(session, previous_transaction):
+    # The resources created in the rolled back transaction or savepoint, or in one nested in it, are gone
+    kept = []
+    for cache, keys, transactions in session.info.pop(_CREATED_KEY, []):
+        if not any(transaction is previous_transaction for transaction in transactions):
+            kept.append((cache, keys, transactions))
+            continue
+        with cache.lock:
+            cache.forget(keys)
+    if kept:
+        session.info[_CREATED_KEY] = kept
@@ -0,0 +1,160 @@
+# rule_based_player.py
+
+import json
+import random
+
+# Share of the capital pool kept in reserve after buying inputs and investing
+CAPITAL_RESERVE_RATIO = 0.2
+# Turns of industry input consumption the player tries to keep in stock
+INPUT_BUFFER_TURNS = 2
+# Share of a resource nobody in the country consumes that is sold each turn
+SURPLUS_SELL_RATIO = 0.5
+# Maximum number of industry options taken in a single turn
+MAX_INVESTMENTS_PER_TURN = 3
+
+
+def decide_actions(country_schema: dict, available_actions: dict, marketplace_data: dict, turn_number: int, seed=None):
+    """
+    Picks the actions for a country's turn without an LLM.
+
+    The player sells part of the resources none of its industries consume, buys the inputs it is
+    short of for the next turns, and then greedily takes the affordable industry options with the
+    best estimated return on their cost.
+
+    Args:
+        country_schema (dict): The country schema, as built by country_schema.get_country_schema.
+        available_actions (dict): The pre-generated options, as built by get_available_actions.
+        marketplace_data (dict): The marketplace prices, as built by get_marketplace_data.
+        turn_number (int): The current turn number.
+        seed: Seed used to break ties between equally scored options.
+
+    Returns:
+        str: The decision as JSON in the same format the LLM is asked to produce.
+    """
+    rng = random.Random(f"{seed}-{country_schema['Country Name']}-{turn_number}")
+    market = marketplace_data.get("Marketplace", {})
+
+    # Capital on hand, escrow of the orders already placed is no longer in it. Sale proceeds only
+    # arrive when the market clears at the end of the turn, so they are not spent here.
+    capital = float(country_schema["Government Capital Pool"])
+    reserve = capital * CAPITAL_RESERVE_RATIO
+    skilled_workers = country_schema["Workforce"]["Unemployed Skilled Workers"]
+    unskilled_workers = country_schema["Workforce"]["Unemployed Unskilled Workers"]
+    stockpiles = country_schema.get("Stockpiles", {})
+
+    actions = []
+
+    # Inputs consumed per turn by the existing industries
+    input_needs = {}
+    for industry in country_schema.get("Industries", []):
+        technology_multiplier = 1 - (0.05 * industry["Technology Level"])
+        for resource_name, quantity in industry.get("Inputs", {}).items():
+            required = quantity * industry["Production Level"] * technology_multiplier
+            input_needs[resource_name] = input_needs.get(resource_name, 0) + required
+
+    # Sell part of the resources that no industry uses
+    for resource_name in sorted(stockpiles):
+        if resource_name in input_needs:
+            continue
+        price = _tradable_price(market, resource_name)
+        if price is None:
+            continue
+        quantity = int(min(stockpiles[resource_name] * SURPLUS_SELL_RATIO, market[resource_name]["MaxTransactionPerTurn"]))
+        if quantity <= 0:
+            continue
+        total_revenue = round(quantity * price, 2)
+        actions.append(_trade_action("Sell", resource_name, quantity, "TotalRevenue", total_revenue))
+
+    # Buy the inputs that would run short over the next turns
+    for resource_name in sorted(input_needs):
+        price = _tradable_price(market, resource_name)
+        if price is None:
+            continue
+        shortfall = input_needs[resource_name] * INPUT_BUFFER_TURNS - stockpiles.get(resource_name, 0)
+        quantity = int(min(shortfall, market[resource_name]["MaxTransactionPerTurn"]))
+        if quantity <= 0:
+            continue
+        quantity = min(quantity, int((capital - reserve) // price))
+        if quantity <= 0:
+            continue
+        total_cost = round(quantity * price, 2)
+        actions.append(_trade_action("Buy", resource_name, quantity, "TotalCost", total_cost))
+        capital -= total_cost
+
+    # Score every industry option by its estimated net output value per turn per unit of cost
+    options = []
+    for option in available_actions.get("StartNewIndustry", []):
+        value = (_basket_value(market, option["OutputsProduced"]) - _basket_value(market, option["InputsRequired"])) * option["ProductionLevel"]
+        options.append(("StartNewIndustry", option, option["SetupCost"], option["SkilledWorkersRequired"], option["UnskilledWorkersRequired"], value))
+    for option in available_actions.get("ExpandIndustry", []):
+        value = _basket_value(market, option["IncreaseInOutputs"]) - _basket_value(market, option["AdditionalInputsRequired"])
+        options.append(("ExpandIndustry", option, option["ExpansionCost"], option["AdditionalSkilledWorkersRequired"], option["AdditionalUnskilledWorkersRequired"], value))
+    average_output_value = _average_industry_output_value(market, country_schema)
+    for option in available_actions.get("UpgradeTechnology", []):
+        benefits = _parse_benefits(option.get("Benefits"))
+        gain = (benefits.get("Output Increase", 0) + benefits.get("Input Decrease", 0)) / 100
+        options.append(("UpgradeTechnology", option, option["UpgradeCost"], 0, 0, average_output_value * gain))
+
+    rng.shuffle(options)
+    options.sort(key=lambda item: item[5] / item[2] if item[2] > 0 else item[5], reverse=True)
+
+    invested_industries = set()
+    investments = 0
+    for action_type, option, cost, skilled_required, unskilled_required, value in options:
+        if investments >= MAX_INVESTMENTS_PER_TURN or value <= 0:
+            break
+        # Only one expansion or upgrade per industry, the later one would be wasted
+        industry_key = (action_type, option["IndustryID"])
+        if action_type != "StartNewIndustry" and industry_key in invested_industries:
+            continue
+        if cost > capital - reserve or skilled_required > skilled_workers or unskilled_required > unskilled_workers:
+            continue
+
+        actions.append({
+            "ActionType": action_type,
+            "ActionID": option["ActionID"],
+            "IndustryID": option["IndustryID"],
+        })
+        capital -= cost
+        skilled_workers -= skilled_required
+        unskilled_workers -= unskilled_required
+        invested_industries.add(industry_key)
+        investments += 1
+
+    return json.dumps({"Turn": turn_number, "Actions": actions})
+
+def _tradable_price(market: dict, resource_name: str):
+    # Resources without market data yet cannot be traded (zero prices are rejected)
+    resource = market.get(resource_name)
+    if not resource or resource["CurrentPrice"] <= 0 or resource["QuantityThreshold"] <= 0:
+        return None
+    return resource["CurrentPrice"]
+
+def _trade_action(transaction_type: str, resource_name: str, quantity: int, total_key: str, total: float):
+    return {
+        "ActionType": "BuySellResource",
+        "Details": {
+            "TransactionType": transaction_type,
+            "ResourceName": resource_name,
+            "Quantity": quantity,
+            total_key: total,
+        }
+    }
+
+def _basket_value(market: dict, quantities: dict):
+    return sum(quantity * market.get(resource_name, {}).get("CurrentPrice", 0) for resource_name, quantity in quantities.items())
+
+def _average_industry_output_value(market: dict, country_schema: dict):
+    industries = country_schema.get("Industries", [])
+    if not industries:
+        return 0
+    total = sum(_basket_value(market, industry.get("Outputs", {})) * industry["Production Level"] for industry in industries)
+    return total / len(industries)
+
+def _parse_benefits(benefits):
+    if isinstance(benefits, str):
+        try:
+            benefits = json.loads(benefits)
+        except json.JSONDecodeError:
+            return {}
+    return benefits if isinstance(benefits, dict) else {}
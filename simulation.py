@@ -0,0 +1,463 @@
+# simulation.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker, Session
+from db_setup import create_tables
+from database import create_game_engine, snapshot_to_disk, IN_MEMORY_URL, SQLITE_PROFILES
+from models import User, Game, Country, Industry
+from init_world import generate_initial_world
+from init_marketplace import generate_marketplace_data
+from generate_actions import generate_action_options_for_all_countries
+from gameplay import process_ai_turn
+from pick_winner import pick_winner
+from background_logic import process_background_logic
+from prompt_encoding import print_prompt_stats, set_prompt_mode
+from prompt_templates import load_templates, print_template_stats
+from llm_client import set_model
+from llm_cache import set_cache_enabled
+from worker_pool import run_in_processes
+
+# Maximum number of LLM requests sent in parallel during option generation and AI decisions
+LLM_MAX_CONCURRENCY = 8
+
+# Database file of each simulated game, "{game}" is replaced with the game's index in the batch
+DEFAULT_DB_PATH = "simulations/game_{game}.db"
+DEFAULT_SUMMARY_PATH = "simulations/summary.json"
+SIMULATION_USERNAME = "simulation"
+
+# Settings of run_game copied into each game's result
+RESULT_SETTINGS = ("num_countries", "total_turns", "seed", "model", "strategy", "option_mode", "db_path", "db_url", "strategies",
+                   "production_engine")
+
+
+def play_game(game: Game, num_countries: int, session: Session, max_concurrency: int = LLM_MAX_CONCURRENCY,
+              option_mode: str = "llm", strategy=None, seed=None, strategies=None, turn_metrics=None,
+              production_engine="scalar"):
+    """
+    Generates the world of a new game, plays all its turns and picks the winner.
+
+    Args:
+        game (Game): The new game instance.
+        num_countries (int): Number of AI countries.
+        session (Session): The SQLAlchemy session.
+        max_concurrency (int): Maximum number of LLM requests in flight at once.
+        option_mode (str): "llm" or "procedural" action option generation.
+        strategy (str): Strategy used for every country instead of its own ai_strategy.
+        seed: Seed for the procedural options and the rule-based player.
+        strategies (list): Strategies assigned to the generated countries in turn, as their ai_strategy.
+        turn_metrics (list): If given, the metrics of every turn (see collect_turn_metrics) are appended to it.
+        production_engine (str): "scalar" or "vectorized" production, see process_background_logic.
+
+    Returns:
+        dict: The winner data returned by pick_winner, or None if no winner could be picked.
+    """
+    print("Game initialization in progress...")
+
+    # Generate the initial world (countries and their data)
+    generate_initial_world(game, num_countries, session)
+
+    # Generate initial marketplace data
+    generate_marketplace_data(game.id, session)
+
+    if strategies:
+        countries = session.query(Country).filter_by(game_id=game.id).order_by(Country.id).all()
+        for i, country in enumerate(countries):
+            country.ai_strategy = strategies[i % len(strategies)]
+        session.commit()
+
+    print("Game initialization complete.")
+
+    # Start the game loop for each turn
+    for turn_number in range(1, game.total_turns + 1):
+        print(f"\n--- Turn {turn_number} ---")
+        timings = {"start": time.perf_counter()}
+
+        # Execute background logic
+        process_background_logic(game=game, turn_number=turn_number, session=session, engine=production_engine)
+        timings["background"] = time.perf_counter()
+
+        # Generate action options for all countries
+        generate_action_options_for_all_countries(game, turn_number, session, max_concurrency=max_concurrency,
+                                                  option_mode=option_mode, seed=seed)
+        timings["options"] = time.perf_counter()
+
+        # Process AI turns
+        process_ai_turn(game, turn_number, session, max_concurrency=max_concurrency, seed=seed, strategy=strategy)
+        timings["decisions"] = time.perf_counter()
+
+        # Update the current turn number in the game
+        game.current_turn_number = turn_number
+        session.commit()
+
+        if turn_metrics is not None:
+            turn_metrics.append(collect_turn_metrics(game, turn_number, session, timings))
+
+    print(f"\nGame has ended after {game.total_turns} turns.")
+    print_prompt_stats()
+    print_template_stats()
+
+    # Determine the winner
+    print("Determining the winner...")
+    return pick_winner(game.id, session)
+
+def collect_turn_metrics(game: Game, turn_number: int, session: Session, timings: dict):
+    """
+    Gathers the metrics of a finished turn.
+
+    Args:
+        game (Game): The game instance.
+        turn_number (int): The turn that just finished.
+        session (Session): The SQLAlchemy session.
+        timings (dict): perf_counter values taken at the start of the turn and after each phase.
+
+    Returns:
+        dict: The turn number, the duration of each phase in seconds, and each country's
+            government capital and number of industries.
+    """
+    countries = session.query(Country).filter_by(game_id=game.id).order_by(Country.id).all()
+    industry_counts = dict(
+        session.query(Industry.country_id, func.count(Industry.id))
+        .join(Country).filter(Country.game_id == game.id)
+        .group_by(Industry.country_id)
+    )
+    return {
+        "turn": turn_number,
+        "background": timings["background"] - timings["start"],
+        "options": timings["options"] - timings["background"],
+        "decisions": timings["decisions"] - timings["options"],
+        "capital": {country.name: float(country.government_capital) for country in countries},
+        "industries": {country.name: industry_counts.get(country.id, 0) for country in countries},
+    }
+
+def run_game(num_countries=3, total_turns=10, seed=None, model=None, strategy=None, option_mode="llm",
+             db_path="game.db", db_url=None, strategies=None, prompt_mode=None, max_concurrency=LLM_MAX_CONCURRENCY,
+             use_cache=True, log_path=None, in_memory=False, sqlite_profile=None, production_engine="scalar"):
+    """
+    Plays a whole game without any interaction, in its own database file or as a new game of a shared database.
+
+    Args:
+        num_countries (int): Number of AI countries.
+        total_turns (int): Number of turns.
+        seed: Seed for the procedural options and the rule-based player.
+        model (str): Model used for every LLM call, the per-call-site models if None.
+        strategy (str): "llm" or "rule_based" for every country, each country's own ai_strategy if None.
+        option_mode (str): "llm" or "procedural" action option generation.
+        db_path (str): SQLite database file, created if missing. Ignored if db_url is given.
+        db_url (str): SQLAlchemy URL of a database shared with other games, e.g. a PostgreSQL server.
+        strategies (list): Strategies assigned to the countries in turn, see play_game.
+        prompt_mode (str): "verbose" or "compact" prompts, PROMPT_MODE if None.
+        max_concurrency (int): Maximum number of LLM requests in flight at once.
+        use_cache (bool): Whether LLM responses are read from and written to the response cache.
+        log_path (str): File the game's output is written to instead of stdout.
+        in_memory (bool): Whether the game is played in an in-memory database copied to db_path
+            at the end, replacing the file's content.
+        sqlite_profile (str): SQLite pragma profile, see database.SQLITE_PROFILES.
+        production_engine (str): "scalar" or "vectorized" production, see process_background_logic.
+
+    Returns:
+        dict: The game's result: its settings, winner, strategy of each country, final capital of
+            each country, per-turn metrics, duration and the error that stopped it, if any.
+    """
+    result = new_game_result(num_countries=num_countries, total_turns=total_turns, seed=seed, model=model,
+                             strategy=strategy, option_mode=option_mode, db_path=db_path, db_url=db_url,
+                             strategies=strategies, production_engine=production_engine)
+    if in_memory and db_url:
+        raise ValueError("A game played in memory cannot use a shared database.")
+    start = time.perf_counter()
+
+    for path in (None if db_url else db_path, log_path):
+        directory = os.path.dirname(path or "")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    with contextlib.ExitStack() as stack:
+        if log_path:
+            log_file = stack.enter_context(open(log_path, "a", encoding="utf-8"))
+            stack.enter_context(contextlib.redirect_stdout(log_file))
+
+        set_model(model)
+        set_cache_enabled(use_cache)
+        if prompt_mode:
+            set_prompt_mode(prompt_mode)
+        load_templates()
+
+        if in_memory:
+            engine = create_game_engine(IN_MEMORY_URL, profile=sqlite_profile)
+        else:
+            engine = create_game_engine(db_url or f"sqlite:///{db_path}", profile=sqlite_profile)
+        create_tables(engine)
+        session = sessionmaker(bind=engine)()
+
+        try:
+            user = get_simulation_user(session)
+            game = Game(
+                user_id=user.id,
+                current_turn_number=1,
+                total_turns=total_turns,
+                created_at=datetime.now(),
+                is_active=True
+            )
+            session.add(game)
+            session.commit()
+            result["game_id"] = game.id
+            print(f"Simulated game {game.id} started with {num_countries} AI countries and {total_turns} turns.")
+
+            winner_data = play_game(game, num_countries, session, max_concurrency=max_concurrency,
+                                    option_mode=option_mode, strategy=strategy, seed=seed,
+                                    strategies=strategies, turn_metrics=result["turn_metrics"],
+                                    production_engine=production_engine)
+
+            result["turns_played"] = game.current_turn_number
+            for country in session.query(Country).filter_by(game_id=game.id).order_by(Country.id):
+                result["final_capital"][country.name] = float(country.government_capital)
+                result["country_strategies"][country.name] = strategy or country.ai_strategy
+            if winner_data:
+                result["winner"] = winner_data.get("Winner")
+                result["winner_strategy"] = result["country_strategies"].get(result["winner"])
+        except Exception as e:
+            session.rollback()
+            result["error"] = f"{type(e).__name__}: {e}"
+            print(f"Simulated game failed: {result['error']}")
+        finally:
+            session.close()
+            if in_memory:
+                # Saved even after a failure, so the game can be inspected
+                snapshot_to_disk(engine, db_path)
+            engine.dispose()
+
+    result["duration"] = time.perf_counter() - start
+    return result
+
+def new_game_result(**settings):
+    """
+    Returns the result of a game that has not been played yet, holding its settings.
+    """
+    return dict(
+        settings,
+        game_id=None,
+        turns_played=0,
+        winner=None,
+        winner_strategy=None,
+        country_strategies={},
+        final_capital={},
+        turn_metrics=[],
+        duration=None,
+        error=None,
+    )
+
+def get_simulation_user(session: Session):
+    """
+    Gets the user simulated games belong to, creating it if needed.
+    """
+    user = session.query(User).filter(User.username == SIMULATION_USERNAME).first()
+    if not user:
+        user = User(username=SIMULATION_USERNAME)
+        session.add(user)
+        session.commit()
+    return user
+
+def run_games(num_games, workers=1, db_path=DEFAULT_DB_PATH, db_url=None, seed=None, strategies=None,
+              log_games=None, timeout=None, **game_options):
+    """
+    Plays several games back to back, or in worker processes.
+
+    Every game either gets its own database file, so workers never share one, or is a new game
+    of the shared database at db_url. The games of a database share the resource names, while
+    each game keeps its own market prices. With several workers every game runs in a process of
+    its own, so a crashed game does not affect the others. The LLM transport and cache are
+    configured per process from the usual environment variables.
+
+    Args:
+        num_games (int): Number of games.
+        workers (int): Number of worker processes, one per CPU with 0, the games run in this process with 1.
+        db_path (str): Database file of each game, "{game}" is replaced with its index.
+            Also used to name the log files when db_url is given.
+        db_url (str): SQLAlchemy URL of a database shared by every game, e.g. a PostgreSQL server.
+        seed (int): Seed of the first game, the next games use the following seeds.
+        strategies (list): Strategies assigned to the countries in turn, rotated by one for each
+            game so that every strategy plays from every position.
+        log_games (bool): Whether each game's output goes to a .log file named after its database
+            instead of stdout. Defaults to True with several workers.
+        timeout (float): Seconds after which a game played in a worker process is stopped.
+        **game_options: Passed on to run_game.
+
+    Returns:
+        list: The result of every game, in order.
+    """
+    if "{game}" not in db_path and num_games > 1 and (db_url is None or log_games):
+        raise ValueError("The database path must contain '{game}' when several games are played.")
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if log_games is None:
+        log_games = workers > 1
+
+    jobs = []
+    for index in range(num_games):
+        game_db_path = db_path.format(game=index)
+        jobs.append(dict(
+            game_options,
+            seed=None if seed is None else seed + index,
+            db_path=game_db_path,
+            db_url=db_url,
+            strategies=strategies[index % len(strategies):] + strategies[:index % len(strategies)] if strategies else None,
+            log_path=os.path.splitext(game_db_path)[0] + ".log" if log_games else None,
+        ))
+
+    if db_url:
+        # Created once up front so that the workers do not race to create the tables and user
+        engine = create_game_engine(db_url, profile=game_options.get("sqlite_profile"))
+        create_tables(engine)
+        with sessionmaker(bind=engine)() as session:
+            get_simulation_user(session)
+        engine.dispose()
+
+    results = [None] * num_games
+    if workers <= 1:
+        for index, job in enumerate(jobs):
+            results[index] = dict(run_game(**job), game=index)
+            _print_result(results[index], num_games)
+        return results
+
+    for index, result, error in run_in_processes(run_game, jobs, workers, timeout=timeout):
+        if result is None:
+            # The worker died before returning a result
+            result = new_game_result(**{key: jobs[index].get(key) for key in RESULT_SETTINGS})
+            result["error"] = error
+        results[index] = dict(result, game=index)
+        _print_result(results[index], num_games)
+    return results
+
+def summarize_results(results, elapsed):
+    """
+    Builds the summary of a batch of games.
+
+    Args:
+        results (list): The results returned by run_games.
+        elapsed (float): Wall-clock duration of the batch in seconds.
+
+    Returns:
+        dict: Totals, throughput, time spent in each phase, winners by country name and by
+            strategy, and every game's result.
+    """
+    completed = [result for result in results if not result["error"]]
+    wins = {}
+    wins_by_strategy = {}
+    for result in completed:
+        if result["winner"]:
+            wins[result["winner"]] = wins.get(result["winner"], 0) + 1
+        if result["winner_strategy"]:
+            wins_by_strategy[result["winner_strategy"]] = wins_by_strategy.get(result["winner_strategy"], 0) + 1
+
+    phase_seconds = {"background": 0.0, "options": 0.0, "decisions": 0.0}
+    for result in results:
+        for metrics in result["turn_metrics"]:
+            for phase in phase_seconds:
+                phase_seconds[phase] += metrics[phase]
+
+    turns_played = sum(result["turns_played"] for result in results)
+    durations = [result["duration"] for result in results if result["duration"] is not None]
+    return {
+        "games": len(results),
+        "completed": len(completed),
+        "failed": len(results) - len(completed),
+        "elapsed": elapsed,
+        "average_game_duration": sum(durations) / len(durations) if durations else 0.0,
+        "turns_per_second": turns_played / elapsed if elapsed else 0.0,
+        "phase_seconds": phase_seconds,
+        "wins": wins,
+        "wins_by_strategy": wins_by_strategy,
+        "results": results,
+    }
+
+def write_summary(summary, path=DEFAULT_SUMMARY_PATH):
+    """
+    Writes a batch summary as JSON.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Play games without any interaction and summarize the results.")
+    parser.add_argument("--games", type=int, default=1, help="number of games")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes, one per CPU with 0, games run back to back in this process with 1")
+    parser.add_argument("--countries", type=int, default=3, help="AI countries per game")
+    parser.add_argument("--turns", type=int, default=10, help="turns per game")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the first game, the next games use the following seeds")
+    parser.add_argument("--model", default=None, help="model used for every LLM call")
+    parser.add_argument("--strategy", choices=["llm", "rule_based"], default=None,
+                        help="strategy of every country, each country's own by default")
+    parser.add_argument("--strategies", default=None,
+                        help="comma-separated strategies assigned to the countries in turn, e.g. 'llm,rule_based'")
+    parser.add_argument("--options", choices=["llm", "procedural"], default="llm", dest="option_mode",
+                        help="how action options are generated")
+    parser.add_argument("--prompt-mode", choices=["verbose", "compact"], default=None)
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY, dest="max_concurrency",
+                        help="LLM requests in flight at once within a game")
+    parser.add_argument("--no-cache", action="store_false", dest="use_cache", help="do not use the LLM response cache")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, dest="db_path",
+                        help="database file of each game, '{game}' is replaced with the game's index")
+    parser.add_argument("--db-url", default=None, help="SQLAlchemy URL of a database shared by every game")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="play each game in memory and write its database file at the end")
+    parser.add_argument("--sqlite-profile", choices=sorted(SQLITE_PROFILES), default=None,
+                        help="SQLite pragma profile, SQLITE_PROFILE by default")
+    parser.add_argument("--engine", choices=["scalar", "vectorized"], default="scalar", dest="production_engine",
+                        help="how production is computed each turn")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds after which a worker's game is stopped")
+    parser.add_argument("--summary", default=DEFAULT_SUMMARY_PATH, help="JSON file the summary is written to")
+    args = parser.parse_args(argv)
+    if args.games < 1 or args.workers < 0 or args.countries < 1 or args.turns < 1:
+        parser.error("--games, --countries and --turns must be at least 1 and --workers at least 0.")
+    if args.strategies:
+        args.strategies = [name.strip() for name in args.strategies.split(",")]
+        unknown = set(args.strategies) - {"llm", "rule_based"}
+        if unknown:
+            parser.error(f"Unknown strategies: {', '.join(sorted(unknown))}.")
+        if args.strategy:
+            parser.error("--strategy and --strategies cannot be used together.")
+    if args.in_memory and args.db_url:
+        parser.error("--in-memory and --db-url cannot be used together.")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = vars(args)
+    summary_path = options.pop("summary")
+    num_games = options.pop("games")
+    num_countries = options.pop("countries")
+    total_turns = options.pop("turns")
+
+    start = time.perf_counter()
+    results = run_games(num_games, num_countries=num_countries, total_turns=total_turns, **options)
+    summary = summarize_results(results, time.perf_counter() - start)
+    write_summary(summary, summary_path)
+
+    print(f"\n{summary['completed']}/{summary['games']} games completed in {summary['elapsed']:.1f}s "
+          f"({summary['turns_per_second']:.2f} turns/s).")
+    for name, count in sorted(summary["wins"].items(), key=lambda item: -item[1]):
+        print(f" - {name}: {count} wins")
+    for name, count in sorted(summary["wins_by_strategy"].items(), key=lambda item: -item[1]):
+        print(f" - strategy {name}: {count} wins")
+    print(f"Summary written to {summary_path}.")
+    return 0 if not summary["failed"] else 1
+
+def _print_result(result, num_games):
+    if result["error"]:
+        outcome = f"failed: {result['error']}"
+    else:
+        outcome = f"winner {result['winner']}"
+    print(f"Game {result['game'] + 1}/{num_games} ({result['db_url'] or result['db_path']}) {outcome} in {result['duration'] or 0:.1f}s.")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# tests/conftest.py
+
+import os
+import sys
+from datetime import datetime
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+# The modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import create_game_engine, IN_MEMORY_URL
+from db_setup import create_tables
+from models import User, Game
+
+
+@pytest.fixture
+def engine():
+    """
+    An in-memory database with the latest schema.
+    """
+    engine = create_game_engine(IN_MEMORY_URL)
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def new_game(session, total_turns=10):
+    """
+    Adds a new game, with its user, and returns it.
+    """
+    user = User(username=f"player{session.query(User).count() + 1}")
+    session.add(user)
+    session.commit()
+    game = Game(user_id=user.id, current_turn_number=1, total_turns=total_turns,
+                created_at=datetime.now(), is_active=True)
+    session.add(game)
+    session.commit()
+    return game
+
+@pytest.fixture
+def game(session):
+    return new_game(session)
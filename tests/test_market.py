@@ -0,0 +1,172 @@
+# tests/test_market.py
+
+import contextlib
+import io
+import random
+from decimal import Decimal
+import pytest
+from sqlalchemy.orm import sessionmaker
+from conftest import new_game
+from database import create_game_engine, IN_MEMORY_URL
+from db_setup import create_tables
+from init_world import add_countries_to_db
+from init_marketplace import update_resources_in_db
+from market import place_order, clear_market, get_resource_market, MarketOrderError
+from models import Country, Resource, Stockpile, MarketOrder
+
+MARKETPLACE = {"Marketplace": {"Resources": {
+    "Silicon": {"InitialPrice": 20, "QuantityThreshold": 100, "MaxTransactionPerTurn": 500, "MaxPrice": 22, "MinPrice": 18},
+    "Steel": {"InitialPrice": 50, "QuantityThreshold": 1000, "MaxTransactionPerTurn": 200, "MaxPrice": 150, "MinPrice": 10},
+}}}
+
+
+def country_data(name, stockpiles):
+    return {
+        "Country Name": name,
+        "Government Capital Pool": 100000,
+        "Industries": [],
+        "Workforce": {"Unemployed Skilled Workers": 0, "Unemployed Unskilled Workers": 0},
+        "Stockpiles": stockpiles,
+    }
+
+def setup_market(session):
+    """
+    Adds a game with two countries and the markets of MARKETPLACE.
+
+    Returns:
+        tuple: The game, its countries by name and the resources by name.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = new_game(session)
+        add_countries_to_db([
+            country_data("Alpha", {"Silicon": 300, "Steel": 100}),
+            country_data("Beta", {"Silicon": 50}),
+        ], game.id, session)
+        update_resources_in_db(game.id, MARKETPLACE, session)
+    countries = {country.name: country for country in session.query(Country).filter_by(game_id=game.id)}
+    resources = {resource.name: resource for resource in session.query(Resource)}
+    return game, countries, resources
+
+def stockpile_quantity(country, resource, session):
+    stockpile = session.query(Stockpile).filter_by(country_id=country.id, resource_id=resource.id).first()
+    return stockpile.quantity if stockpile else 0
+
+def clear(game, turn_number, session):
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = clear_market(game.id, turn_number, session)
+    session.commit()
+    return results
+
+def test_buy_order_escrows_its_limit(session):
+    game, countries, resources = setup_market(session)
+    alpha = countries["Alpha"]
+
+    order = place_order(alpha, 1, resources["Silicon"], "Buy", 10, 250, session)
+
+    assert order.escrow == Decimal("250")
+    assert alpha.government_capital == Decimal("99750")
+
+def test_sell_order_escrows_its_quantity(session):
+    game, countries, resources = setup_market(session)
+    alpha = countries["Alpha"]
+
+    order = place_order(alpha, 1, resources["Silicon"], "Sell", 100, 1000, session)
+
+    assert order.escrow == 0
+    assert stockpile_quantity(alpha, resources["Silicon"], session) == 200
+    with pytest.raises(MarketOrderError):
+        place_order(alpha, 1, resources["Silicon"], "Sell", 201, 1000, session)
+
+def test_filled_buy_order_refunds_what_it_did_not_pay(session):
+    game, countries, resources = setup_market(session)
+    alpha = countries["Alpha"]
+
+    place_order(alpha, 1, resources["Silicon"], "Buy", 10, 250, session)
+    clear(game, 1, session)
+
+    # 10 units at 20 cost 200 of the 250 set aside
+    assert alpha.government_capital == Decimal("99800")
+    assert stockpile_quantity(alpha, resources["Silicon"], session) == 310
+
+def test_unfilled_orders_are_given_back(session):
+    game, countries, resources = setup_market(session)
+    alpha = countries["Alpha"]
+
+    place_order(alpha, 1, resources["Silicon"], "Buy", 10, 150, session)
+    place_order(alpha, 1, resources["Steel"], "Sell", 10, 600, session)
+    clear(game, 1, session)
+
+    assert alpha.government_capital == Decimal("100000")
+    assert stockpile_quantity(alpha, resources["Silicon"], session) == 300
+    assert stockpile_quantity(alpha, resources["Steel"], session) == 100
+    orders = session.query(MarketOrder).filter_by(country_id=alpha.id).all()
+    assert all(order.is_cleared and not order.is_filled for order in orders)
+
+def test_max_transaction_per_turn_is_summed_across_orders(session):
+    game, countries, resources = setup_market(session)
+    alpha = countries["Alpha"]
+    steel = resources["Steel"]
+
+    place_order(alpha, 1, steel, "Buy", 120, 10000, session)
+    with pytest.raises(MarketOrderError):
+        place_order(alpha, 1, steel, "Buy", 81, 10000, session)
+    place_order(alpha, 1, steel, "Buy", 80, 10000, session)
+
+    # Sales, other countries and later turns have limits of their own
+    place_order(alpha, 1, steel, "Sell", 50, 1, session)
+    place_order(countries["Beta"], 1, steel, "Buy", 200, 20000, session)
+    clear(game, 1, session)
+    place_order(alpha, 2, steel, "Buy", 200, 20000, session)
+
+@pytest.mark.parametrize("order_type, expected_price", [("Buy", Decimal("22")), ("Sell", Decimal("18"))])
+def test_next_price_is_clamped(session, order_type, expected_price):
+    game, countries, resources = setup_market(session)
+    silicon = resources["Silicon"]
+
+    # 300 units against a threshold of 100 would move the price by 15%
+    limit_total = 100000 if order_type == "Buy" else 1
+    place_order(countries["Alpha"], 1, silicon, order_type, 300, limit_total, session)
+    results = clear(game, 1, session)
+
+    assert results["Silicon"]["price"] == Decimal("20")
+    assert results["Silicon"]["next_price"] == expected_price
+    assert Decimal(get_resource_market(game.id, silicon.id, session).current_price) == expected_price
+
+def play_orders(orders):
+    """
+    Places the orders in a new game, clears the market and returns the countries' capital and
+    stockpiles, and the next prices.
+    """
+    engine = create_game_engine(IN_MEMORY_URL)
+    create_tables(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        game, countries, resources = setup_market(session)
+        for country_name, resource_name, order_type, quantity, limit_total in orders:
+            place_order(countries[country_name], 1, resources[resource_name], order_type, quantity, limit_total, session)
+        results = clear(game, 1, session)
+        return (
+            {name: country.government_capital for name, country in countries.items()},
+            sorted((stockpile.country.name, stockpile.resource.name, stockpile.quantity) for stockpile in session.query(Stockpile)),
+            {name: result["next_price"] for name, result in results.items()},
+        )
+    finally:
+        session.close()
+        engine.dispose()
+
+def test_clearing_does_not_depend_on_order_placement():
+    orders = [
+        ("Alpha", "Silicon", "Sell", 100, 1500),
+        ("Alpha", "Steel", "Buy", 50, 3000),
+        ("Alpha", "Silicon", "Buy", 20, 300),
+        ("Beta", "Silicon", "Buy", 40, 1000),
+        ("Beta", "Steel", "Buy", 100, 4000),
+        ("Beta", "Silicon", "Sell", 30, 900),
+    ]
+    expected = play_orders(orders)
+
+    rng = random.Random(0)
+    for _ in range(5):
+        shuffled = list(orders)
+        rng.shuffle(shuffled)
+        assert play_orders(shuffled) == expected
@@ -0,0 +1,99 @@
+# tests/test_migrations.py
+
+import contextlib
+import io
+from decimal import Decimal
+from sqlalchemy import create_engine, inspect, text
+from database import create_game_engine, IN_MEMORY_URL
+from migrations.runner import upgrade, current_revision, VERSION_TABLE
+from migrations.versions import REVISIONS, v0001_initial_schema
+from models import Base
+
+
+def describe_schema(engine):
+    """
+    Returns the columns, indexes, unique constraints, foreign keys and primary key of every table.
+    """
+    inspector = inspect(engine)
+    schema = {}
+    for table_name in inspector.get_table_names():
+        if table_name == VERSION_TABLE:
+            continue
+        schema[table_name] = (
+            {column["name"]: (str(column["type"]), column["nullable"], column["default"])
+             for column in inspector.get_columns(table_name)},
+            sorted((index["name"], tuple(index["column_names"]), bool(index["unique"]))
+                   for index in inspector.get_indexes(table_name)),
+            sorted((constraint["name"], tuple(constraint["column_names"]))
+                   for constraint in inspector.get_unique_constraints(table_name)),
+            sorted((tuple(key["constrained_columns"]), key["referred_table"], tuple(key["referred_columns"]))
+                   for key in inspector.get_foreign_keys(table_name)),
+            tuple(inspector.get_pk_constraint(table_name)["constrained_columns"]),
+        )
+    return schema
+
+def models_schema():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return describe_schema(engine)
+
+def run_upgrade(engine, target=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return upgrade(engine, target)
+
+def test_new_database_gets_the_models_schema():
+    engine = create_game_engine(IN_MEMORY_URL)
+
+    assert run_upgrade(engine) == [migration.revision for migration in REVISIONS]
+    assert describe_schema(engine) == models_schema()
+    assert run_upgrade(engine) == []
+
+def test_initial_revision_creates_only_the_baseline_tables():
+    engine = create_game_engine(IN_MEMORY_URL)
+    run_upgrade(engine, target="0001")
+
+    tables = set(inspect(engine).get_table_names()) - {VERSION_TABLE}
+    assert tables == set(v0001_initial_schema.metadata.tables)
+    assert "market_orders" not in tables and "resource_markets" not in tables
+    assert "ai_strategy" not in {column["name"] for column in inspect(engine).get_columns("countries")}
+
+def test_database_without_revisions_is_upgraded():
+    # Created by the game before the schema had revisions
+    engine = create_game_engine(IN_MEMORY_URL)
+    v0001_initial_schema.metadata.create_all(engine)
+
+    run_upgrade(engine)
+    assert current_revision(engine) == REVISIONS[-1].revision
+    assert describe_schema(engine) == models_schema()
+
+def test_baseline_data_is_migrated():
+    engine = create_game_engine(IN_MEMORY_URL)
+    run_upgrade(engine, target="0001")
+    with engine.begin() as connection:
+        for statement in [
+            "INSERT INTO users (id, username) VALUES (1, 'player')",
+            "INSERT INTO games (id, user_id, created_at) VALUES (1, 1, '2024-01-01 00:00:00'), (2, 1, '2024-01-02 00:00:00')",
+            "INSERT INTO turns (id, game_id, turn_number) VALUES (1, 1, 1), (2, 1, 2)",
+            "INSERT INTO resources (id, name, base_price, current_price, quantity_threshold, max_transaction_per_turn, max_price, min_price)"
+            " VALUES (1, 'Steel', 50, 55, 1000, 200, 150, 10)",
+            "INSERT INTO countries (id, game_id, name, government_capital, total_skilled_workers, total_unskilled_workers,"
+            " unemployed_skilled_workers, unemployed_unskilled_workers) VALUES (1, 1, 'Alpha', 1000, 0, 0, 0, 0)",
+            "INSERT INTO market_transactions (turn_id, country_id, resource_id, transaction_type, quantity, price_per_unit, total_price)"
+            " VALUES (1, 1, 1, 'Buy', 10, 50, 500)",
+            "INSERT INTO market_prices (turn_id, resource_id, price) VALUES (1, 1, 50), (2, 1, 55)",
+        ]:
+            connection.execute(text(statement))
+
+    run_upgrade(engine)
+    assert describe_schema(engine) == models_schema()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT ai_strategy FROM countries")).scalar() == "llm"
+        markets = connection.execute(text(
+            "SELECT game_id, current_price, max_transaction_per_turn FROM resource_markets ORDER BY game_id"
+        )).all()
+        assert [(game_id, Decimal(str(price)), limit) for game_id, price, limit in markets] == [(1, 55, 200), (2, 55, 200)]
+        first_turn = connection.execute(text(
+            "SELECT close_price, high_price, volume_bought, volume_sold, turnover FROM market_prices WHERE turn_id = 1"
+        )).one()
+        assert [Decimal(str(value)) for value in first_turn] == [55, 55, 10, 0, 500]
+        assert connection.execute(text("SELECT name FROM resources")).scalar() == "Steel"
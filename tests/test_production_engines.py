@@ -0,0 +1,119 @@
+# tests/test_production_engines.py
+
+import contextlib
+import io
+import json
+import random
+import pytest
+from sqlalchemy.orm import sessionmaker
+from conftest import new_game
+from database import create_game_engine, IN_MEMORY_URL
+from db_setup import create_tables
+from init_world import add_countries_to_db
+from market import get_or_create_turn
+from background_logic import process_background_logic
+from models import Country, Industry, TechnologyUpgrade, IndustryExpansion
+
+RESOURCES = ["Copper Ore", "Silicon", "Electronics", "Steel", "Grain", "Oil"]
+WORLDS = 30
+TURNS = 3
+
+
+def random_country(rng, index):
+    """
+    Country data as add_countries_to_db expects it, with random industries, stockpiles and reserves.
+    Stockpiles are often too small, so that some industries cannot produce.
+    """
+    industries = []
+    for number in range(rng.randint(1, 4)):
+        industries.append({
+            "Industry ID": f"IND{number + 1}",
+            "Type": "Secondary",
+            "Sub-Type": f"Industry {number + 1}",
+            "Production Level": rng.randint(1, 4),
+            "Technology Level": rng.randint(0, 3),
+            "Inputs": {name: rng.randint(0, 300) for name in rng.sample(RESOURCES, rng.randint(0, 2))},
+            "Outputs": {name: rng.randint(1, 200) for name in rng.sample(RESOURCES, rng.randint(1, 2))},
+            "Skilled Workers Employed": rng.randint(0, 100),
+            "Unskilled Workers Employed": rng.randint(0, 400),
+        })
+    return {
+        "Country Name": f"Country {index}",
+        "Government Capital Pool": 1000000,
+        "Industries": industries,
+        "Workforce": {"Unemployed Skilled Workers": 100, "Unemployed Unskilled Workers": 400},
+        "Stockpiles": {name: rng.choice([0, rng.randint(1, 500), rng.randint(500, 5000)])
+                       for name in rng.sample(RESOURCES, rng.randint(0, len(RESOURCES)))},
+        "Natural Resources": {name: {"Total Reserves": rng.randint(0, 1500), "Extraction Rate": rng.randint(1, 600)}
+                              for name in rng.sample(RESOURCES, rng.randint(0, 3))},
+    }
+
+def add_pending_projects(rng, game, session):
+    """
+    Adds random technology upgrades and industry expansions, some of which complete during the game.
+    """
+    turn = get_or_create_turn(game.id, 1, session)
+    for industry in session.query(Industry).join(Country).filter(Country.game_id == game.id).order_by(Industry.id):
+        if rng.random() < 0.3:
+            time_required = rng.randint(1, TURNS)
+            session.add(TechnologyUpgrade(
+                industry_id=industry.id, initiated_turn_id=turn.id, new_technology_level=industry.technology_level + 1,
+                upgrade_cost=1000, total_time_required=time_required, remaining_time=time_required,
+                benefits=json.dumps({"Unskilled Labor Reduction": rng.randint(0, 20), "Skilled Labor Reduction": rng.randint(0, 20),
+                                     "Output Increase": rng.randint(0, 30), "Input Decrease": rng.randint(0, 30)}),
+            ))
+        if rng.random() < 0.3:
+            time_required = rng.randint(1, TURNS)
+            session.add(IndustryExpansion(
+                industry_id=industry.id, initiated_turn_id=turn.id, new_production_level=industry.production_level + 1,
+                expansion_cost=1000, total_time_required=time_required, remaining_time=time_required,
+                additional_skilled_workers_required=0, additional_unskilled_workers_required=0,
+                increase_in_outputs=json.dumps({name: rng.randint(1, 100) for name in rng.sample(RESOURCES, 1)}),
+                additional_inputs_required=json.dumps({name: rng.randint(0, 100) for name in rng.sample(RESOURCES, 1)}),
+            ))
+    session.commit()
+
+def play_world(seed, engine_name):
+    """
+    Generates the world of a seed, runs the background logic of a few turns with a production
+    engine and returns the stockpiles, reserves and industry levels of every country.
+    """
+    rng = random.Random(seed)
+    engine = create_game_engine(IN_MEMORY_URL)
+    create_tables(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            game = new_game(session)
+            add_countries_to_db([random_country(rng, index) for index in range(rng.randint(1, 4))], game.id, session)
+            add_pending_projects(rng, game, session)
+            for turn_number in range(1, TURNS + 1):
+                process_background_logic(game=game, turn_number=turn_number, session=session, engine=engine_name)
+
+        state = {"stockpiles": {}, "reserves": {}, "levels": {}}
+        for country in session.query(Country).filter_by(game_id=game.id).order_by(Country.id):
+            for stockpile in country.stockpiles:
+                state["stockpiles"][country.name, stockpile.resource.name] = float(stockpile.quantity)
+            for nat_resource in country.natural_resources:
+                state["reserves"][country.name, nat_resource.resource.name] = nat_resource.total_reserves
+            for industry in country.industries:
+                state["levels"][country.name, industry.industry_id] = (industry.production_level, industry.technology_level)
+        return state
+    finally:
+        session.close()
+        engine.dispose()
+
+@pytest.mark.parametrize("seed", range(WORLDS))
+def test_vectorized_production_matches_scalar(seed):
+    scalar = play_world(seed, "scalar")
+    vectorized = play_world(seed, "vectorized")
+
+    assert vectorized["levels"] == scalar["levels"]
+    assert vectorized["reserves"] == scalar["reserves"]
+    assert vectorized["stockpiles"].keys() == scalar["stockpiles"].keys()
+    for key, quantity in scalar["stockpiles"].items():
+        assert vectorized["stockpiles"][key] == pytest.approx(quantity), key
+
+def test_unknown_production_engine(session, game):
+    with pytest.raises(ValueError):
+        process_background_logic(game=game, turn_number=1, session=session, engine="gpu")
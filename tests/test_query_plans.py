@@ -0,0 +1,11 @@
+# tests/test_query_plans.py
+
+from query_plans import check_query_plans
+
+
+def test_statements_of_a_game_use_indexes():
+    assert check_query_plans() == {}
+
+def test_full_scans_are_reported():
+    statement = "SELECT market_orders.id FROM market_orders WHERE market_orders.escrow > ?"
+    assert check_query_plans(statements={statement: (0,)}) == {statement: ["market_orders"]}
@@ -0,0 +1,84 @@
+# worker_pool.py
+
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+
+def run_in_processes(function, jobs, workers, timeout=None):
+    """
+    Runs function(**job) for every job, each in its own worker process, at most `workers` at once.
+
+    Every job gets a fresh process, so a worker that crashes, is killed or runs out of memory only
+    loses its own job and the remaining jobs keep running.
+
+    Args:
+        function (callable): Module-level function run in the worker processes.
+        jobs (list): Keyword arguments of each call.
+        workers (int): Maximum number of worker processes alive at once.
+        timeout (float): Seconds after which a job's process is killed, no limit if None.
+
+    Yields:
+        tuple: (index of the job, its result or None, the error message or None), in the order
+            the jobs finish.
+    """
+    context = multiprocessing.get_context()
+    pending = list(enumerate(jobs))
+    pending.reverse()
+    running = {}
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, job = pending.pop()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_run_job, args=(function, job, sender), daemon=True)
+                process.start()
+                # Only the worker holds the sending end now, so a crash shows up as end of file
+                sender.close()
+                running[receiver] = (index, process, time.monotonic())
+
+            wait_timeout = None
+            if timeout is not None:
+                oldest = min(started for _, _, started in running.values())
+                wait_timeout = max(oldest + timeout - time.monotonic(), 0)
+
+            for receiver in wait(list(running), timeout=wait_timeout):
+                index, process, _ = running.pop(receiver)
+                try:
+                    result, error = receiver.recv()
+                except EOFError:
+                    result, error = None, None
+                receiver.close()
+                process.join()
+                if result is None and error is None:
+                    error = f"Worker process crashed with exit code {process.exitcode}."
+                yield index, result, error
+
+            if timeout is not None:
+                now = time.monotonic()
+                for receiver, (index, process, started) in list(running.items()):
+                    if now - started >= timeout:
+                        del running[receiver]
+                        process.kill()
+                        process.join()
+                        receiver.close()
+                        yield index, None, f"Worker process killed after {timeout:.0f}s."
+    finally:
+        # Stops the remaining workers when the caller gives up, e.g. on KeyboardInterrupt
+        for receiver, (_, process, _) in running.items():
+            process.kill()
+            process.join()
+            receiver.close()
+
+def _run_job(function, job, connection):
+    try:
+        try:
+            connection.send((function(**job), None))
+        except Exception as e:
+            connection.send((None, f"{type(e).__name__}: {e}"))
+    finally:
+        connection.close()
+        # The process ends with os._exit, which skips the atexit handler closing the LLM transport
+        from llm_client import close_transport
+        close_transport()